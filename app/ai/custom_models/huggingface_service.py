@@ -1,7 +1,14 @@
-from typing import Dict, Any, List, Optional
-import os
-from transformers import pipeline
+from typing import Dict, Any, AsyncIterator, Callable, List, Optional
 import asyncio
+import concurrent.futures
+import os
+import threading
+
+import numpy as np
+
+from app.core.config import settings
+from app.core.metrics import observe_latency
+from app.utils.concurrency import run_in_threadpool
 
 # Cache for loaded models
 model_cache = {}
@@ -17,13 +24,14 @@ async def load_model(model_name: str, task: str):
         return model_cache[cache_key]
     
     # Load model in a separate thread to not block the event loop
-    loop = asyncio.get_event_loop()
-    
     def _load_model():
+        # transformers (and torch) are only imported once a model is needed
+        from transformers import pipeline
+
         return pipeline(task=task, model=model_name)
     
     # Load model
-    model = await loop.run_in_executor(None, _load_model)
+    model = await run_in_threadpool(_load_model)
     
     # Cache the model
     model_cache[cache_key] = model
@@ -31,6 +39,7 @@ async def load_model(model_name: str, task: str):
     return model
 
 
+@observe_latency("huggingface", "text_generation")
 async def text_generation(
     prompt: str,
     model_name: str = "gpt2",
@@ -46,8 +55,6 @@ async def text_generation(
         generator = await load_model(model_name, "text-generation")
         
         # Run generation in a separate thread
-        loop = asyncio.get_event_loop()
-        
         def _generate():
             return generator(
                 prompt,
@@ -57,7 +64,7 @@ async def text_generation(
             )
         
         # Generate text
-        result = await loop.run_in_executor(None, _generate)
+        result = await run_in_threadpool(_generate)
         
         # Extract generated text
         return [item['generated_text'] for item in result]
@@ -66,6 +73,110 @@ async def text_generation(
         raise Exception(f"Error generating text: {str(e)}")
 
 
+# Marks the end of a token stream
+_STREAM_END = object()
+
+# Streamed generations run here rather than in the shared thread pool: a
+# paused generation holds its thread for as long as its client is slow, and
+# its run time says nothing about the queue wait of other work
+_generation_executor = concurrent.futures.ThreadPoolExecutor(
+    max_workers=settings.GENERATION_STREAM_WORKERS, thread_name_prefix="text-generation"
+)
+
+
+class _GenerationStopped(Exception):
+    """
+    Raised inside ``generate`` to stop a generation nobody is reading.
+    """
+
+
+def _token_streamer(tokenizer, emit: Callable[[str], None], stop: threading.Event):
+    """
+    Streamer for ``generate`` that hands each finalized piece of text
+    (whole words, as decoded by ``TextStreamer``) to ``emit``, and aborts
+    generation at the next token once ``stop`` is set.
+    """
+    from transformers import TextStreamer
+
+    class _Streamer(TextStreamer):
+        def put(self, value):
+            if stop.is_set():
+                raise _GenerationStopped()
+            super().put(value)
+
+        def on_finalized_text(self, text: str, stream_end: bool = False):
+            if text:
+                emit(text)
+
+    return _Streamer(tokenizer, skip_prompt=True, skip_special_tokens=True)
+
+
+async def stream_text_generation(
+    prompt: str,
+    model_name: str = "gpt2",
+    max_length: int = 50,
+    temperature: float = 0.7
+) -> AsyncIterator[str]:
+    """
+    Generate text with a Hugging Face model, yielding it as it is produced.
+
+    Generation runs on its own pool of ``GENERATION_STREAM_WORKERS`` threads
+    and passes text through a bounded queue; when the consumer falls behind
+    by ``GENERATION_STREAM_BUFFER`` pieces, generation pauses. Closing the
+    iterator early (for example when the client disconnects) stops
+    generation at the next token.
+    """
+    generator = await load_model(model_name, "text-generation")
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue(maxsize=settings.GENERATION_STREAM_BUFFER)
+    stop = threading.Event()
+
+    def emit(item: Any) -> None:
+        # Blocks the generation thread while the queue is full
+        future = asyncio.run_coroutine_threadsafe(queue.put(item), loop)
+        while True:
+            try:
+                future.result(timeout=0.1)
+                return
+            except concurrent.futures.TimeoutError:
+                if stop.is_set():
+                    future.cancel()
+                    return
+
+    def _generate():
+        if stop.is_set():
+            # Abandoned while waiting for a worker
+            return
+        try:
+            generator(
+                prompt,
+                max_length=max_length,
+                temperature=temperature,
+                streamer=_token_streamer(generator.tokenizer, emit, stop)
+            )
+        except _GenerationStopped:
+            pass
+        except Exception as e:
+            emit(e)
+        finally:
+            emit(_STREAM_END)
+
+    task = loop.run_in_executor(_generation_executor, _generate)
+    # Errors reach the consumer through the queue
+    task.add_done_callback(lambda t: t.cancelled() or t.exception())
+    try:
+        while True:
+            item = await queue.get()
+            if item is _STREAM_END:
+                break
+            if isinstance(item, Exception):
+                raise Exception(f"Error generating text: {str(item)}")
+            yield item
+    finally:
+        stop.set()
+
+
+@observe_latency("huggingface", "sentiment_analysis")
 async def sentiment_analysis(
     text: str,
     model_name: str = "distilbert-base-uncased-finetuned-sst-2-english"
@@ -78,13 +189,11 @@ async def sentiment_analysis(
         classifier = await load_model(model_name, "sentiment-analysis")
         
         # Run analysis in a separate thread
-        loop = asyncio.get_event_loop()
-        
         def _analyze():
             return classifier(text)
         
         # Analyze text
-        result = await loop.run_in_executor(None, _analyze)
+        result = await run_in_threadpool(_analyze)
         
         return result
     
@@ -92,6 +201,7 @@ async def sentiment_analysis(
         raise Exception(f"Error analyzing sentiment: {str(e)}")
 
 
+@observe_latency("huggingface", "question_answering")
 async def question_answering(
     question: str,
     context: str,
@@ -105,15 +215,60 @@ async def question_answering(
         qa_pipeline = await load_model(model_name, "question-answering")
         
         # Run QA in a separate thread
-        loop = asyncio.get_event_loop()
-        
         def _answer():
             return qa_pipeline(question=question, context=context)
         
         # Get answer
-        result = await loop.run_in_executor(None, _answer)
+        result = await run_in_threadpool(_answer)
         
         return result
     
     except Exception as e:
-        raise Exception(f"Error answering question: {str(e)}") 
\ No newline at end of file
+        raise Exception(f"Error answering question: {str(e)}") 
+
+
+def _embed_batch(extractor: Any, texts: List[str]) -> np.ndarray:
+    """
+    Embed a batch with a feature-extraction pipeline's tokenizer and model:
+    the mean of the last hidden states over each text's own tokens, weighted
+    by the attention mask so padding never counts, as L2-normalized float32
+    rows. A text gets the same vector alone as in any batch.
+    """
+    inputs = extractor.tokenizer(texts, padding=True, truncation=True, return_tensors=extractor.framework)
+    mask = np.asarray(inputs["attention_mask"], dtype=np.float32)[:, :, None]
+    # ``forward`` places inputs on the model's device and disables gradients
+    tokens = np.asarray(extractor.forward(dict(inputs))[0], dtype=np.float32)
+    embeddings = (tokens * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1.0)
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    np.divide(embeddings, norms, out=embeddings, where=norms > 0)
+    return embeddings
+
+
+@observe_latency("huggingface", "embed_texts")
+async def embed_texts(
+    texts: List[str],
+    model_name: Optional[str] = None,
+    batch_size: Optional[int] = None
+) -> np.ndarray:
+    """
+    Embed texts with a feature-extraction model.
+    Returns a (len(texts), dim) float32 array of unit-length rows, so inner
+    products are cosine similarities.
+    """
+    try:
+        model_name = model_name or settings.EMBEDDING_MODEL
+        batch_size = batch_size or settings.EMBEDDING_BATCH_SIZE
+        
+        # Load the model
+        extractor = await load_model(model_name, "feature-extraction")
+        
+        # Run inference in a separate thread, one batch at a time
+        batches = [
+            await run_in_threadpool(_embed_batch, extractor, texts[i:i + batch_size])
+            for i in range(0, len(texts), batch_size)
+        ]
+        
+        return np.vstack(batches)
+    
+    except Exception as e:
+        raise Exception(f"Error embedding texts: {str(e)}")
@@ -0,0 +1,322 @@
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from collections import OrderedDict
+import hashlib
+import logging
+
+from app.core.config import settings
+from app.core.metrics import gauge
+
+logger = logging.getLogger(__name__)
+
+# tiktoken module, imported on first use; False when it is not installed
+_tiktoken = None
+
+# Context window sizes for known model families (longest prefix wins)
+MODEL_CONTEXT_WINDOWS = {
+    "gpt-3.5-turbo": 4096,
+    "gpt-3.5-turbo-16k": 16385,
+    "gpt-3.5-turbo-1106": 16385,
+    "gpt-4": 8192,
+    "gpt-4-32k": 32768,
+    "gpt-4-1106-preview": 128000,
+}
+
+# Tokens the chat format adds per message and to prime the reply
+TOKENS_PER_MESSAGE = 4
+TOKENS_PER_REPLY = 3
+
+SUMMARY_PROMPT = (
+    "Summarize the following conversation so it can replace the original messages "
+    "as context. Keep names, facts, decisions and open questions."
+)
+SUMMARY_UPDATE_PROMPT = (
+    "Extend the summary of an earlier conversation with the messages that follow it, "
+    "so it can replace all of them as context. Keep names, facts, decisions and open questions."
+)
+
+# Summarizer: (new messages, summary of the messages before them) -> summary
+Summarizer = Callable[[List[Dict[str, str]], Optional[str]], Awaitable[str]]
+
+# Memoized token counts keyed by message content hash
+_token_cache: "OrderedDict[bytes, int]" = OrderedDict()
+# Summaries keyed by a hash chain over the messages they cover
+_summary_cache: "OrderedDict[bytes, str]" = OrderedDict()
+_encodings = {}
+
+# Usage metrics for trimming
+context_stats = {
+    "requests": 0,
+    "trimmed_requests": 0,
+    "messages_dropped": 0,
+    "tokens_before": 0,
+    "tokens_after": 0,
+    "tokens_saved": 0,
+    "summaries_generated": 0,
+    "summary_failures": 0,
+}
+
+gauge(
+    "chat_context_stats", "Chat history trimming totals", ("stat",),
+    function=lambda: {(name,): value for name, value in context_stats.items()},
+)
+
+
+def _get_tiktoken():
+    global _tiktoken
+    if _tiktoken is None:
+        try:
+            import tiktoken
+            _tiktoken = tiktoken
+        except ImportError:  # pragma: no cover - falls back to a character estimate
+            _tiktoken = False
+    return _tiktoken
+
+
+def _get_encoding(model: str):
+    tiktoken = _get_tiktoken()
+    if not tiktoken:
+        return None
+    encoding = _encodings.get(model)
+    if encoding is None:
+        try:
+            encoding = tiktoken.encoding_for_model(model)
+        except KeyError:
+            encoding = tiktoken.get_encoding("cl100k_base")
+        _encodings[model] = encoding
+    return encoding
+
+
+def _remember(cache: OrderedDict, key: bytes, value: Any, max_size: int) -> None:
+    cache[key] = value
+    if len(cache) > max_size:
+        cache.popitem(last=False)
+
+
+def count_text_tokens(text: str, model: str) -> int:
+    """
+    Count tokens in a string with the model's tokenizer, or estimate when
+    tiktoken is not installed (about four characters per token).
+    """
+    encoding = _get_encoding(model)
+    if encoding is None:
+        return (len(text) + 3) // 4
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def clip_text_tokens(text: str, model: str, max_tokens: int) -> str:
+    """
+    Cut a string down to at most ``max_tokens`` tokens.
+    """
+    encoding = _get_encoding(model)
+    if encoding is None:
+        return text[:max_tokens * 4]
+    tokens = encoding.encode(text, disallowed_special=())
+    return text if len(tokens) <= max_tokens else encoding.decode(tokens[:max_tokens])
+
+
+def count_message_tokens(message: Dict[str, str], model: str) -> int:
+    """
+    Tokens used by one chat message, memoized per message content hash.
+    """
+    key = hashlib.blake2b(
+        f"{model}\x00{message['role']}\x00{message['content']}".encode("utf-8"),
+        digest_size=16,
+    ).digest()
+    tokens = _token_cache.get(key)
+    if tokens is None:
+        tokens = (
+            TOKENS_PER_MESSAGE
+            + count_text_tokens(message["role"], model)
+            + count_text_tokens(message["content"], model)
+        )
+        _remember(_token_cache, key, tokens, settings.CHAT_TOKEN_CACHE_SIZE)
+    else:
+        _token_cache.move_to_end(key)
+    return tokens
+
+
+def count_messages_tokens(messages: List[Dict[str, str]], model: str) -> int:
+    return sum(count_message_tokens(m, model) for m in messages) + TOKENS_PER_REPLY
+
+
+def estimate_request_tokens(messages: List[Dict[str, str]], model: str,
+                            max_tokens: Optional[int] = None) -> int:
+    """
+    Upper estimate of the tokens a completion request will use: the prompt
+    after trimming plus the completion allowance.
+    """
+    prompt_tokens = count_messages_tokens(messages, model)
+    if settings.CHAT_TRIM_STRATEGY != "none":
+        prompt_tokens = min(prompt_tokens, get_token_budget(model, max_tokens))
+    return prompt_tokens + (max_tokens or settings.CHAT_COMPLETION_TOKEN_RESERVE)
+
+
+def get_token_budget(model: str, max_tokens: Optional[int] = None) -> int:
+    """
+    Prompt token budget: the configured budget, capped by what the model's
+    context window leaves after reserving room for the completion.
+    """
+    window = next(
+        (size for prefix, size in sorted(MODEL_CONTEXT_WINDOWS.items(), key=lambda i: -len(i[0]))
+         if model.startswith(prefix)),
+        None,
+    )
+    budget = settings.CHAT_CONTEXT_TOKEN_BUDGET
+    if window is not None:
+        budget = min(budget, window - (max_tokens or settings.CHAT_COMPLETION_TOKEN_RESERVE))
+    return max(budget, 0)
+
+
+def _select_recent(
+    messages: List[Dict[str, str]], counts: List[int], budget: int
+) -> List[int]:
+    """
+    Indices of the messages to keep: leading system messages plus the newest
+    messages that fit the budget. The latest message is always kept.
+    """
+    pinned = []
+    for i, message in enumerate(messages):
+        if message["role"] != "system":
+            break
+        pinned.append(i)
+
+    used = TOKENS_PER_REPLY + sum(counts[i] for i in pinned)
+    kept = []
+    for i in range(len(messages) - 1, len(pinned) - 1, -1):
+        if kept and used + counts[i] > budget:
+            break
+        used += counts[i]
+        kept.append(i)
+
+    return pinned + kept[::-1]
+
+
+async def fit_to_budget(
+    messages: List[Dict[str, str]],
+    model: str,
+    max_tokens: Optional[int] = None,
+    strategy: Optional[str] = None,
+    summarize: Optional[Summarizer] = None
+) -> Dict[str, Any]:
+    """
+    Trim a chat history so the prompt stays under the token budget.
+
+    Strategies:
+    - ``none``: forward the history unchanged
+    - ``truncate``: drop the oldest non-system messages
+    - ``summarize``: replace the dropped messages with a summary produced by
+      ``summarize``, falling back to truncation if summarizing fails. As a
+      conversation grows, the cached summary of the previously dropped
+      messages is extended with only the newly dropped ones.
+    """
+    strategy = strategy or settings.CHAT_TRIM_STRATEGY
+    counts = [count_message_tokens(m, model) for m in messages]
+    before = sum(counts) + TOKENS_PER_REPLY
+    budget = get_token_budget(model, max_tokens)
+
+    context_stats["requests"] += 1
+    context_stats["tokens_before"] += before
+
+    result = messages
+    if strategy != "none" and before > budget:
+        if strategy == "summarize" and summarize is not None:
+            summary_budget = settings.CHAT_SUMMARY_MAX_TOKENS + TOKENS_PER_MESSAGE
+            keep = _select_recent(messages, counts, budget - summary_budget)
+        else:
+            keep = _select_recent(messages, counts, budget)
+
+        kept = set(keep)
+        dropped = [m for i, m in enumerate(messages) if i not in kept]
+        result = [messages[i] for i in keep]
+
+        if dropped and strategy == "summarize" and summarize is not None:
+            try:
+                summary = await _get_summary(dropped, model, summarize)
+            except Exception:
+                # The kept messages already fit the budget on their own
+                context_stats["summary_failures"] += 1
+                logger.warning("Summarizing %d dropped messages failed; truncating", len(dropped), exc_info=True)
+                summary = None
+            if summary is not None:
+                pinned = next((i for i, m in enumerate(result) if m["role"] != "system"), len(result))
+                result = result[:pinned] + [{
+                    "role": "system",
+                    "content": f"Summary of the earlier conversation: {summary}"
+                }] + result[pinned:]
+
+        context_stats["trimmed_requests"] += 1
+        context_stats["messages_dropped"] += len(dropped)
+
+    after = count_messages_tokens(result, model) if result is not messages else before
+    context_stats["tokens_after"] += after
+    context_stats["tokens_saved"] += before - after
+
+    return {
+        "messages": result,
+        "prompt_tokens_before": before,
+        "prompt_tokens_after": after,
+        "prompt_tokens_saved": before - after,
+    }
+
+
+def _summary_input_budget(model: str, previous: Optional[str]) -> int:
+    """
+    Tokens of messages one summarization request can take: what the
+    model's window leaves after the instructions, the previous summary and
+    room for the new summary.
+    """
+    used = 3 * TOKENS_PER_MESSAGE + TOKENS_PER_REPLY + count_text_tokens(SUMMARY_UPDATE_PROMPT, model)
+    if previous is not None:
+        used += count_text_tokens(previous, model)
+    return max(get_token_budget(model, settings.CHAT_SUMMARY_MAX_TOKENS) - used, 1)
+
+
+async def _get_summary(
+    dropped: List[Dict[str, str]],
+    model: str,
+    summarize: Summarizer
+) -> str:
+    """
+    Summary of ``dropped``, built on the longest already summarized prefix.
+
+    Each summary is cached under a hash chain over the messages it covers,
+    so the next turn of the same conversation finds it and only summarizes
+    what was dropped since. Messages are folded in chunks that fit the
+    summarization request, and a single oversized message is clipped.
+    """
+    # keys[i] identifies dropped[:i]
+    keys = [b""]
+    for message in dropped:
+        hasher = hashlib.blake2b(keys[-1], digest_size=16)
+        hasher.update(f"{message['role']}\x00{message['content']}".encode("utf-8"))
+        keys.append(hasher.digest())
+
+    start, summary = 0, None
+    for i in range(len(dropped), 0, -1):
+        cached = _summary_cache.get(keys[i])
+        if cached is not None:
+            _summary_cache.move_to_end(keys[i])
+            start, summary = i, cached
+            break
+
+    while start < len(dropped):
+        budget = _summary_input_budget(model, summary)
+        end, used = start, 0
+        while end < len(dropped):
+            tokens = count_message_tokens(dropped[end], model)
+            if end > start and used + tokens > budget:
+                break
+            used += tokens
+            end += 1
+        chunk = dropped[start:end]
+        if used > budget:
+            chunk = [{
+                "role": chunk[0]["role"],
+                "content": clip_text_tokens(chunk[0]["content"], model, budget - TOKENS_PER_MESSAGE),
+            }]
+
+        summary = await summarize(chunk, summary)
+        context_stats["summaries_generated"] += 1
+        _remember(_summary_cache, keys[end], summary, settings.CHAT_SUMMARY_CACHE_SIZE)
+        start = end
+    return summary
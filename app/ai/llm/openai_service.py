@@ -1,19 +1,43 @@
-from typing import List, Dict, Any, Optional
-import openai
-from openai import AsyncOpenAI
+from typing import List, Dict, Any, AsyncIterator, Optional
 from app.core.config import settings
+from app.core.deadlines import remaining_time
+from app.core.metrics import observe_latency
 from app.schemas.ai import Message
+from app.ai.llm.context_manager import SUMMARY_PROMPT, SUMMARY_UPDATE_PROMPT, count_text_tokens, fit_to_budget
 
-# Initialize OpenAI client
-client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
+# OpenAI client, created on first use
+_client = None
 
 
+def get_client():
+    """
+    Get the shared OpenAI client, importing the SDK on first use
+    """
+    global _client
+    if _client is None:
+        from openai import AsyncOpenAI
+
+        _client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
+    return _client
+
+
+def _request_options() -> Dict[str, Any]:
+    """
+    Per-call options: the request's remaining time as the OpenAI timeout
+    """
+    remaining = remaining_time()
+    if remaining is None:
+        return {}
+    return {"timeout": max(remaining, 0.001)}
+
+
+@observe_latency("openai", "list_models")
 async def list_available_models():
     """
     List available models from OpenAI
     """
     try:
-        response = await client.models.list()
+        response = await get_client().models.list(**_request_options())
         return [
             {
                 "id": model.id,
@@ -26,6 +50,37 @@ async def list_available_models():
         raise Exception(f"Error listing models: {str(e)}")
 
 
+@observe_latency("openai", "summarize")
+async def summarize_messages(
+    messages: List[Dict[str, str]],
+    previous_summary: Optional[str] = None,
+    model: str = settings.DEFAULT_LLM_MODEL
+) -> str:
+    """
+    Summarize chat messages so they can stand in for the originals as context,
+    extending ``previous_summary`` of the messages before them if given
+    """
+    transcript = "\n".join(f"{m['role']}: {m['content']}" for m in messages)
+    if previous_summary is None:
+        prompt = [{"role": "system", "content": SUMMARY_PROMPT}]
+    else:
+        prompt = [
+            {"role": "system", "content": SUMMARY_UPDATE_PROMPT},
+            {"role": "assistant", "content": previous_summary},
+        ]
+    response = await get_client().chat.completions.create(
+        model=model,
+        messages=prompt + [
+            {"role": "user", "content": transcript},
+        ],
+        temperature=0,
+        max_tokens=settings.CHAT_SUMMARY_MAX_TOKENS,
+        **_request_options(),
+    )
+    return response.choices[0].message.content
+
+
+@observe_latency("openai", "chat_completion")
 async def generate_chat_completion(
     messages: List[Message],
     model: str = settings.DEFAULT_LLM_MODEL,
@@ -39,16 +94,24 @@ async def generate_chat_completion(
         # Convert Message objects to dictionaries
         messages_dict = [{"role": msg.role, "content": msg.content} for msg in messages]
         
+        # Keep the prompt under the token budget
+        context = await fit_to_budget(
+            messages_dict,
+            model=model,
+            max_tokens=max_tokens,
+            summarize=lambda dropped, previous: summarize_messages(dropped, previous, model=model)
+        )
+        
         completion_params = {
             "model": model,
-            "messages": messages_dict,
+            "messages": context["messages"],
             "temperature": temperature,
         }
         
         if max_tokens:
             completion_params["max_tokens"] = max_tokens
         
-        response = await client.chat.completions.create(**completion_params)
+        response = await get_client().chat.completions.create(**completion_params, **_request_options())
         
         # Convert response to expected format
         return {
@@ -70,8 +133,81 @@ async def generate_chat_completion(
             "usage": {
                 "prompt_tokens": response.usage.prompt_tokens,
                 "completion_tokens": response.usage.completion_tokens,
-                "total_tokens": response.usage.total_tokens
+                "total_tokens": response.usage.total_tokens,
+                "prompt_tokens_saved": context["prompt_tokens_saved"]
             }
         }
     except Exception as e:
-        raise Exception(f"Error generating completion: {str(e)}") 
\ No newline at end of file
+        raise Exception(f"Error generating completion: {str(e)}")
+
+
+async def stream_chat_completion(
+    messages: List[Message],
+    model: str = settings.DEFAULT_LLM_MODEL,
+    temperature: float = 0.7,
+    max_tokens: Optional[int] = None
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Stream a chat completion from OpenAI's API.
+
+    Yields ``{"delta": text}`` for each piece of the reply, then one
+    ``{"model", "finish_reason", "usage"}`` item. The stream does not report
+    usage, so completion tokens are counted from the streamed text. Closing
+    the generator early closes the upstream request.
+    """
+    try:
+        messages_dict = [{"role": msg.role, "content": msg.content} for msg in messages]
+        
+        # Keep the prompt under the token budget
+        context = await fit_to_budget(
+            messages_dict,
+            model=model,
+            max_tokens=max_tokens,
+            summarize=lambda dropped, previous: summarize_messages(dropped, previous, model=model)
+        )
+        
+        completion_params = {
+            "model": model,
+            "messages": context["messages"],
+            "temperature": temperature,
+            "stream": True,
+        }
+        
+        if max_tokens:
+            completion_params["max_tokens"] = max_tokens
+        
+        stream = await get_client().chat.completions.create(**completion_params, **_request_options())
+    except Exception as e:
+        raise Exception(f"Error generating completion: {str(e)}")
+    
+    pieces = []
+    finish_reason = None
+    response_model = model
+    try:
+        async for chunk in stream:
+            response_model = chunk.model
+            if not chunk.choices:
+                continue
+            choice = chunk.choices[0]
+            if choice.delta.content:
+                pieces.append(choice.delta.content)
+                yield {"delta": choice.delta.content}
+            if choice.finish_reason:
+                finish_reason = choice.finish_reason
+    except Exception as e:
+        raise Exception(f"Error streaming completion: {str(e)}")
+    finally:
+        await stream.response.aclose()
+    
+    prompt_tokens = context["prompt_tokens_after"]
+    completion_tokens = count_text_tokens("".join(pieces), model)
+    yield {
+        "model": response_model,
+        "finish_reason": finish_reason,
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+            "prompt_tokens_saved": context["prompt_tokens_saved"]
+        }
+    }
@@ -0,0 +1,3 @@
+"""
+Embedding search package (vector indexes over text embeddings)
+"""
@@ -0,0 +1,204 @@
+from typing import List, Dict, Any, Optional
+import re
+import threading
+
+from app.ai.custom_models.huggingface_service import embed_texts
+from app.ai.search.vector_index import VectorIndex
+from app.ai.statistical.prediction_service import MODEL_DIR
+from app.core.config import settings
+from app.core.metrics import observe_latency
+from app.utils.concurrency import run_in_threadpool
+
+# Define index storage directory
+INDEX_DIR = MODEL_DIR / "indexes"
+
+# Cache for opened indexes
+index_cache = {}
+_registry_lock = threading.Lock()
+
+_INDEX_NAME_RE = re.compile(r"^[A-Za-z0-9_-]{1,128}$")
+
+
+def _validate_name(name: str) -> None:
+    if not _INDEX_NAME_RE.match(name):
+        raise ValueError(f"Invalid index name: {name}")
+
+
+def _get_index(name: str, dim: Optional[int] = None, model_name: Optional[str] = None,
+               owner: Optional[int] = None) -> Optional[VectorIndex]:
+    """
+    Get an index from the cache or disk, creating it when ``dim`` is given.
+    A cached index that this or another process has dropped is reopened.
+    """
+    with _registry_lock:
+        index = index_cache.get(name)
+        if index is not None and not index.exists():
+            del index_cache[name]
+            index = None
+        if index is None:
+            path = INDEX_DIR / name
+            if dim is None and not path.exists() and not path.with_name(f".{name}.old").exists():
+                return None
+            # Opening takes the index's file lock and recovers an interrupted
+            # compaction; when another process creates the index at the same
+            # time, this opens theirs
+            try:
+                index = VectorIndex(
+                    path,
+                    dim=dim,
+                    quantize=settings.VECTOR_INDEX_QUANTIZE,
+                    block_size=settings.VECTOR_INDEX_BLOCK_SIZE,
+                    metadata={"model": model_name, "owner": owner},
+                )
+            except ValueError:
+                # Not there, and no dimension given to create it
+                return None
+            index_cache[name] = index
+        return index
+
+
+def _check_owner(index: VectorIndex, user_id: Optional[int], is_superuser: bool) -> None:
+    """
+    Only the user who created an index, or an admin, may change it.
+    """
+    if not is_superuser and (user_id is None or index.metadata.get("owner") != user_id):
+        raise PermissionError(f"Not allowed to modify index {index.path.name}")
+
+
+def _maybe_train(index: VectorIndex) -> None:
+    """
+    In "ivf" mode, cluster an index once it is large enough and again each
+    time it has grown fourfold since.
+    """
+    if settings.VECTOR_INDEX_MODE != "ivf":
+        return
+    size = len(index)
+    if size >= settings.VECTOR_INDEX_IVF_MIN_VECTORS and size >= 4 * index.ivf_trained_count:
+        index.train_ivf()
+
+
+@observe_latency("search", "add_documents")
+async def add_documents(
+    index_name: str,
+    ids: List[str],
+    texts: List[str],
+    model_name: Optional[str] = None,
+    user_id: Optional[int] = None,
+    is_superuser: bool = False
+) -> Dict[str, Any]:
+    """
+    Embed texts and add them to a named index, creating it on first use
+    with ``user_id`` as its owner. Existing ids are replaced, so adding to an
+    existing index needs the owner or an admin. Owner and model are checked
+    again on the index actually opened for the add, which another user may
+    have created in the meantime.
+    """
+    _validate_name(index_name)
+    if len(ids) != len(texts):
+        raise ValueError("ids and texts must have the same length")
+
+    def _check_target(index: VectorIndex, model_name: Optional[str]) -> str:
+        _check_owner(index, user_id, is_superuser)
+        model_name = model_name or index.metadata.get("model")
+        if model_name != index.metadata.get("model"):
+            raise ValueError(f"Index {index_name} uses model {index.metadata.get('model')}, not {model_name}")
+        return model_name
+
+    # Fail fast, before embedding, when the index exists
+    index = await run_in_threadpool(_get_index, index_name)
+    if index is not None:
+        model_name = _check_target(index, model_name)
+    model_name = model_name or settings.EMBEDDING_MODEL
+
+    try:
+        embeddings = await embed_texts(texts, model_name=model_name)
+
+        def _add():
+            target = _get_index(index_name, dim=embeddings.shape[1], model_name=model_name, owner=user_id)
+            _check_target(target, model_name)
+            result = target.add(ids, embeddings)
+            _maybe_train(target)
+            return {"name": index_name, **result, "count": len(target)}
+
+        return await run_in_threadpool(_add)
+
+    except (KeyError, PermissionError, ValueError):
+        raise
+    except Exception as e:
+        raise Exception(f"Error adding documents: {str(e)}")
+
+
+@observe_latency("search", "search_index")
+async def search_index(
+    index_name: str,
+    query: str,
+    k: int = 10
+) -> List[Dict[str, Any]]:
+    """
+    The ``k`` documents most similar to a query, best first
+    """
+    _validate_name(index_name)
+    index = await run_in_threadpool(_get_index, index_name)
+    if index is None:
+        raise KeyError(f"Index {index_name} not found")
+
+    try:
+        embedding = await embed_texts([query], model_name=index.metadata.get("model"))
+
+        def _search():
+            nprobe = settings.VECTOR_INDEX_IVF_NPROBE if settings.VECTOR_INDEX_MODE == "ivf" else None
+            return index.search(embedding, k=k, nprobe=nprobe)[0]
+
+        results = await run_in_threadpool(_search)
+        return [{"id": id_, "score": score} for id_, score in results]
+
+    except (KeyError, ValueError):
+        raise
+    except Exception as e:
+        raise Exception(f"Error searching index: {str(e)}")
+
+
+async def delete_documents(
+    index_name: str,
+    ids: List[str],
+    user_id: Optional[int] = None,
+    is_superuser: bool = False
+) -> Dict[str, Any]:
+    """
+    Remove documents from a named index by id. Owner or admin only.
+    """
+    _validate_name(index_name)
+    index = await run_in_threadpool(_get_index, index_name)
+    if index is None:
+        raise KeyError(f"Index {index_name} not found")
+    _check_owner(index, user_id, is_superuser)
+
+    try:
+        deleted = await run_in_threadpool(index.delete, ids)
+        return {"name": index_name, "deleted": deleted, "count": len(index)}
+
+    except KeyError:
+        raise
+    except Exception as e:
+        raise Exception(f"Error deleting documents: {str(e)}")
+
+
+async def drop_index(index_name: str, user_id: Optional[int] = None, is_superuser: bool = False) -> None:
+    """
+    Remove a named index and its files. Owner or admin only.
+    """
+    _validate_name(index_name)
+    index = await run_in_threadpool(_get_index, index_name)
+    if index is None:
+        raise KeyError(f"Index {index_name} not found")
+    _check_owner(index, user_id, is_superuser)
+
+    def _drop():
+        # Waits for running operations; the registry lock keeps the name
+        # from being recreated until the files are gone
+        with index._lock, _registry_lock:
+            if index_cache.get(index_name) is index:
+                del index_cache[index_name]
+            index.drop()
+
+    await run_in_threadpool(_drop)
@@ -0,0 +1,521 @@
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+import json
+import os
+import shutil
+import tempfile
+import threading
+import numpy as np
+
+from app.utils.files import file_lock, file_stamp, stat_stamp
+
+META_NAME = "meta.json"
+IDS_NAME = "ids.txt"
+VECTORS_NAME = "vectors.f32"
+ALIVE_NAME = "alive.u8"
+CODES_NAME = "codes.i8"
+LISTS_NAME = "lists.i32"
+CENTROIDS_NAME = "centroids.npy"
+
+# Smallest allocation, in rows, of the memory-mapped files
+MIN_CAPACITY = 1024
+
+# Candidates re-scored with full vectors per result in quantized IVF search
+RERANK_FACTOR = 4
+
+# Compact once this share of rows is deleted
+COMPACT_RATIO = 0.5
+
+
+def _atomic_write(path: Path, write: Callable[[Any], None], mode: str = "wb") -> None:
+    """
+    Write a file through a temp file in the same directory and rename it into place.
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, mode) as f:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def quantize(vectors: np.ndarray) -> np.ndarray:
+    """
+    Scalar-quantize unit-length vectors to int8 (components scaled by 127).
+    """
+    return np.clip(np.rint(vectors * 127.0), -127, 127).astype(np.int8)
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """
+    Column indices of the ``k`` highest scores per row, best first.
+    """
+    k = min(k, scores.shape[1])
+    if k < scores.shape[1]:
+        part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    else:
+        part = np.broadcast_to(np.arange(scores.shape[1]), scores.shape)
+    order = np.argsort(-np.take_along_axis(scores, part, axis=1), axis=1, kind="stable")
+    return np.take_along_axis(part, order, axis=1)
+
+
+class VectorIndex:
+    """
+    Inner-product vector index persisted as memory-mapped files in a directory.
+
+    Vectors live in one contiguous float32 matrix that grows by doubling. Adds
+    append rows; deletes clear a row's alive flag and the matrix is compacted
+    once half of it is dead. Re-adding an id replaces its vector. ``count`` in
+    the metadata file is written last, so rows past it (from an interrupted
+    add) are ignored and overwritten.
+
+    Search is exact by default: the matrix is scanned in blocks of
+    ``block_size`` rows with one matrix multiply and an ``argpartition`` top-k
+    per block. After ``train_ivf`` the index also keeps an inverted file (rows
+    grouped by nearest centroid) and, when created with ``quantize=True``,
+    int8 codes; IVF search scores only the rows of the ``nprobe`` closest
+    lists, from the codes where available, then re-scores the best candidates
+    exactly. Store unit-length vectors so scores are cosine similarities.
+
+    Several processes may share an index. Updates hold an exclusive lock on
+    the ``.<name>.lock`` file next to the directory and searches a shared
+    one; each first reloads the metadata, ids and arrays if the metadata
+    file changed since this process last read or wrote it. Creating an
+    index holds the exclusive lock too, so when two processes create the
+    same index both end up with the one created first.
+    """
+
+    def __init__(self, path: Path, dim: Optional[int] = None, quantize: bool = False,
+                 block_size: int = 16384, metadata: Optional[Dict[str, Any]] = None,
+                 lock: bool = True):
+        self.path = Path(path)
+        self.block_size = block_size
+        self._lock = threading.RLock()
+        # None for the private copies built by compaction
+        self._lock_path = self.path.with_name(f".{self.path.name}.lock") if lock else None
+        self._file_locked = False
+        self._dropped = False
+        self._meta_stamp = None
+
+        with self._file_lock(shared=False):
+            self.recover(self.path)
+            if not (self.path / META_NAME).exists():
+                if dim is None:
+                    raise ValueError(f"Index {self.path.name} does not exist")
+                self.path.mkdir(parents=True, exist_ok=True)
+                self._meta = {
+                    "dim": dim,
+                    "count": 0,
+                    "capacity": 0,
+                    "deleted": 0,
+                    "quantize": quantize,
+                    "ivf": None,
+                    "metadata": metadata or {},
+                }
+                self._write_meta()
+            self._load(repair=True)
+
+    # Storage
+
+    @staticmethod
+    def recover(path: Path) -> None:
+        """
+        Finish or undo a compaction interrupted by a crash. Between its two
+        renames the index directory is missing and the old files, which are
+        complete, sit in the ``.old`` sibling: move them back. Any other
+        leftover sibling is stale.
+        """
+        path = Path(path)
+        tmp_path = path.with_name(f".{path.name}.compact")
+        old_path = path.with_name(f".{path.name}.old")
+        if not path.exists() and (old_path / META_NAME).exists():
+            os.rename(old_path, path)
+        for leftover in (tmp_path, old_path):
+            if leftover.exists():
+                shutil.rmtree(leftover)
+
+    def _file_lock(self, shared: bool):
+        if self._lock_path is None:
+            return nullcontext()
+        return file_lock(self._lock_path, shared=shared)
+
+    def _check_open(self) -> None:
+        if self._dropped:
+            raise KeyError(f"Index {self.path.name} was dropped")
+
+    def _close(self) -> None:
+        self._dropped = True
+        self._vectors = self._alive = self._codes = self._lists = None
+
+    @contextmanager
+    def _synced(self, exclusive: bool) -> Iterator[None]:
+        """
+        Hold this object's lock and the index's file lock, with the state in
+        memory brought up to date with the files. Nested calls (such as a
+        compaction started by ``add``) reuse the locks already held.
+        """
+        with self._lock:
+            if self._file_locked:
+                self._check_open()
+                yield
+                return
+            with self._file_lock(shared=not exclusive):
+                self._file_locked = True
+                try:
+                    self._check_open()
+                    self._refresh(repair=exclusive)
+                    yield
+                finally:
+                    self._file_locked = False
+
+    def _refresh(self, repair: bool) -> None:
+        """
+        Reload from disk if another process changed the metadata since this
+        one last read or wrote it. Raises KeyError if it dropped the index.
+        """
+        stamp = file_stamp(self.path / META_NAME)
+        if stamp is None:
+            self._close()
+            raise KeyError(f"Index {self.path.name} was dropped")
+        if stamp != self._meta_stamp:
+            self._load(repair)
+
+    def _load(self, repair: bool) -> None:
+        """
+        Read the metadata, ids and arrays. ``repair`` (with the exclusive
+        lock held) also trims ids left by an interrupted add.
+        """
+        with open(self.path / META_NAME, "r", encoding="utf-8") as f:
+            self._meta = json.load(f)
+            self._meta_stamp = stat_stamp(os.fstat(f.fileno()))
+        self.ids = self._load_ids(repair)
+        self._open_arrays()
+        self._rows = {
+            id_: row for row, id_ in enumerate(self.ids) if self._alive[row]
+        }
+        self._centroids: Optional[np.ndarray] = None
+        self._inverted: Optional[Tuple[np.ndarray, np.ndarray]] = None
+        if self._meta["ivf"] is not None:
+            self._centroids = np.load(self.path / CENTROIDS_NAME)
+
+    def exists(self) -> bool:
+        """
+        Whether the index is still on disk; False once this or another
+        process has dropped it.
+        """
+        return not self._dropped and (self.path / META_NAME).exists()
+
+    def drop(self) -> None:
+        """
+        Delete the index's files. Later calls on this object raise KeyError.
+        """
+        with self._synced(exclusive=True):
+            self._close()
+            shutil.rmtree(self.path)
+
+    @property
+    def dim(self) -> int:
+        return self._meta["dim"]
+
+    @property
+    def metadata(self) -> Dict[str, Any]:
+        return self._meta["metadata"]
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def _write_meta(self) -> None:
+        _atomic_write(self.path / META_NAME, lambda f: json.dump(self._meta, f), mode="w")
+        # Our own write; no need to reload it
+        self._meta_stamp = file_stamp(self.path / META_NAME)
+
+    def _load_ids(self, repair: bool) -> List[str]:
+        path = self.path / IDS_NAME
+        count = self._meta["count"]
+        if not path.exists():
+            return []
+        with open(path, "rb") as f:
+            lines = f.read().split(b"\n")
+        ids = [line.decode("utf-8") for line in lines[:count]]
+        if repair and (len(lines) > count + 1 or (len(lines) == count + 1 and lines[count])):
+            # Drop ids appended by an add that did not complete
+            _atomic_write(path, lambda f: f.write("".join(f"{id_}\n" for id_ in ids).encode("utf-8")))
+        return ids
+
+    def _map(self, name: str, dtype, width: int) -> Optional[np.memmap]:
+        capacity = self._meta["capacity"]
+        if capacity == 0:
+            return None
+        shape = (capacity, width) if width > 1 else (capacity,)
+        return np.memmap(self.path / name, dtype=dtype, mode="r+", shape=shape)
+
+    def _files(self) -> List[Tuple[str, Any, int]]:
+        files = [(VECTORS_NAME, np.float32, self.dim), (ALIVE_NAME, np.uint8, 1)]
+        if self._meta["quantize"]:
+            files.append((CODES_NAME, np.int8, self.dim))
+        if self._meta["ivf"] is not None:
+            files.append((LISTS_NAME, np.int32, 1))
+        return files
+
+    def _open_arrays(self) -> None:
+        self._vectors = self._map(VECTORS_NAME, np.float32, self.dim)
+        self._alive = self._map(ALIVE_NAME, np.uint8, 1)
+        self._codes = self._map(CODES_NAME, np.int8, self.dim) if self._meta["quantize"] else None
+        self._lists = self._map(LISTS_NAME, np.int32, 1) if self._meta["ivf"] is not None else None
+
+    def _flush(self) -> None:
+        for array in (self._vectors, self._alive, self._codes, self._lists):
+            if array is not None:
+                array.flush()
+
+    def _reserve(self, rows: int) -> None:
+        """
+        Grow the files (doubling) so they hold at least ``rows`` rows.
+        """
+        capacity = self._meta["capacity"]
+        if rows <= capacity:
+            return
+        new_capacity = max(MIN_CAPACITY, capacity * 2, rows)
+        self._flush()
+        for name, dtype, width in self._files():
+            with open(self.path / name, "ab") as f:
+                f.truncate(new_capacity * width * np.dtype(dtype).itemsize)
+        self._meta["capacity"] = new_capacity
+        self._open_arrays()
+
+    # Updates
+
+    def add(self, ids: List[str], vectors: np.ndarray) -> Dict[str, int]:
+        """
+        Append vectors under the given ids, replacing existing ones.
+        """
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        if vectors.ndim != 2 or vectors.shape != (len(ids), self.dim):
+            raise ValueError(f"Expected {len(ids)} vectors of dimension {self.dim}")
+        if len(set(ids)) != len(ids):
+            raise ValueError("Duplicate ids in one add")
+        if any("\n" in id_ for id_ in ids):
+            raise ValueError("Ids must not contain newlines")
+
+        with self._synced(exclusive=True):
+            start = self._meta["count"]
+            end = start + len(ids)
+            self._reserve(end)
+            self._vectors[start:end] = vectors
+            self._alive[start:end] = 1
+            if self._codes is not None:
+                self._codes[start:end] = quantize(vectors)
+            if self._lists is not None:
+                self._lists[start:end] = self._assign(vectors)
+                self._inverted = None
+            self._flush()
+
+            with open(self.path / IDS_NAME, "ab") as f:
+                f.write("".join(f"{id_}\n" for id_ in ids).encode("utf-8"))
+                f.flush()
+                os.fsync(f.fileno())
+
+            replaced = [self._rows[id_] for id_ in ids if id_ in self._rows]
+            self._meta["count"] = end
+            self._meta["deleted"] += len(replaced)
+            self._write_meta()
+
+            if replaced:
+                self._alive[replaced] = 0
+                self._alive.flush()
+            self.ids.extend(ids)
+            self._rows.update(zip(ids, range(start, end)))
+            self._maybe_compact()
+            return {"added": len(ids) - len(replaced), "replaced": len(replaced)}
+
+    def delete(self, ids: List[str]) -> int:
+        """
+        Delete vectors by id; unknown ids are ignored. Returns the number deleted.
+        """
+        with self._synced(exclusive=True):
+            rows = [self._rows.pop(id_) for id_ in ids if id_ in self._rows]
+            if not rows:
+                return 0
+            self._alive[rows] = 0
+            self._alive.flush()
+            self._meta["deleted"] += len(rows)
+            self._write_meta()
+            self._maybe_compact()
+            return len(rows)
+
+    def _maybe_compact(self) -> None:
+        count = self._meta["count"]
+        if count >= MIN_CAPACITY and self._meta["deleted"] >= count * COMPACT_RATIO:
+            self.compact()
+
+    def compact(self) -> None:
+        """
+        Rewrite the index without deleted rows. The new files are built in a
+        sibling directory, which then replaces this one.
+        """
+        with self._synced(exclusive=True):
+            self._flush()
+            live = np.flatnonzero(self._alive[:self._meta["count"]]) if self._meta["count"] else np.array([], int)
+            tmp_path = self.path.with_name(f".{self.path.name}.compact")
+            if tmp_path.exists():
+                shutil.rmtree(tmp_path)
+            compacted = VectorIndex(
+                tmp_path, dim=self.dim, quantize=self._meta["quantize"],
+                block_size=self.block_size, metadata=self.metadata, lock=False,
+            )
+            ids = [self.ids[row] for row in live]
+            for start in range(0, len(live), self.block_size):
+                rows = live[start:start + self.block_size]
+                compacted.add(ids[start:start + self.block_size], self._vectors[rows])
+            if self._centroids is not None:
+                compacted._set_centroids(self._centroids, self._meta["ivf"]["trained_count"])
+
+            old_path = self.path.with_name(f".{self.path.name}.old")
+            if old_path.exists():
+                shutil.rmtree(old_path)
+            os.rename(self.path, old_path)
+            os.rename(tmp_path, self.path)
+            shutil.rmtree(old_path)
+
+            compacted.path = self.path
+            self.__dict__.update({
+                key: value for key, value in compacted.__dict__.items()
+                if key not in ("_lock", "_lock_path", "_file_locked")
+            })
+            # Memory maps follow the renamed files, but reopen them to be explicit
+            self._open_arrays()
+
+    # IVF
+
+    def _assign(self, vectors: np.ndarray) -> np.ndarray:
+        return (vectors @ self._centroids.T).argmax(axis=1).astype(np.int32)
+
+    def _set_centroids(self, centroids: np.ndarray, trained_count: int) -> None:
+        self._centroids = np.ascontiguousarray(centroids, dtype=np.float32)
+        _atomic_write(self.path / CENTROIDS_NAME, lambda f: np.save(f, self._centroids))
+        first_training = self._meta["ivf"] is None
+        self._meta["ivf"] = {"nlist": len(centroids), "trained_count": trained_count}
+        if first_training:
+            capacity = self._meta["capacity"]
+            with open(self.path / LISTS_NAME, "ab") as f:
+                f.truncate(capacity * np.dtype(np.int32).itemsize)
+            self._lists = self._map(LISTS_NAME, np.int32, 1)
+        count = self._meta["count"]
+        for start in range(0, count, self.block_size):
+            end = min(start + self.block_size, count)
+            self._lists[start:end] = self._assign(np.asarray(self._vectors[start:end]))
+        self._flush()
+        self._write_meta()
+        self._inverted = None
+
+    def train_ivf(self, nlist: Optional[int] = None, iterations: int = 10, seed: int = 0) -> None:
+        """
+        Cluster the live vectors (spherical k-means on a sample) into ``nlist``
+        lists, about 4 * sqrt(n) by default, and assign every row to one.
+        """
+        with self._synced(exclusive=True):
+            live = np.flatnonzero(self._alive[:self._meta["count"]]) if self._meta["count"] else np.array([], int)
+            nlist = nlist or max(1, int(4 * np.sqrt(len(live))))
+            if len(live) < nlist:
+                raise ValueError(f"Need at least {nlist} vectors to train {nlist} lists")
+
+            rng = np.random.default_rng(seed)
+            sample_rows = np.sort(rng.choice(live, size=min(len(live), nlist * 64), replace=False))
+            sample = np.asarray(self._vectors[sample_rows])
+            centroids = sample[rng.choice(len(sample), size=nlist, replace=False)].copy()
+            for _ in range(iterations):
+                assignment = (sample @ centroids.T).argmax(axis=1)
+                sums = np.zeros_like(centroids)
+                np.add.at(sums, assignment, sample)
+                norms = np.linalg.norm(sums, axis=1, keepdims=True)
+                # Empty lists keep their previous centroid
+                np.divide(sums, norms, out=centroids, where=norms > 0)
+            self._set_centroids(centroids, len(live))
+
+    @property
+    def ivf_trained_count(self) -> int:
+        ivf = self._meta["ivf"]
+        return 0 if ivf is None else ivf["trained_count"]
+
+    def _inverted_lists(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Rows grouped by list, and each list's offsets into them.
+        """
+        if self._inverted is None:
+            lists = np.asarray(self._lists[:self._meta["count"]])
+            order = np.argsort(lists, kind="stable").astype(np.int64)
+            offsets = np.searchsorted(lists[order], np.arange(len(self._centroids) + 1))
+            self._inverted = (order, offsets)
+        return self._inverted
+
+    # Search
+
+    def search(self, queries: np.ndarray, k: int = 10,
+               nprobe: Optional[int] = None) -> List[List[Tuple[str, float]]]:
+        """
+        The ``k`` best (id, score) pairs for each query by inner product.
+        Uses the inverted file when trained and ``nprobe`` is given.
+        """
+        queries = np.ascontiguousarray(queries, dtype=np.float32)
+        if queries.ndim == 1:
+            queries = queries[None, :]
+        if queries.shape[1] != self.dim:
+            raise ValueError(f"Expected queries of dimension {self.dim}")
+
+        with self._synced(exclusive=False):
+            if not self._rows:
+                return [[] for _ in queries]
+            if nprobe and self._centroids is not None:
+                return [self._search_ivf(query, k, nprobe) for query in queries]
+            return self._search_exact(queries, k)
+
+    def _search_exact(self, queries: np.ndarray, k: int) -> List[List[Tuple[str, float]]]:
+        count = self._meta["count"]
+        candidate_scores, candidate_rows = [], []
+        for start in range(0, count, self.block_size):
+            end = min(start + self.block_size, count)
+            scores = queries @ self._vectors[start:end].T
+            dead = self._alive[start:end] == 0
+            if dead.any():
+                scores[:, dead] = -np.inf
+            top = _top_k(scores, k)
+            candidate_scores.append(np.take_along_axis(scores, top, axis=1))
+            candidate_rows.append(top + start)
+
+        scores = np.hstack(candidate_scores)
+        rows = np.hstack(candidate_rows)
+        top = _top_k(scores, k)
+        return [
+            self._results(rows[i, top[i]], scores[i, top[i]])
+            for i in range(len(queries))
+        ]
+
+    def _search_ivf(self, query: np.ndarray, k: int, nprobe: int) -> List[Tuple[str, float]]:
+        order, offsets = self._inverted_lists()
+        probes = _top_k((query @ self._centroids.T)[None, :], nprobe)[0]
+        rows = np.concatenate([order[offsets[p]:offsets[p + 1]] for p in probes])
+        rows = rows[self._alive[rows] == 1]
+        if len(rows) == 0:
+            return []
+
+        if self._codes is not None and len(rows) > k * RERANK_FACTOR:
+            # Shortlist on the int8 codes, then re-score exactly
+            approximate = self._codes[rows].astype(np.float32) @ query
+            rows = rows[_top_k(approximate[None, :], k * RERANK_FACTOR)[0]]
+
+        scores = self._vectors[rows] @ query
+        top = _top_k(scores[None, :], k)[0]
+        return self._results(rows[top], scores[top])
+
+    def _results(self, rows: np.ndarray, scores: np.ndarray) -> List[Tuple[str, float]]:
+        return [
+            (self.ids[row], score)
+            for row, score in zip(rows.tolist(), scores.tolist())
+            if score != -np.inf
+        ]
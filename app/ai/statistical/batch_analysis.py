@@ -0,0 +1,136 @@
+"""
+Vectorized statistics and linear trend forecasts for many time series at once.
+
+Series are bucketed by period (like ``DataFrame.resample(freq).mean()``) onto
+one shared grid of period ordinals, giving a 2-D array with NaN for periods a
+series has no points in. Trends are fitted by closed-form least squares over
+the observed cells of every row in a single pass.
+"""
+from typing import Any, Dict, List, Sequence, Tuple
+import numpy as np
+
+
+def align_series(ordinals: Sequence[np.ndarray], values: Sequence[np.ndarray],
+                 max_cells: int = 0) -> Tuple[int, np.ndarray]:
+    """
+    Bucket each series' points by period ordinal and lay them out on a shared
+    grid. Returns the ordinal of the first column and a (series, periods)
+    array of bucket means, NaN where a series has no points.
+    """
+    lengths = np.fromiter((len(o) for o in ordinals), dtype=np.int64, count=len(ordinals))
+    flat_ordinals = np.concatenate(ordinals).astype(np.int64, copy=False)
+    flat_values = np.concatenate(values).astype(np.float64, copy=False)
+    rows = np.repeat(np.arange(len(ordinals), dtype=np.int64), lengths)
+
+    mask = ~np.isnan(flat_values)
+    if not mask.all():
+        flat_ordinals, flat_values, rows = flat_ordinals[mask], flat_values[mask], rows[mask]
+    if len(flat_values) == 0:
+        raise ValueError("No data points")
+
+    origin = int(flat_ordinals.min())
+    width = int(flat_ordinals.max()) - origin + 1
+    cells = len(ordinals) * width
+    if max_cells and cells > max_cells:
+        raise ValueError(
+            f"Aligned series would span {width} periods x {len(ordinals)} series; "
+            f"the limit is {max_cells} cells"
+        )
+
+    index = rows * width + (flat_ordinals - origin)
+    sums = np.bincount(index, weights=flat_values, minlength=cells)
+    counts = np.bincount(index, minlength=cells)
+    with np.errstate(invalid="ignore"):
+        grid = sums / counts
+    return origin, grid.reshape(len(ordinals), width)
+
+
+def analyze_matrix(grid: np.ndarray, periods_to_forecast: int) -> Dict[str, np.ndarray]:
+    """
+    Per-row statistics, trend and forecast of a (series, periods) array with
+    NaN gaps. The time index of a row counts periods from its first observed
+    one, as in ``analyze_timeseries``; rows must have at least one value.
+    """
+    valid = ~np.isnan(grid)
+    n = valid.sum(axis=1)
+    if not n.all():
+        raise ValueError("Every series needs at least one data point")
+
+    width = grid.shape[1]
+    t = np.arange(width, dtype=np.float64)
+    y = np.where(valid, grid, 0.0)
+
+    mean = y.sum(axis=1) / n
+    t_mean = valid @ t / n
+    # Deviations from the row means, zero in the gaps
+    dt = np.where(valid, t - t_mean[:, None], 0.0)
+    dy = np.where(valid, grid - mean[:, None], 0.0)
+    s_tt = np.einsum("ij,ij->i", dt, dt)
+    s_ty = np.einsum("ij,ij->i", dt, dy)
+    s_yy = np.einsum("ij,ij->i", dy, dy)
+
+    slope = np.divide(s_ty, s_tt, out=np.zeros_like(s_ty), where=s_tt > 0)
+    intercept = mean - slope * t_mean
+
+    first = valid.argmax(axis=1)
+    last = width - 1 - valid[:, ::-1].argmax(axis=1)
+    future = last[:, None] + 1 + np.arange(periods_to_forecast)
+    forecast = intercept[:, None] + slope[:, None] * future
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        std = np.where(n > 1, np.sqrt(s_yy / (n - 1)), np.nan)
+
+    return {
+        "points": n,
+        "mean": mean,
+        "std": std,
+        "min": np.where(valid, grid, np.inf).min(axis=1),
+        "max": np.where(valid, grid, -np.inf).max(axis=1),
+        "slope": slope,
+        # Relative to each row's first observed period
+        "intercept": intercept + slope * first,
+        "last": last,
+        "forecast": forecast,
+    }
+
+
+def analyze_batch(names: List[str], ordinals: Sequence[np.ndarray], values: Sequence[np.ndarray],
+                  freq: str, periods_to_forecast: int, max_cells: int = 0) -> List[Dict[str, Any]]:
+    """
+    Analyze many series given as period ordinals, returning one result per
+    series in the shape of ``SeriesState.analyze``.
+    """
+    import pandas as pd
+
+    origin, grid = align_series(ordinals, values, max_cells=max_cells)
+    result = analyze_matrix(grid, periods_to_forecast)
+
+    # Forecast dates depend only on the last period, which most series share
+    last_periods, inverse = np.unique(result["last"] + origin, return_inverse=True)
+    date_lists = [
+        pd.period_range(
+            start=pd.Period(ordinal=int(last) + 1, freq=freq),
+            periods=periods_to_forecast,
+        ).to_timestamp(how="start").strftime("%Y-%m-%d").tolist()
+        for last in last_periods
+    ]
+
+    columns = zip(
+        names,
+        result["mean"].tolist(), result["std"].tolist(),
+        result["min"].tolist(), result["max"].tolist(),
+        result["slope"].tolist(), result["intercept"].tolist(),
+        result["points"].tolist(), result["forecast"].tolist(), inverse.tolist(),
+    )
+    return [
+        {
+            "name": name,
+            "freq": freq,
+            "statistics": {"mean": mean, "std": std, "min": min_val, "max": max_val},
+            "forecast": forecast,
+            "forecast_dates": date_lists[dates],
+            "trend": {"slope": slope, "intercept": intercept},
+            "points": points,
+        }
+        for name, mean, std, min_val, max_val, slope, intercept, points, forecast, dates in columns
+    ]
@@ -0,0 +1,289 @@
+from typing import Any, Callable, Dict, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+import json
+import logging
+import os
+import tempfile
+import threading
+import numpy as np
+
+from app.utils.files import FileStamp, file_lock, stat_stamp
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = "manifest.json"
+MANIFEST_LOCK_NAME = ".manifest.lock"
+
+
+class ModelEntry:
+    """
+    A loaded model version published in the in-memory registry
+    """
+    __slots__ = ("version", "model", "manifest_stamp")
+
+    def __init__(self, version: int, model: Any, manifest_stamp: Optional[FileStamp]):
+        self.version = version
+        self.model = model
+        self.manifest_stamp = manifest_stamp
+
+
+def _atomic_write(path: Path, write: Callable[[Any], None], mode: str = "wb") -> None:
+    """
+    Write a file through a temp file in the same directory and rename it into place.
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, mode) as f:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def validate_model(model: Any, sample: Optional[np.ndarray] = None) -> None:
+    """
+    Sanity check a model before publishing it.
+    """
+    method = getattr(model, "predict", None) or getattr(model, "transform", None)
+    if method is None:
+        raise ValueError(f"{type(model).__name__} has no predict or transform method")
+
+    if sample is None:
+        n_features = getattr(model, "n_features_in_", None)
+        if n_features is None:
+            return
+        sample = np.zeros((1, n_features))
+
+    output = np.asarray(method(sample[:1]), dtype=np.float64)
+    if not np.all(np.isfinite(output)):
+        raise ValueError("Model produced non-finite output on validation sample")
+
+
+class ModelRegistry:
+    """
+    Versioned model artifacts on disk with an in-memory registry of loaded models.
+
+    Each model lives in ``<base_dir>/<name>/`` as ``v<N>.joblib`` files plus a
+    ``manifest.json`` naming the current version. Artifacts and manifests are
+    written to temp files and atomically renamed, so readers never observe a
+    partial file. When another process publishes a new version, requests keep
+    using the loaded model while the new one is loaded and validated in the
+    background, then swapped in.
+    """
+
+    def __init__(self, base_dir: Path, versions_to_keep: int = 3):
+        self.base_dir = base_dir
+        self.versions_to_keep = max(versions_to_keep, 2)
+        self._entries: Dict[str, ModelEntry] = {}
+        self._lock = threading.Lock()
+        self._loading = set()
+        self._loader = ThreadPoolExecutor(max_workers=1, thread_name_prefix="model-loader")
+
+    def _model_dir(self, name: str) -> Path:
+        return self.base_dir / name
+
+    def _read_manifest(self, name: str) -> Tuple[Optional[Dict[str, Any]], Optional[FileStamp]]:
+        """
+        The manifest and the stamp of the very file it was read from.
+        """
+        path = self._model_dir(name) / MANIFEST_NAME
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f), stat_stamp(os.fstat(f.fileno()))
+        except FileNotFoundError:
+            return None, None
+
+    def _claim_version(self, model_dir: Path, start: int) -> Tuple[int, Path]:
+        """
+        Reserve the next free version file, safe against concurrent writers.
+        """
+        version = start
+        while True:
+            path = model_dir / f"v{version:06d}.joblib"
+            try:
+                os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                return version, path
+            except FileExistsError:
+                version += 1
+
+    def save(self, name: str, model: Any, sample: Optional[np.ndarray] = None) -> Tuple[int, Path]:
+        """
+        Persist a new model version, make it current and publish it in memory.
+        A version saved concurrently by another process that is newer than
+        this one stays current.
+        """
+        validate_model(model, sample)
+
+        model_dir = self._model_dir(name)
+        model_dir.mkdir(parents=True, exist_ok=True)
+
+        manifest, _ = self._read_manifest(name)
+        versions = manifest["versions"] if manifest else []
+        latest = max((v["version"] for v in versions), default=0)
+
+        version, path = self._claim_version(model_dir, latest + 1)
+        import joblib
+
+        try:
+            _atomic_write(path, lambda f: joblib.dump(model, f))
+        except BaseException:
+            # Give back the claimed version rather than leave an empty file
+            path.unlink(missing_ok=True)
+            raise
+
+        # Other processes may be saving too: update the manifest under a lock,
+        # from a fresh read, so no version they added is lost
+        with file_lock(model_dir / MANIFEST_LOCK_NAME):
+            manifest, _ = self._read_manifest(name)
+            versions = [v for v in (manifest["versions"] if manifest else []) if v["version"] != version]
+            versions.append({
+                "version": version,
+                "file": path.name,
+                "created_at": datetime.utcnow().isoformat()
+            })
+            versions.sort(key=lambda v: v["version"])
+            stale, versions = versions[:-self.versions_to_keep], versions[-self.versions_to_keep:]
+
+            current = max(manifest["current"] if manifest else 0, version)
+
+            manifest_path = model_dir / MANIFEST_NAME
+            _atomic_write(
+                manifest_path,
+                lambda f: json.dump({"name": name, "current": current, "versions": versions}, f),
+                mode="w",
+            )
+            if current == version:
+                self.publish(name, version, model, stat_stamp(manifest_path.stat()))
+
+            for entry in stale:
+                try:
+                    (model_dir / entry["file"]).unlink()
+                except FileNotFoundError:
+                    pass
+
+        return version, path
+
+    def publish(self, name: str, version: int, model: Any, manifest_stamp: Optional[FileStamp]) -> None:
+        """
+        Atomically make a loaded model the one served for ``name``.
+        An older version than the one served is not published, but its
+        manifest stamp is kept, so an unchanged manifest is not re-read.
+        """
+        with self._lock:
+            current = self._entries.get(name)
+            if current is not None and current.version > version:
+                current.manifest_stamp = manifest_stamp
+                return
+            self._entries[name] = ModelEntry(version, model, manifest_stamp)
+
+    def _load_version(self, name: str, manifest: Dict[str, Any], stamp: FileStamp) -> Any:
+        version = manifest["current"]
+        entry = next(v for v in manifest["versions"] if v["version"] == version)
+        import joblib
+
+        model = joblib.load(self._model_dir(name) / entry["file"])
+        validate_model(model)
+        self.publish(name, version, model, stamp)
+        return model
+
+    def _background_load(self, name: str, manifest: Dict[str, Any], stamp: FileStamp) -> None:
+        try:
+            self._load_version(name, manifest, stamp)
+        except Exception:
+            logger.exception("Failed to load version %s of model %s", manifest.get("current"), name)
+        finally:
+            with self._lock:
+                self._loading.discard(name)
+
+    def get(self, name: str) -> Any:
+        """
+        Return the model served for ``name``.
+
+        The fast path is one ``stat`` of the manifest, compared by inode, size
+        and mtime. When it has changed, the manifest is read and its
+        ``current`` version compared with the loaded one. A newer version
+        published by another process is warmed in the background while the
+        loaded version keeps serving.
+        """
+        manifest_path = self._model_dir(name) / MANIFEST_NAME
+        try:
+            stamp = stat_stamp(manifest_path.stat())
+        except FileNotFoundError:
+            stamp = None
+
+        with self._lock:
+            entry = self._entries.get(name)
+        if entry is not None and entry.manifest_stamp == stamp:
+            return entry.model
+
+        if stamp is None:
+            return self._get_legacy(name, entry)
+
+        manifest, stamp = self._read_manifest(name)
+        if manifest is None:
+            return self._get_legacy(name, entry)
+        if entry is None:
+            return self._load_version(name, manifest, stamp)
+
+        if manifest["current"] <= entry.version:
+            # Nothing newer to load; remember the manifest as seen
+            self.publish(name, entry.version, entry.model, stamp)
+        else:
+            with self._lock:
+                start = name not in self._loading
+                self._loading.add(name)
+            if start:
+                self._loader.submit(self._background_load, name, manifest, stamp)
+        return entry.model
+
+    def _get_legacy(self, name: str, entry: Optional[ModelEntry]) -> Any:
+        """
+        Serve unversioned ``<name>.joblib`` files written by older releases.
+        """
+        if entry is not None:
+            return entry.model
+
+        legacy_path = self.base_dir / f"{name}.joblib"
+        if not legacy_path.exists():
+            raise FileNotFoundError(f"Model {name} not found")
+
+        import joblib
+
+        model = joblib.load(legacy_path)
+        self.publish(name, 0, model, None)
+        return model
+
+    def current_path(self, name: str) -> Optional[Path]:
+        manifest, _ = self._read_manifest(name)
+        if manifest is None:
+            return None
+        entry = next(v for v in manifest["versions"] if v["version"] == manifest["current"])
+        return self._model_dir(name) / entry["file"]
+
+    def warm_swap(self, name: str) -> int:
+        """
+        Load and validate the manifest's current version, then publish it.
+        Returns the version now being served.
+        """
+        manifest, stamp = self._read_manifest(name)
+        if manifest is None:
+            raise FileNotFoundError(f"Model {name} not found")
+        with self._lock:
+            entry = self._entries.get(name)
+        if entry is None or entry.version != manifest["current"]:
+            self._load_version(name, manifest, stamp)
+        return manifest["current"]
+
+    def versions(self, name: str) -> Dict[str, Any]:
+        manifest, _ = self._read_manifest(name)
+        if manifest is None:
+            raise FileNotFoundError(f"Model {name} not found")
+        with self._lock:
+            entry = self._entries.get(name)
+        return {**manifest, "loaded": entry.version if entry else None}
@@ -1,19 +1,41 @@
-from typing import List, Dict, Any, Optional
+# pandas and scikit-learn are imported where they are used, so importing
+# this module (and starting the app) does not pay for them
+from typing import List, Dict, Any, Optional, Union
 import numpy as np
-import pandas as pd
-from sklearn.linear_model import LinearRegression, LogisticRegression
-from sklearn.cluster import KMeans
-from sklearn.preprocessing import StandardScaler
-import joblib
 import os
-import asyncio
 from pathlib import Path
 
-# Define model storage directory
+from app.core.config import settings
+from app.core.metrics import gauge, observe_latency
+from app.ai.statistical.batch_analysis import analyze_batch
+from app.ai.statistical.model_registry import ModelRegistry
+from app.ai.statistical.result_cache import CachedResult, ResultCache, fingerprint
+from app.ai.statistical.training_pool import fit_in_process
+from app.utils.concurrency import run_in_threadpool
+
+# Define model storage directory (created on first write)
 MODEL_DIR = Path("./models/statistical")
-MODEL_DIR.mkdir(parents=True, exist_ok=True)
 
+# Versioned model artifacts and the models loaded from them
+model_registry = ModelRegistry(MODEL_DIR, versions_to_keep=settings.MODEL_VERSIONS_TO_KEEP)
+
+# Nanoseconds per epoch timestamp unit
+_EPOCH_UNIT_NS = {"s": 1_000_000_000, "ms": 1_000_000, "us": 1_000, "ns": 1}
+
+# Cache for time series analysis results
+timeseries_cache = ResultCache(
+    max_entries=settings.TIMESERIES_CACHE_SIZE,
+    disk_dir=MODEL_DIR / "cache" / "timeseries" if settings.TIMESERIES_CACHE_DISK else None,
+    disk_max_entries=settings.TIMESERIES_CACHE_DISK_ENTRIES,
+)
 
+gauge(
+    "timeseries_cache_stats", "Time series result cache entries, hits and misses", ("stat",),
+    function=lambda: {(name,): value for name, value in timeseries_cache.stats().items()},
+)
+
+
+@observe_latency("statistical", "train_linear_regression")
 async def train_linear_regression(
     X_train: List[List[float]],
     y_train: List[float],
@@ -28,15 +50,15 @@ async def train_linear_regression(
         y = np.array(y_train)
         
         # Train model in a separate thread
-        loop = asyncio.get_event_loop()
-        
-        def _train_model():
-            model = LinearRegression()
-            model.fit(X, y)
+        def _train_model(model=None):
+            if model is None:
+                from sklearn.linear_model import LinearRegression
+                
+                model = LinearRegression()
+                model.fit(X, y)
             
-            # Save the model
-            model_path = MODEL_DIR / f"{model_name}.joblib"
-            joblib.dump(model, model_path)
+            # Save a new model version and start serving it
+            version, model_path = model_registry.save(model_name, model, sample=X)
             
             # Get model metrics
             score = model.score(X, y)
@@ -48,46 +70,67 @@ async def train_linear_regression(
                 "score": score,
                 "coefficients": coef,
                 "intercept": intercept,
+                "version": version,
                 "model_path": str(model_path)
             }
         
-        return await loop.run_in_executor(None, _train_model)
+        if settings.TRAINING_BACKEND == "process":
+            # Fit in a training process, then save and score the result here
+            model = await fit_in_process("linear_regression", X, y)
+            return await run_in_threadpool(_train_model, model)
+        
+        return await run_in_threadpool(_train_model)
     
     except Exception as e:
         raise Exception(f"Error training linear regression model: {str(e)}")
 
 
+@observe_latency("statistical", "predict_linear_regression")
 async def predict_linear_regression(
     X_test: List[List[float]],
-    model_name: str = "linear_regression"
-) -> List[float]:
+    model_name: str = "linear_regression",
+    as_array: bool = False
+) -> Union[List[float], np.ndarray]:
     """
-    Make predictions with a trained linear regression model
+    Make predictions with a trained linear regression model.
+    With ``as_array`` the NumPy array is returned as-is instead of a list.
     """
     try:
         # Convert to numpy array
         X = np.array(X_test)
         
         # Load model and predict in a separate thread
-        loop = asyncio.get_event_loop()
-        
         def _predict():
-            model_path = MODEL_DIR / f"{model_name}.joblib"
-            
-            if not model_path.exists():
-                raise FileNotFoundError(f"Model {model_name} not found")
-            
-            model = joblib.load(model_path)
-            predictions = model.predict(X).tolist()
+            model = model_registry.get(model_name)
+            predictions = model.predict(X)
+            if not as_array:
+                predictions = predictions.tolist()
             
             return predictions
         
-        return await loop.run_in_executor(None, _predict)
+        return await run_in_threadpool(_predict)
     
+    except FileNotFoundError:
+        raise
     except Exception as e:
         raise Exception(f"Error making predictions: {str(e)}")
 
 
+async def reload_model(model_name: str) -> Dict[str, Any]:
+    """
+    Load the current version of a model from disk and swap it in once validated
+    """
+    try:
+        await run_in_threadpool(model_registry.warm_swap, model_name)
+        return await run_in_threadpool(model_registry.versions, model_name)
+    
+    except FileNotFoundError:
+        raise
+    except Exception as e:
+        raise Exception(f"Error reloading model: {str(e)}")
+
+
+@observe_latency("statistical", "perform_clustering")
 async def perform_clustering(
     data: List[List[float]],
     n_clusters: int = 3,
@@ -101,23 +144,25 @@ async def perform_clustering(
         X = np.array(data)
         
         # Perform clustering in a separate thread
-        loop = asyncio.get_event_loop()
-        
-        def _cluster():
-            # Standardize data
-            scaler = StandardScaler()
-            X_scaled = scaler.fit_transform(X)
-            
-            # Train KMeans model
-            kmeans = KMeans(n_clusters=n_clusters, random_state=42)
-            kmeans.fit(X_scaled)
-            
-            # Save models
-            model_path = MODEL_DIR / f"{model_name}.joblib"
-            scaler_path = MODEL_DIR / f"{model_name}_scaler.joblib"
+        def _cluster(fitted=None):
+            if fitted is None:
+                from sklearn.cluster import KMeans
+                from sklearn.preprocessing import StandardScaler
+                
+                # Standardize data
+                scaler = StandardScaler()
+                X_scaled = scaler.fit_transform(X)
+                
+                # Train KMeans model
+                kmeans = KMeans(n_clusters=n_clusters, random_state=42)
+                kmeans.fit(X_scaled)
+            else:
+                scaler, kmeans = fitted
+                X_scaled = scaler.transform(X)
             
-            joblib.dump(kmeans, model_path)
-            joblib.dump(scaler, scaler_path)
+            # Save new model versions
+            model_registry.save(f"{model_name}_scaler", scaler, sample=X)
+            version, model_path = model_registry.save(model_name, kmeans, sample=X_scaled)
             
             # Get results
             labels = kmeans.labels_.tolist()
@@ -130,31 +175,61 @@ async def perform_clustering(
                 "labels": labels,
                 "centroids": centroids,
                 "inertia": inertia,
+                "version": version,
                 "model_path": str(model_path)
             }
         
-        return await loop.run_in_executor(None, _cluster)
+        if settings.TRAINING_BACKEND == "process":
+            fitted = await fit_in_process(
+                "kmeans", X, params={"n_clusters": n_clusters, "random_state": 42}
+            )
+            return await run_in_threadpool(_cluster, fitted)
+        
+        return await run_in_threadpool(_cluster)
     
     except Exception as e:
         raise Exception(f"Error performing clustering: {str(e)}")
 
 
+@observe_latency("statistical", "analyze_timeseries")
 async def analyze_timeseries(
-    dates: List[str],
+    dates: Union[List[str], List[int]],
     values: List[float],
     freq: str = "D",
-    periods_to_forecast: int = 10
+    periods_to_forecast: int = 10,
+    epoch_unit: Optional[str] = None,
+    use_cache: bool = True
 ) -> Dict[str, Any]:
     """
-    Analyze and forecast time series data
+    Analyze and forecast time series data.
+    Pass integer timestamps with ``epoch_unit`` ("s", "ms", "us" or "ns")
+    to skip date string parsing. Cached results are returned as
+    ``CachedResult`` carrying their cache key.
     """
     try:
         # Process and forecast in a separate thread
-        loop = asyncio.get_event_loop()
-        
         def _analyze():
+            # Identical requests are served from the result cache
+            cache_key = None
+            if use_cache:
+                cache_key = fingerprint(
+                    dates, values,
+                    freq=freq, periods=periods_to_forecast, epoch_unit=epoch_unit
+                )
+                cached = timeseries_cache.get(cache_key)
+                if cached is not None:
+                    return CachedResult(cached, cache_key)
+            
+            import pandas as pd
+            from sklearn.linear_model import LinearRegression
+            
+            if epoch_unit:
+                index = pd.to_datetime(np.asarray(dates, dtype=np.int64), unit=epoch_unit)
+            else:
+                index = pd.to_datetime(dates)
+            
             # Create dataframe
-            df = pd.DataFrame({"date": pd.to_datetime(dates), "value": values})
+            df = pd.DataFrame({"date": index, "value": values})
             df.set_index("date", inplace=True)
             
             # Resample to ensure regular time intervals
@@ -176,7 +251,7 @@ async def analyze_timeseries(
             min_val = float(df["value"].min())
             max_val = float(df["value"].max())
             
-            return {
+            result = {
                 "statistics": {
                     "mean": mean,
                     "std": std,
@@ -189,8 +264,67 @@ async def analyze_timeseries(
                     for i in range(periods_to_forecast)
                 ]
             }
+            
+            if cache_key is not None:
+                timeseries_cache.set(cache_key, result)
+                return CachedResult(result, cache_key)
+            
+            return result
         
-        return await loop.run_in_executor(None, _analyze)
+        return await run_in_threadpool(_analyze)
     
     except Exception as e:
-        raise Exception(f"Error analyzing time series: {str(e)}") 
\ No newline at end of file
+        raise Exception(f"Error analyzing time series: {str(e)}") 
+
+
+@observe_latency("statistical", "analyze_timeseries_batch")
+async def analyze_timeseries_batch(
+    series: List[Dict[str, Any]],
+    freq: str = "D",
+    periods_to_forecast: int = 10,
+    epoch_unit: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    """
+    Analyze and forecast many time series in one vectorized pass.
+    Each series is a dict with ``name``, ``dates`` and ``values``; dates are
+    parsed for all series together, and results keep the input order.
+    """
+    if len(series) > settings.TIMESERIES_BATCH_MAX_SERIES:
+        raise ValueError(f"At most {settings.TIMESERIES_BATCH_MAX_SERIES} series per batch")
+    for item in series:
+        if len(item["dates"]) != len(item["values"]):
+            raise ValueError(f"Series {item['name']}: dates and values must have the same length")
+        if not item["values"]:
+            raise ValueError(f"Series {item['name']} has no data")
+
+    try:
+        def _analyze():
+            import pandas as pd
+
+            lengths = [len(item["dates"]) for item in series]
+            dates = [date for item in series for date in item["dates"]]
+            offset = pd.tseries.frequencies.to_offset(freq)
+            if epoch_unit and isinstance(offset, pd.offsets.Tick) and offset.n == 1:
+                # Ordinals of fixed-length periods count whole periods since the epoch
+                ns = np.asarray(dates, dtype=np.int64) * _EPOCH_UNIT_NS[epoch_unit]
+                flat_ordinals = ns // offset.nanos
+            elif epoch_unit:
+                index = pd.to_datetime(np.asarray(dates, dtype=np.int64), unit=epoch_unit)
+                flat_ordinals = index.to_period(freq).asi8
+            else:
+                flat_ordinals = pd.to_datetime(dates, format="ISO8601").to_period(freq).asi8
+            ordinals = np.split(flat_ordinals, np.cumsum(lengths)[:-1])
+            values = [np.asarray(item["values"], dtype=np.float64) for item in series]
+
+            return analyze_batch(
+                [item["name"] for item in series], ordinals, values,
+                freq=freq, periods_to_forecast=periods_to_forecast,
+                max_cells=settings.TIMESERIES_BATCH_MAX_CELLS,
+            )
+
+        return await run_in_threadpool(_analyze)
+
+    except ValueError:
+        raise
+    except Exception as e:
+        raise Exception(f"Error analyzing time series batch: {str(e)}")
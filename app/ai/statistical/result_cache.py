@@ -0,0 +1,193 @@
+from typing import Any, Dict, List, Optional, Union
+from collections import OrderedDict
+from pathlib import Path
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import numpy as np
+
+try:
+    import xxhash
+except ImportError:  # pragma: no cover - optional speedup
+    xxhash = None
+
+# Bump when the analysis output changes so stale disk entries are ignored
+CACHE_VERSION = 1
+
+
+def _new_hasher():
+    if xxhash is not None:
+        return xxhash.xxh3_128()
+    return hashlib.blake2b(digest_size=16)
+
+
+def fingerprint(
+    dates: Union[List[str], List[int]],
+    values: List[float],
+    **params: Any
+) -> str:
+    """
+    Content hash of an analysis request over its canonical arrays.
+    String dates are hashed as-is, so a cache hit never has to parse them.
+    """
+    hasher = _new_hasher()
+    hasher.update(f"v{CACHE_VERSION}|{json.dumps(params, sort_keys=True)}|".encode())
+
+    if dates and isinstance(dates[0], str):
+        hasher.update(b"s")
+        hasher.update("\x00".join(dates).encode("utf-8"))
+    else:
+        hasher.update(b"i")
+        hasher.update(np.asarray(dates, dtype=np.int64).tobytes())
+
+    hasher.update(b"|")
+    hasher.update(np.asarray(values, dtype=np.float64).tobytes())
+    return hasher.hexdigest()
+
+
+def _copy(value: Any) -> Any:
+    """
+    Copy the dicts and lists of a JSON-like result, sharing the scalars.
+    """
+    if isinstance(value, dict):
+        return {k: _copy(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_copy(v) for v in value]
+    return value
+
+
+class CachedResult(dict):
+    """
+    Analysis result tagged with the key it is cached under, so callers can
+    cache work derived from it (such as its compressed response body).
+    """
+
+    def __init__(self, result: Dict[str, Any], cache_key: Any):
+        super().__init__(result)
+        self.cache_key = cache_key
+
+
+class ResultCache:
+    """
+    Thread-safe LRU cache for analysis results with an optional on-disk tier.
+
+    Results are copied in and out, so callers may modify what they get. The
+    disk tier keeps at most ``disk_max_entries`` files, evicting the least
+    recently used (by mtime, which reads refresh) once it grows past that.
+    """
+
+    def __init__(self, max_entries: int = 256, disk_dir: Optional[Path] = None,
+                 disk_max_entries: int = 4096):
+        self.max_entries = max_entries
+        self.disk_dir = disk_dir
+        self.disk_max_entries = disk_max_entries
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk_lock = threading.Lock()
+        # Files in the disk tier, counted on first write and recounted on eviction
+        self._disk_entries: Optional[int] = None
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            result = self._entries.get(key)
+            if result is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return _copy(result)
+
+        result = self._read_disk(key)
+        with self._lock:
+            if result is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._store(key, result)
+        return _copy(result)
+
+    def set(self, key: str, result: Dict[str, Any]) -> None:
+        result = _copy(result)
+        with self._lock:
+            self._store(key, result)
+        self._write_disk(key, result)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+    def _store(self, key: str, result: Dict[str, Any]) -> None:
+        self._entries[key] = result
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _read_disk(self, key: str) -> Optional[Dict[str, Any]]:
+        if self.disk_dir is None:
+            return None
+        path = self.disk_dir / f"{key}.json"
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                result = json.load(f)
+        except (OSError, ValueError):
+            return None
+        try:
+            # Mark as recently used for eviction
+            os.utime(path)
+        except OSError:
+            pass
+        return result
+
+    def _write_disk(self, key: str, result: Dict[str, Any]) -> None:
+        if self.disk_dir is None:
+            return
+        self.disk_dir.mkdir(parents=True, exist_ok=True)
+        path = self.disk_dir / f"{key}.json"
+        fd, tmp_path = tempfile.mkstemp(dir=self.disk_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(result, f)
+            # Rewriting a key does not add a file
+            added = not path.exists()
+            os.replace(tmp_path, path)
+        except OSError:
+            # The disk tier is best effort; the in-memory entry is still valid
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            return
+
+        with self._disk_lock:
+            if self._disk_entries is None:
+                self._disk_entries = sum(1 for _ in self.disk_dir.glob("*.json"))
+            elif added:
+                self._disk_entries += 1
+            if self._disk_entries > self.disk_max_entries:
+                self._evict_disk()
+
+    def _evict_disk(self) -> None:
+        """
+        Remove the least recently used files, leaving a tenth of the cap free
+        so that the directory is not listed on every write.
+        """
+        entries = []
+        for path in self.disk_dir.glob("*.json"):
+            try:
+                entries.append((path.stat().st_mtime_ns, path))
+            except FileNotFoundError:
+                pass
+        entries.sort()
+        keep = self.disk_max_entries - self.disk_max_entries // 10
+        excess = max(len(entries) - keep, 0)
+        for _, path in entries[:excess]:
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+        # Other processes sharing the directory may have added or removed files
+        self._disk_entries = len(entries) - excess
@@ -0,0 +1,378 @@
+from typing import List, Dict, Any, Optional
+from dataclasses import dataclass, asdict
+import itertools
+import json
+import math
+import os
+import re
+import tempfile
+import threading
+import numpy as np
+
+from app.ai.statistical.prediction_service import MODEL_DIR
+from app.ai.statistical.result_cache import CachedResult
+from app.utils.concurrency import run_in_threadpool
+from app.utils.files import FileStamp, file_lock, file_stamp, stat_stamp
+
+# Define series storage directory
+SERIES_DIR = MODEL_DIR / "timeseries"
+
+# Cache for loaded series, the stamp of the file each was read from, and
+# their in-process locks. Series files are shared by worker processes, so a
+# cached state is used only while its file is unchanged.
+series_cache = {}
+_series_stamps = {}
+_series_locks = {}
+_registry_lock = threading.Lock()
+
+# Generation of each cached series, changed whenever its state is replaced,
+# so results derived from one state can be cached
+_series_generations = {}
+_next_generation = itertools.count()
+
+_SERIES_NAME_RE = re.compile(r"^[A-Za-z0-9_.-]{1,128}$")
+
+
+@dataclass
+class SeriesState:
+    """
+    Running aggregates for an append-only time series.
+
+    Values are bucketed by ``freq`` (like ``DataFrame.resample(freq).mean()``)
+    and the time index of a bucket is its period ordinal relative to the
+    first bucket. The newest bucket stays "open" until a point in a later
+    bucket arrives, so late points for the current period are still averaged.
+    """
+    name: str
+    freq: str
+    # Id of the user who created the series
+    owner: Optional[int] = None
+    origin: Optional[int] = None
+    last_bucket: Optional[int] = None
+    open_sum: float = 0.0
+    open_count: int = 0
+    # Welford aggregates over closed bucket means
+    count: int = 0
+    mean: float = 0.0
+    m2: float = 0.0
+    min: float = math.inf
+    max: float = -math.inf
+    # Least squares sufficient statistics over closed buckets
+    sum_t: float = 0.0
+    sum_tt: float = 0.0
+    sum_y: float = 0.0
+    sum_ty: float = 0.0
+
+    def _commit(self, t: np.ndarray, y: np.ndarray) -> None:
+        """
+        Fold closed buckets into the running aggregates (Chan's merge).
+        """
+        n_b = len(y)
+        if n_b == 0:
+            return
+        mean_b = float(y.mean())
+        m2_b = float(((y - mean_b) ** 2).sum())
+        n = self.count + n_b
+        delta = mean_b - self.mean
+        self.mean += delta * n_b / n
+        self.m2 += m2_b + delta * delta * self.count * n_b / n
+        self.count = n
+        self.min = min(self.min, float(y.min()))
+        self.max = max(self.max, float(y.max()))
+        self.sum_t += float(t.sum())
+        self.sum_tt += float((t * t).sum())
+        self.sum_y += float(y.sum())
+        self.sum_ty += float((t * y).sum())
+
+    def ingest(self, ordinals: np.ndarray, values: np.ndarray) -> int:
+        """
+        Append points given as period ordinals. Returns the number of points ingested.
+        """
+        mask = ~np.isnan(values)
+        ordinals, values = ordinals[mask], values[mask]
+        if len(values) == 0:
+            return 0
+
+        if self.last_bucket is not None and int(ordinals.min()) < self.last_bucket:
+            raise ValueError(
+                f"Series {self.name} is append-only; points must not be older than the latest period"
+            )
+
+        # Aggregate the batch into buckets
+        buckets, inverse = np.unique(ordinals, return_inverse=True)
+        sums = np.bincount(inverse, weights=values)
+        counts = np.bincount(inverse)
+
+        if self.origin is None:
+            self.origin = int(buckets[0])
+        elif buckets[0] == self.last_bucket:
+            # The first bucket of the batch extends the open bucket
+            sums[0] += self.open_sum
+            counts[0] += self.open_count
+        elif self.open_count:
+            # The open bucket is complete; close it before the new ones
+            self._commit(
+                np.array([self.last_bucket - self.origin], dtype=np.float64),
+                np.array([self.open_sum / self.open_count]),
+            )
+
+        means = sums / counts
+        t = (buckets - self.origin).astype(np.float64)
+        self._commit(t[:-1], means[:-1])
+
+        self.last_bucket = int(buckets[-1])
+        self.open_sum = float(sums[-1])
+        self.open_count = int(counts[-1])
+        return len(values)
+
+    def snapshot(self) -> Dict[str, float]:
+        """
+        Aggregates including the open bucket, without mutating the state.
+        """
+        count, mean, m2 = self.count, self.mean, self.m2
+        min_val, max_val = self.min, self.max
+        sum_t, sum_tt, sum_y, sum_ty = self.sum_t, self.sum_tt, self.sum_y, self.sum_ty
+
+        if self.open_count:
+            y = self.open_sum / self.open_count
+            t = float(self.last_bucket - self.origin)
+            count += 1
+            delta = y - mean
+            mean += delta / count
+            m2 += delta * (y - mean)
+            min_val, max_val = min(min_val, y), max(max_val, y)
+            sum_t += t
+            sum_tt += t * t
+            sum_y += y
+            sum_ty += t * y
+
+        return {
+            "count": count, "mean": mean, "m2": m2, "min": min_val, "max": max_val,
+            "sum_t": sum_t, "sum_tt": sum_tt, "sum_y": sum_y, "sum_ty": sum_ty,
+        }
+
+    def analyze(self, periods_to_forecast: int) -> Dict[str, Any]:
+        """
+        Statistics and linear trend forecast, in the shape of ``analyze_timeseries``.
+        """
+        if self.last_bucket is None:
+            raise ValueError(f"Series {self.name} has no data")
+
+        agg = self.snapshot()
+        n = agg["count"]
+        denom = n * agg["sum_tt"] - agg["sum_t"] ** 2
+        if n > 1 and denom > 0:
+            slope = (n * agg["sum_ty"] - agg["sum_t"] * agg["sum_y"]) / denom
+        else:
+            slope = 0.0
+        intercept = (agg["sum_y"] - slope * agg["sum_t"]) / n
+
+        # Forecast future periods
+        last_t = self.last_bucket - self.origin
+        future_idx = np.arange(last_t + 1, last_t + 1 + periods_to_forecast, dtype=np.float64)
+        forecast = intercept + slope * future_idx
+
+        import pandas as pd
+
+        future_periods = pd.period_range(
+            start=pd.Period(ordinal=self.last_bucket + 1, freq=self.freq),
+            periods=periods_to_forecast,
+        )
+
+        return {
+            "statistics": {
+                "mean": agg["mean"],
+                "std": math.sqrt(agg["m2"] / (n - 1)) if n > 1 else float("nan"),
+                "min": agg["min"],
+                "max": agg["max"]
+            },
+            "forecast": forecast.tolist(),
+            "forecast_dates": future_periods.to_timestamp(how="start").strftime("%Y-%m-%d").tolist(),
+            "trend": {"slope": slope, "intercept": intercept},
+            "points": n
+        }
+
+
+def _series_path(name: str):
+    return SERIES_DIR / f"{name}.json"
+
+
+def _series_lock_path(name: str):
+    return SERIES_DIR / f".{name}.lock"
+
+
+def _get_lock(name: str) -> threading.Lock:
+    with _registry_lock:
+        lock = _series_locks.get(name)
+        if lock is None:
+            lock = _series_locks[name] = threading.Lock()
+        return lock
+
+
+def _load_series(name: str) -> Optional[SeriesState]:
+    """
+    Get a series from the cache while its file is unchanged (one ``stat``),
+    otherwise from its persisted state, which another process may have written.
+    Call with the series' in-process lock held.
+    """
+    path = _series_path(name)
+    stamp = file_stamp(path)
+    if stamp is None:
+        _uncache_series(name)
+        return None
+    if name in series_cache and _series_stamps.get(name) == stamp:
+        return series_cache[name]
+
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            state = SeriesState(**json.load(f))
+            stamp = stat_stamp(os.fstat(f.fileno()))
+    except FileNotFoundError:
+        # Deleted by another process since the stat
+        _uncache_series(name)
+        return None
+
+    _cache_series(state, stamp)
+    return state
+
+
+def _cache_series(state: SeriesState, stamp: FileStamp) -> None:
+    series_cache[state.name] = state
+    _series_stamps[state.name] = stamp
+    _series_generations[state.name] = next(_next_generation)
+
+
+def _uncache_series(name: str) -> None:
+    series_cache.pop(name, None)
+    _series_stamps.pop(name, None)
+    _series_generations.pop(name, None)
+
+
+def _save_series(state: SeriesState) -> FileStamp:
+    """
+    Persist a series atomically (write to a temp file, then rename).
+    Returns the stamp of the written file.
+    """
+    SERIES_DIR.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=SERIES_DIR, prefix=f".{state.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(asdict(state), f)
+            f.flush()
+            stamp = stat_stamp(os.fstat(f.fileno()))
+        os.replace(tmp_path, _series_path(state.name))
+        return stamp
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def _validate_name(name: str) -> None:
+    if not _SERIES_NAME_RE.match(name):
+        raise ValueError(f"Invalid series name: {name}")
+
+
+def _check_owner(state: SeriesState, user_id: Optional[int], is_superuser: bool) -> None:
+    """
+    Only the user who created a series, or an admin, may change it.
+    """
+    if not is_superuser and (user_id is None or state.owner != user_id):
+        raise PermissionError(f"Not allowed to modify series {state.name}")
+
+
+async def append_to_series(
+    name: str,
+    dates: List[str],
+    values: List[float],
+    freq: str = "D",
+    user_id: Optional[int] = None,
+    is_superuser: bool = False
+) -> Dict[str, Any]:
+    """
+    Append points to a named series, creating it on first use with
+    ``user_id`` as its owner; appending to an existing series needs the
+    owner or an admin.
+    Cost is proportional to the number of new points, not the series history.
+    Load, append and save run under a file lock, so appends from different
+    worker processes are never lost.
+    """
+    try:
+        _validate_name(name)
+        if len(dates) != len(values):
+            raise ValueError("dates and values must have the same length")
+
+        def _append():
+            import pandas as pd
+
+            ordinals = pd.to_datetime(dates).to_period(freq).asi8
+            y = np.asarray(values, dtype=np.float64)
+
+            with _get_lock(name), file_lock(_series_lock_path(name)):
+                state = _load_series(name)
+                if state is None:
+                    state = SeriesState(name=name, freq=freq, owner=user_id)
+                else:
+                    _check_owner(state, user_id, is_superuser)
+                if state.freq != freq:
+                    raise ValueError(f"Series {name} uses frequency {state.freq}, not {freq}")
+
+                # Work on a copy so a rejected batch leaves the series untouched
+                updated = SeriesState(**asdict(state))
+                ingested = updated.ingest(ordinals, y)
+                _cache_series(updated, _save_series(updated))
+
+            return {
+                "name": name,
+                "freq": freq,
+                "ingested": ingested,
+                "points": updated.count + (1 if updated.open_count else 0)
+            }
+
+        return await run_in_threadpool(_append)
+
+    except (PermissionError, ValueError):
+        raise
+    except Exception as e:
+        raise Exception(f"Error appending to time series: {str(e)}")
+
+
+async def analyze_series(name: str, periods_to_forecast: int = 10) -> Dict[str, Any]:
+    """
+    Statistics and forecast for a named series from its running aggregates.
+    The result is a ``CachedResult`` keyed on the series state it was computed from.
+    """
+    try:
+        _validate_name(name)
+        def _analyze():
+            with _get_lock(name):
+                state = _load_series(name)
+                generation = _series_generations.get(name)
+            if state is None:
+                raise KeyError(f"Series {name} not found")
+            result = {"name": name, "freq": state.freq, **state.analyze(periods_to_forecast)}
+            return CachedResult(result, ("series", name, periods_to_forecast, generation))
+
+        return await run_in_threadpool(_analyze)
+
+    except (KeyError, ValueError):
+        raise
+    except Exception as e:
+        raise Exception(f"Error analyzing time series: {str(e)}")
+
+
+async def delete_series(name: str, user_id: Optional[int] = None, is_superuser: bool = False) -> None:
+    """
+    Remove a named series and its persisted state. Owner or admin only.
+    """
+    _validate_name(name)
+
+    def _delete():
+        with _get_lock(name), file_lock(_series_lock_path(name)):
+            state = _load_series(name)
+            if state is None:
+                raise KeyError(f"Series {name} not found")
+            _check_owner(state, user_id, is_superuser)
+            _uncache_series(name)
+            _series_path(name).unlink()
+
+    await run_in_threadpool(_delete)
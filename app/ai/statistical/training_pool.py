@@ -0,0 +1,259 @@
+from typing import Any, AsyncIterator, Callable, Dict, Optional, Tuple
+from contextlib import asynccontextmanager, contextmanager
+from multiprocessing import shared_memory
+from pathlib import Path
+import asyncio
+import multiprocessing
+import sys
+import numpy as np
+
+from app.core.config import settings
+
+# Lock files of the fit slots shared by all workers on this host
+SLOT_DIR = Path("./models/.fit_slots")
+
+# Shape and dtype of an array placed in shared memory
+ArraySpec = Tuple[str, Tuple[int, ...], str]
+
+
+def _fit_linear_regression(X: np.ndarray, y: np.ndarray, params: Dict[str, Any]) -> Any:
+    from sklearn.linear_model import LinearRegression
+
+    return LinearRegression(**params).fit(X, y)
+
+
+def _fit_kmeans(X: np.ndarray, y: Optional[np.ndarray], params: Dict[str, Any]) -> Any:
+    from sklearn.cluster import KMeans
+    from sklearn.preprocessing import StandardScaler
+
+    scaler = StandardScaler()
+    X_scaled = scaler.fit_transform(X)
+    kmeans = KMeans(**params).fit(X_scaled)
+    return scaler, kmeans
+
+
+# Estimators that can be fitted in a training process
+ESTIMATORS: Dict[str, Callable[[np.ndarray, Optional[np.ndarray], Dict[str, Any]], Any]] = {
+    "linear_regression": _fit_linear_regression,
+    "kmeans": _fit_kmeans,
+}
+
+
+@contextmanager
+def _shared_array(arr: Optional[np.ndarray]):
+    """
+    Copy an array into a shared memory block for the lifetime of the context.
+    """
+    if arr is None:
+        yield None
+        return
+
+    arr = np.ascontiguousarray(arr)
+    shm = shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+    try:
+        np.ndarray(arr.shape, dtype=arr.dtype, buffer=shm.buf)[...] = arr
+        yield (shm.name, arr.shape, arr.dtype.str)
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+def _attach(spec: Optional[ArraySpec]):
+    if spec is None:
+        return None, None
+    name, shape, dtype = spec
+    shm = shared_memory.SharedMemory(name=name)
+    return shm, np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+
+
+def _worker_main(conn, estimator: str, x_spec: ArraySpec, y_spec: Optional[ArraySpec],
+                 params: Dict[str, Any], threads: int) -> None:
+    """
+    Entry point of a training process: fit on shared inputs and send back the model.
+    """
+    x_shm = y_shm = None
+    try:
+        from threadpoolctl import threadpool_limits
+
+        x_shm, X = _attach(x_spec)
+        y_shm, y = _attach(y_spec)
+        with threadpool_limits(limits=threads):
+            model = ESTIMATORS[estimator](X, y, params)
+        # Drop the views before the shared blocks are closed
+        del X, y
+        conn.send(("ok", model))
+    except BaseException as e:
+        conn.send(("error", f"{type(e).__name__}: {e}"))
+    finally:
+        for shm in (x_shm, y_shm):
+            if shm is not None:
+                shm.close()
+        conn.close()
+
+
+_context = None
+_semaphore: Optional[asyncio.Semaphore] = None
+
+
+def _get_context():
+    """
+    Start training processes from a forkserver with the ML libraries preloaded,
+    so a fit neither pays the import cost nor inherits the server's state.
+    """
+    global _context
+    if _context is None:
+        if sys.platform == "win32":
+            _context = multiprocessing.get_context("spawn")
+        else:
+            _context = multiprocessing.get_context("forkserver")
+            _context.set_forkserver_preload([__name__, "sklearn.linear_model", "sklearn.cluster"])
+    return _context
+
+
+def _get_semaphore() -> asyncio.Semaphore:
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(settings.MAX_CONCURRENT_FITS)
+    return _semaphore
+
+
+async def _lock_slot():
+    """
+    Take one of ``MAX_CONCURRENT_FITS`` slot lock files, polling until one
+    is free. Returns the open file holding the lock, or None where ``fcntl``
+    is unavailable (the limit is then per process only).
+    """
+    try:
+        import fcntl
+    except ImportError:
+        return None
+
+    SLOT_DIR.mkdir(parents=True, exist_ok=True)
+    delay = 0.01
+    while True:
+        for slot in range(settings.MAX_CONCURRENT_FITS):
+            # A new open file per attempt, so slots held by this process conflict too
+            f = open(SLOT_DIR / f"slot-{slot}.lock", "a")
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return f
+            except OSError:
+                f.close()
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, 0.25)
+
+
+@asynccontextmanager
+async def _fit_slot() -> AsyncIterator[None]:
+    """
+    Hold a fit slot shared by every worker process on this host, so the
+    limit holds however many workers are running. Slots are file locks,
+    which the OS releases if a worker dies. The in-process semaphore keeps
+    this process's own fits from polling for slots.
+    """
+    async with _get_semaphore():
+        f = await _lock_slot()
+        try:
+            yield
+        finally:
+            if f is not None:
+                # Closing the file releases the lock
+                f.close()
+
+
+def _stop_process(process) -> None:
+    process.terminate()
+    process.join()
+
+
+async def _start(process) -> None:
+    """
+    Start a training process in a thread: the first start launches the
+    forkserver, which imports scikit-learn. If the caller is cancelled
+    meanwhile, the process is stopped once it is up.
+    """
+    loop = asyncio.get_running_loop()
+    starting = loop.run_in_executor(None, process.start)
+    try:
+        await asyncio.shield(starting)
+    except asyncio.CancelledError:
+        starting.add_done_callback(
+            lambda f: f.cancelled() or f.exception() or loop.run_in_executor(None, _stop_process, process)
+        )
+        raise
+
+
+async def _receive(conn) -> Tuple[str, Any]:
+    """
+    Wait for the result without tying up an executor thread where possible;
+    the model is unpickled in a thread once it has arrived.
+    """
+    loop = asyncio.get_running_loop()
+    try:
+        readable = loop.create_future()
+        loop.add_reader(conn.fileno(), lambda: readable.done() or readable.set_result(None))
+    except NotImplementedError:
+        return await loop.run_in_executor(None, conn.recv)
+
+    try:
+        await readable
+    finally:
+        loop.remove_reader(conn.fileno())
+    return await loop.run_in_executor(None, conn.recv)
+
+
+async def fit_in_process(
+    estimator: str,
+    X: np.ndarray,
+    y: Optional[np.ndarray] = None,
+    params: Optional[Dict[str, Any]] = None,
+    timeout: Optional[float] = None
+) -> Any:
+    """
+    Fit an estimator in a separate process.
+
+    Training inputs are handed over through shared memory instead of being
+    pickled. At most ``MAX_CONCURRENT_FITS`` fits run at once on the host,
+    across all worker processes; a fit that times out or whose caller is
+    cancelled is terminated.
+    """
+    if estimator not in ESTIMATORS:
+        raise ValueError(f"Unknown estimator: {estimator}")
+    if timeout is None:
+        timeout = settings.TRAINING_TIMEOUT_SECONDS
+
+    ctx = _get_context()
+    async with _fit_slot():
+        with _shared_array(X) as x_spec, _shared_array(y) as y_spec:
+            parent_conn, child_conn = ctx.Pipe(duplex=False)
+            process = ctx.Process(
+                target=_worker_main,
+                args=(child_conn, estimator, x_spec, y_spec, params or {},
+                      settings.TRAINING_THREADS_PER_FIT),
+                daemon=True,
+            )
+            try:
+                await _start(process)
+            except BaseException:
+                parent_conn.close()
+                raise
+            finally:
+                child_conn.close()
+
+            try:
+                status, payload = await asyncio.wait_for(_receive(parent_conn), timeout)
+            except BaseException as e:
+                # Stop the fit on timeout, cancellation or a lost worker
+                process.terminate()
+                if isinstance(e, asyncio.TimeoutError):
+                    raise TimeoutError(f"Training {estimator} exceeded {timeout}s")
+                if isinstance(e, EOFError):
+                    raise RuntimeError(f"Training process for {estimator} exited unexpectedly")
+                raise
+            finally:
+                parent_conn.close()
+                await asyncio.get_running_loop().run_in_executor(None, process.join)
+
+    if status != "ok":
+        raise RuntimeError(payload)
+    return payload
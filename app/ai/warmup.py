@@ -0,0 +1,59 @@
+"""
+Optional warmup of the AI subsystems at startup.
+"""
+from typing import Dict
+from time import perf_counter
+import logging
+
+from app.core.config import settings
+from app.utils.concurrency import run_in_threadpool
+
+logger = logging.getLogger(__name__)
+
+
+def _import_statistical_libraries() -> None:
+    import joblib  # noqa: F401
+    import pandas  # noqa: F401
+    import sklearn.cluster  # noqa: F401
+    import sklearn.linear_model  # noqa: F401
+    import sklearn.preprocessing  # noqa: F401
+
+
+async def warmup() -> Dict[str, float]:
+    """
+    Import the heavy AI libraries and load the models listed in
+    ``AI_WARMUP_MODELS``, so the first requests do not pay for them. Entries
+    are "task:model_name" for Hugging Face pipelines and "statistical:name"
+    for saved statistical models. Returns the seconds spent per step.
+    """
+    from app.ai.custom_models.huggingface_service import load_model
+    from app.ai.statistical.prediction_service import model_registry
+    from app.ai.llm.context_manager import count_text_tokens
+    from app.ai.llm.openai_service import get_client
+
+    timings: Dict[str, float] = {}
+
+    start = perf_counter()
+    await run_in_threadpool(_import_statistical_libraries)
+    timings["statistical"] = perf_counter() - start
+
+    start = perf_counter()
+    await run_in_threadpool(get_client)
+    await run_in_threadpool(count_text_tokens, "warmup", settings.DEFAULT_LLM_MODEL)
+    timings["openai"] = perf_counter() - start
+
+    for entry in settings.AI_WARMUP_MODELS:
+        task, _, model_name = entry.partition(":")
+        start = perf_counter()
+        try:
+            if task == "statistical":
+                await run_in_threadpool(model_registry.get, model_name)
+            else:
+                await load_model(model_name, task)
+        except Exception as e:
+            # A model that fails to load is loaded again on first use
+            logger.warning("Warmup of %s failed: %s", entry, e)
+        timings[entry] = perf_counter() - start
+
+    logger.info("AI warmup finished: %s", {k: round(v, 3) for k, v in timings.items()})
+    return timings
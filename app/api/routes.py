@@ -1,5 +1,13 @@
-from fastapi import APIRouter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Literal
+import asyncio
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import PlainTextResponse
 from app.core.config import settings
+from app.core.prefork import current_report
+from app.core.profiling import sample_stacks, slow_requests, to_collapsed, to_speedscope
+from app.core.security import get_current_superuser
 from app.api.v1.router import api_router as api_v1_router
 
 # Main API router
@@ -8,10 +16,84 @@ router = APIRouter(prefix=settings.API_PREFIX)
 # Include API version routers
 router.include_router(api_v1_router, prefix="/v1")
 
+# Dedicated thread for the sampler so profiling never waits on busy executor threads
+_profiler_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="profiler")
+_profile_lock = asyncio.Lock()
+
 # Health check endpoint
 @router.get("/health")
 async def health_check():
     """
     Health check endpoint to verify the API is working
     """
-    return {"status": "ok", "version": settings.PROJECT_VERSION} 
\ No newline at end of file
+    return {"status": "ok", "version": settings.PROJECT_VERSION}
+
+
+@router.get("/admin/profile", tags=["admin"], dependencies=[Depends(get_current_superuser)])
+async def profile_worker(
+    seconds: float = Query(default=5.0, gt=0),
+    interval_ms: float = Query(default=10.0, ge=1.0, le=1000.0),
+    format: Literal["collapsed", "speedscope"] = "collapsed",
+):
+    """
+    Sample wall-clock stacks of this worker for a number of seconds. Admin only.
+    """
+    if not settings.PROFILING_ENABLED:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    
+    if seconds > settings.PROFILING_MAX_SECONDS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"seconds must not exceed {settings.PROFILING_MAX_SECONDS}"
+        )
+    
+    if _profile_lock.locked():
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="A profile is already being recorded"
+        )
+    
+    interval = interval_ms / 1000
+    async with _profile_lock:
+        loop = asyncio.get_running_loop()
+        stacks, frames, _ = await loop.run_in_executor(
+            _profiler_executor, sample_stacks, seconds, interval
+        )
+    
+    if format == "speedscope":
+        return to_speedscope(stacks, frames, interval)
+    return PlainTextResponse(to_collapsed(stacks))
+
+
+@router.get("/admin/slow-requests", tags=["admin"], dependencies=[Depends(get_current_superuser)])
+async def get_slow_requests():
+    """
+    Span breakdown of recent requests slower than the configured threshold. Admin only.
+    """
+    return {
+        "threshold_ms": settings.SLOW_REQUEST_THRESHOLD_MS,
+        "requests": list(reversed(slow_requests))
+    }
+
+
+@router.delete(
+    "/admin/slow-requests",
+    tags=["admin"],
+    status_code=status.HTTP_204_NO_CONTENT,
+    dependencies=[Depends(get_current_superuser)],
+)
+async def clear_slow_requests():
+    """
+    Clear captured slow requests. Admin only.
+    """
+    slow_requests.clear()
+    return None
+
+
+@router.get("/admin/memory", tags=["admin"], dependencies=[Depends(get_current_superuser)])
+async def get_memory():
+    """
+    RSS, PSS, shared and private memory per process in MiB: the master and
+    every worker under the pre-fork launcher, otherwise this process. Admin only.
+    """
+    return {"processes": current_report()}
@@ -1,12 +1,55 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Path, Query, Request, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, AsyncIterator, List, Optional
+import orjson
 
 from app.db.session import get_db
 from app.models.user import User
+from app.core.compression import cache_compressed, compressed_response
+from app.core.config import settings
+from app.core.responses import trusted_response
+from app.core.rate_limit import chat_token_limiter, inference_limiter
 from app.core.security import get_current_active_user
-from app.schemas.ai import ChatCompletionRequest, ChatCompletionResponse, ModelInfoResponse
+from app.core.usage_events import CHAT_COMPLETION, record_event
+from app.schemas.ai import (
+    MODEL_NAME_PATTERN,
+    ChatCompletionRequest,
+    ChatCompletionResponse,
+    TextGenerationRequest,
+    ModelInfoResponse,
+    LinearRegressionTrainRequest,
+    LinearRegressionTrainResponse,
+    PredictionRequest,
+    PredictionResponse,
+    ModelVersionsResponse,
+    TimeSeriesAnalysisRequest,
+    TimeSeriesAppendRequest,
+    TimeSeriesAppendResponse,
+    TimeSeriesAnalysisResponse,
+    TimeSeriesBatchRequest,
+    TimeSeriesBatchResponse,
+    EmbeddingRequest,
+    EmbeddingResponse,
+    IndexDocumentsRequest,
+    IndexDocumentsResponse,
+    IndexDeleteRequest,
+    IndexDeleteResponse,
+    IndexSearchRequest,
+    IndexSearchResponse,
+)
+from app.ai.custom_models.huggingface_service import embed_texts, stream_text_generation
+from app.ai.llm.context_manager import estimate_request_tokens
 from app.ai.llm.openai_service import generate_chat_completion, list_available_models
+from app.ai.statistical.prediction_service import (
+    analyze_timeseries,
+    analyze_timeseries_batch,
+    predict_linear_regression,
+    reload_model,
+    train_linear_regression,
+)
+from app.ai.statistical.timeseries_store import append_to_series, analyze_series, delete_series
+from app.ai.search.search_service import add_documents, delete_documents, drop_index, search_index
 
 router = APIRouter()
 
@@ -31,11 +74,21 @@ async def get_available_models(
 @router.post("/chat", response_model=ChatCompletionResponse)
 async def create_chat_completion(
     request: ChatCompletionRequest,
+    http_request: Request,
     current_user: User = Depends(get_current_active_user)
 ):
     """
-    Generate a chat completion using OpenAI
+    Generate a chat completion using OpenAI.
+    Limited per user by tokens: the estimate is charged up front and
+    settled against the reported usage.
     """
+    estimated_tokens = estimate_request_tokens(
+        [{"role": m.role, "content": m.content} for m in request.messages],
+        model=request.model,
+        max_tokens=request.max_tokens
+    )
+    await chat_token_limiter.hit(http_request, current_user.id, cost=estimated_tokens)
+    
     try:
         response = await generate_chat_completion(
             messages=request.messages,
@@ -43,9 +96,472 @@ async def create_chat_completion(
             temperature=request.temperature,
             max_tokens=request.max_tokens
         )
-        return response
     except Exception as e:
+        # Nothing was generated; give the tokens back
+        await chat_token_limiter.adjust(http_request, current_user.id, estimated_tokens)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to generate completion: {str(e)}"
-        ) 
\ No newline at end of file
+        )
+    
+    await chat_token_limiter.adjust(
+        http_request, current_user.id, estimated_tokens - response["usage"]["total_tokens"]
+    )
+    await record_event(CHAT_COMPLETION, user_id=current_user.id, model=response["model"], usage=response["usage"])
+    return trusted_response(response)
+
+
+def _sse(data: Dict[str, Any], event: Optional[str] = None) -> bytes:
+    """
+    Encode one server-sent event with a JSON payload
+    """
+    prefix = f"event: {event}\n".encode() if event else b""
+    return prefix + b"data: " + orjson.dumps(data) + b"\n\n"
+
+
+@router.post(
+    "/text-generation/stream",
+    responses={200: {"content": {"text/event-stream": {}}}},
+    dependencies=[Depends(inference_limiter)],
+)
+async def stream_generated_text(
+    request: TextGenerationRequest,
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Generate text with a local model, streamed as server-sent events.
+    Each event carries the next piece of text; a final "done" event closes
+    the stream. Disconnecting stops generation.
+    """
+    stream = stream_text_generation(
+        prompt=request.prompt,
+        model_name=request.model_name,
+        max_length=request.max_length,
+        temperature=request.temperature
+    )
+    
+    # Wait for the first piece so loading and startup errors get a status code
+    try:
+        first = await stream.__anext__()
+    except StopAsyncIteration:
+        first = None
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to generate text: {str(e)}"
+        )
+    
+    async def events() -> AsyncIterator[bytes]:
+        try:
+            if first is not None:
+                yield _sse({"text": first})
+                async for text in stream:
+                    yield _sse({"text": text})
+            yield _sse({}, event="done")
+        except Exception as e:
+            yield _sse({"detail": str(e)}, event="error")
+        finally:
+            # Stops generation when the client has gone away
+            await stream.aclose()
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.post(
+    "/statistical/linear-regression/train",
+    response_model=LinearRegressionTrainResponse,
+    dependencies=[Depends(inference_limiter)],
+)
+async def train_linear_regression_model(
+    request: LinearRegressionTrainRequest,
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Train a linear regression model and publish it as a new version
+    """
+    try:
+        return await train_linear_regression(
+            X_train=request.X_train,
+            y_train=request.y_train,
+            model_name=request.model_name
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to train model: {str(e)}"
+        )
+
+
+@router.post(
+    "/statistical/linear-regression/predict",
+    response_model=PredictionResponse,
+    dependencies=[Depends(inference_limiter)],
+)
+async def predict_with_linear_regression(
+    request: PredictionRequest,
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Make predictions with the current version of a linear regression model
+    """
+    try:
+        predictions = await predict_linear_regression(
+            X_test=request.X_test,
+            model_name=request.model_name,
+            as_array=settings.RESPONSE_MODEL_BYPASS
+        )
+        return trusted_response({"model_name": request.model_name, "predictions": predictions})
+    except FileNotFoundError:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Model not found")
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to make predictions: {str(e)}"
+        )
+
+
+@router.post("/statistical/models/{model_name}/reload", response_model=ModelVersionsResponse)
+async def reload_statistical_model(
+    model_name: str = Path(pattern=MODEL_NAME_PATTERN),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Warm-swap the current version of a model into memory. Admin only.
+    """
+    if not current_user.is_superuser:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough permissions"
+        )
+    
+    try:
+        return await reload_model(model_name)
+    except FileNotFoundError:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Model not found")
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to reload model: {str(e)}"
+        )
+
+
+def _check_date_format(epoch_unit: Optional[str], series_dates: List[List[Any]]) -> None:
+    """
+    Integer dates need an ``epoch_unit``, and string dates must not have one.
+    """
+    for dates in series_dates:
+        if not dates:
+            continue
+        if epoch_unit is None and not isinstance(dates[0], str):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="epoch_unit is required for integer dates"
+            )
+        if epoch_unit is not None and isinstance(dates[0], str):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="epoch_unit requires integer dates"
+            )
+
+
+@router.post(
+    "/timeseries/analyze",
+    response_model=TimeSeriesAnalysisResponse,
+    dependencies=[Depends(inference_limiter)],
+)
+async def analyze_timeseries_data(
+    request: TimeSeriesAnalysisRequest,
+    http_request: Request,
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Analyze and forecast time series data
+    """
+    _check_date_format(request.epoch_unit, [request.dates])
+    
+    try:
+        result = await analyze_timeseries(
+            dates=request.dates,
+            values=request.values,
+            freq=request.freq,
+            periods_to_forecast=request.periods_to_forecast,
+            epoch_unit=request.epoch_unit
+        )
+        # Repeated inputs come from the result cache; serve their compressed
+        # body without serializing it again
+        cache_key = getattr(result, "cache_key", None)
+        cached = compressed_response(http_request, cache_key)
+        if cached is not None:
+            return cached
+        cache_compressed(http_request, cache_key)
+        return trusted_response(result)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to analyze time series: {str(e)}"
+        )
+
+
+@router.post(
+    "/timeseries/analyze/batch",
+    response_model=TimeSeriesBatchResponse,
+    dependencies=[Depends(inference_limiter)],
+)
+async def analyze_timeseries_batch_data(
+    request: TimeSeriesBatchRequest,
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Analyze and forecast many time series in one request
+    """
+    _check_date_format(request.epoch_unit, [item.dates for item in request.series])
+    
+    try:
+        results = await analyze_timeseries_batch(
+            series=[
+                {"name": item.name, "dates": item.dates, "values": item.values}
+                for item in request.series
+            ],
+            freq=request.freq,
+            periods_to_forecast=request.periods_to_forecast,
+            epoch_unit=request.epoch_unit
+        )
+        return trusted_response({"results": results})
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to analyze time series batch: {str(e)}"
+        )
+
+
+@router.post(
+    "/timeseries/{name}/points",
+    response_model=TimeSeriesAppendResponse,
+    dependencies=[Depends(inference_limiter)],
+)
+async def append_timeseries_points(
+    name: str,
+    request: TimeSeriesAppendRequest,
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Append points to a named time series, creating it on first use.
+    Appending to an existing series requires its owner or an admin.
+    """
+    try:
+        return await append_to_series(
+            name=name,
+            dates=request.dates,
+            values=request.values,
+            freq=request.freq,
+            user_id=current_user.id,
+            is_superuser=current_user.is_superuser
+        )
+    except PermissionError:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not enough permissions")
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to append time series points: {str(e)}"
+        )
+
+
+@router.get(
+    "/timeseries/{name}",
+    response_model=TimeSeriesAnalysisResponse,
+    dependencies=[Depends(inference_limiter)],
+)
+async def get_timeseries_analysis(
+    name: str,
+    http_request: Request,
+    periods_to_forecast: int = Query(default=10, gt=0, le=10000),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Get statistics and forecast for a named time series
+    """
+    try:
+        result = await analyze_series(name, periods_to_forecast=periods_to_forecast)
+        # Same body until points are appended
+        cached = compressed_response(http_request, result.cache_key)
+        if cached is not None:
+            return cached
+        cache_compressed(http_request, result.cache_key)
+        return result
+    except KeyError:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Time series not found")
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to analyze time series: {str(e)}"
+        )
+
+
+@router.delete("/timeseries/{name}", status_code=status.HTTP_204_NO_CONTENT)
+async def remove_timeseries(
+    name: str,
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Delete a named time series. Owner or admin only.
+    """
+    try:
+        await delete_series(name, user_id=current_user.id, is_superuser=current_user.is_superuser)
+    except PermissionError:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not enough permissions")
+    except KeyError:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Time series not found")
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    return None
+
+
+@router.post(
+    "/embeddings",
+    response_model=EmbeddingResponse,
+    dependencies=[Depends(inference_limiter)],
+)
+async def create_embeddings(
+    request: EmbeddingRequest,
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Embed texts with a local feature-extraction model
+    """
+    model_name = request.model or settings.EMBEDDING_MODEL
+    try:
+        embeddings = await embed_texts(request.texts, model_name=model_name)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to create embeddings: {str(e)}"
+        )
+    
+    return trusted_response({
+        "model": model_name,
+        "dimensions": embeddings.shape[1],
+        "embeddings": embeddings if settings.RESPONSE_MODEL_BYPASS else embeddings.tolist()
+    })
+
+
+@router.post(
+    "/indexes/{name}/documents",
+    response_model=IndexDocumentsResponse,
+    dependencies=[Depends(inference_limiter)],
+)
+async def add_index_documents(
+    name: str,
+    request: IndexDocumentsRequest,
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Embed documents and add them to a vector index, creating it on first use.
+    Adding to an existing index requires its owner or an admin.
+    """
+    try:
+        return await add_documents(
+            index_name=name,
+            ids=[document.id for document in request.documents],
+            texts=[document.text for document in request.documents],
+            model_name=request.model,
+            user_id=current_user.id,
+            is_superuser=current_user.is_superuser
+        )
+    except PermissionError:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not enough permissions")
+    except KeyError:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Index not found")
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to add documents: {str(e)}"
+        )
+
+
+@router.post(
+    "/indexes/{name}/documents/delete",
+    response_model=IndexDeleteResponse,
+)
+async def delete_index_documents(
+    name: str,
+    request: IndexDeleteRequest,
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Delete documents from a vector index by id. Owner or admin only.
+    """
+    try:
+        return await delete_documents(
+            name, request.ids, user_id=current_user.id, is_superuser=current_user.is_superuser
+        )
+    except PermissionError:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not enough permissions")
+    except KeyError:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Index not found")
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to delete documents: {str(e)}"
+        )
+
+
+@router.post(
+    "/indexes/{name}/search",
+    response_model=IndexSearchResponse,
+    dependencies=[Depends(inference_limiter)],
+)
+async def search_index_documents(
+    name: str,
+    request: IndexSearchRequest,
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Find the documents most similar to a query
+    """
+    try:
+        results = await search_index(name, request.query, k=request.k)
+        return trusted_response({"name": name, "results": results})
+    except KeyError:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Index not found")
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to search index: {str(e)}"
+        )
+
+
+@router.delete("/indexes/{name}", status_code=status.HTTP_204_NO_CONTENT)
+async def remove_index(
+    name: str,
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Delete a vector index. Owner or admin only.
+    """
+    try:
+        await drop_index(name, user_id=current_user.id, is_superuser=current_user.is_superuser)
+    except PermissionError:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not enough permissions")
+    except KeyError:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Index not found")
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    return None
@@ -6,6 +6,7 @@ from sqlalchemy.future import select
 
 from app.core.config import settings
 from app.core.security import create_access_token, verify_password
+from app.core.usage_events import LOGIN, LOGIN_FAILED, record_event
 from app.db.session import get_db
 from app.models.user import User
 from app.schemas.token import Token
@@ -32,6 +33,7 @@ async def login_for_access_token(
         user = result.scalars().first()
     
     if not user or not verify_password(form_data.password, user.hashed_password):
+        await record_event(LOGIN_FAILED, user_id=user.id if user else None)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
@@ -48,6 +50,7 @@ async def login_for_access_token(
     access_token = create_access_token(
         data={"sub": user.username}, expires_delta=access_token_expires
     )
+    await record_event(LOGIN, user_id=user.id)
     
     return {"access_token": access_token, "token_type": "bearer"}
 
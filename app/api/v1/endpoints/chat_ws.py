@@ -0,0 +1,342 @@
+"""
+Chat over one long-lived WebSocket.
+
+The client authenticates once when connecting, with an ``Authorization:
+Bearer`` header or an ``access_token`` query parameter. It then sends JSON
+text frames:
+
+- ``{"type": "chat", "id": "...", "messages": [...], "model": ...}``: start
+  a completion. Takes the fields of ``POST /ai/chat``; ``id`` is chosen by
+  the client and tags every frame sent back for that request.
+- ``{"type": "cancel", "id": "..."}``: stop a running request.
+- ``{"type": "ping"}`` / ``{"type": "pong"}``: heartbeats.
+
+The server sends ``ready`` once authenticated, then ``delta`` frames
+(``content``), a ``done`` frame (``finish_reason``, ``usage``), or an
+``error`` (``status``, ``detail``) or ``cancelled`` frame per request, plus
+``ping`` heartbeats.
+
+Frames go through a bounded queue. Requests wait when it is full, and a
+client that does not make room within ``CHAT_WS_SEND_TIMEOUT_SECONDS`` is
+disconnected, so a slow reader cannot make the server buffer without limit.
+"""
+from time import monotonic, time
+from typing import Any, Dict, List, Optional
+import asyncio
+
+import orjson
+from fastapi import APIRouter, HTTPException, WebSocket, status
+from fastapi.encoders import jsonable_encoder
+from jose import JWTError, jwt
+from pydantic import ValidationError
+from starlette.websockets import WebSocketDisconnect, WebSocketState
+
+from app.ai.llm.context_manager import count_text_tokens, estimate_request_tokens
+from app.ai.llm.openai_service import stream_chat_completion
+from app.core.config import settings
+from app.core.deadlines import Deadline, current_deadline
+from app.core.metrics import counter, gauge
+from app.core.rate_limit import chat_token_limiter
+from app.core.security import authenticate_token
+from app.core.usage_events import CHAT_COMPLETION, record_event
+from app.db.session import AsyncSessionLocal
+from app.schemas.ai import ChatCompletionRequest
+
+router = APIRouter()
+
+WS_CONNECTIONS = gauge("chat_ws_connections", "Open WebSocket chat connections")
+WS_REQUESTS = counter("chat_ws_requests_total", "WebSocket chat requests by outcome", ("outcome",))
+WS_CLOSED = counter("chat_ws_closed_total", "WebSocket chat connections closed by the server", ("reason",))
+
+# Requests share the token bucket of POST /ai/chat
+CHAT_ROUTE = f"{settings.API_PREFIX}/v1/ai/chat"
+
+MAX_REQUEST_ID_LENGTH = 64
+
+
+def _bearer_token(websocket: WebSocket) -> Optional[str]:
+    authorization = websocket.headers.get("authorization", "")
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() == "bearer" and token:
+        return token
+    return websocket.query_params.get("access_token")
+
+
+class ChatChannel:
+    """
+    One authenticated connection: a reader dispatching client frames, a
+    writer draining the send queue, a heartbeat, and a task per request.
+    """
+
+    def __init__(self, websocket: WebSocket, user_id: int, expires_at: Optional[float]):
+        self.websocket = websocket
+        self.user_id = user_id
+        self.expires_at = expires_at
+        self.outbox: asyncio.Queue = asyncio.Queue(settings.CHAT_WS_SEND_QUEUE_SIZE)
+        self.requests: Dict[str, asyncio.Task] = {}
+        self.last_received = monotonic()
+        self.close_code = status.WS_1000_NORMAL_CLOSURE
+        self.close_reason = ""
+        self._closing = asyncio.Event()
+
+    def close(self, code: int, reason: str, label: str) -> None:
+        """
+        Ask ``run`` to end the connection; ``label`` names the reason in metrics.
+        """
+        if not self._closing.is_set():
+            WS_CLOSED.labels(label).inc()
+            self.close_code, self.close_reason = code, reason
+            self._closing.set()
+
+    async def send(self, frame: Dict[str, Any]) -> None:
+        """
+        Queue a frame, waiting while the queue is full. Closes the connection
+        and raises ``WebSocketDisconnect`` if the client does not keep up.
+        """
+        try:
+            await asyncio.wait_for(self.outbox.put(frame), settings.CHAT_WS_SEND_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
+            self.close(status.WS_1013_TRY_AGAIN_LATER, "Client too slow", "slow_client")
+            raise WebSocketDisconnect(status.WS_1013_TRY_AGAIN_LATER)
+
+    async def run(self) -> None:
+        tasks = [
+            asyncio.ensure_future(self._read()),
+            asyncio.ensure_future(self._write()),
+            asyncio.ensure_future(self._heartbeat()),
+            asyncio.ensure_future(self._closing.wait()),
+        ]
+        try:
+            await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in tasks + list(self.requests.values()):
+                task.cancel()
+            await asyncio.gather(*tasks, *self.requests.values(), return_exceptions=True)
+
+        if self.websocket.client_state == WebSocketState.CONNECTED:
+            try:
+                await self.websocket.close(self.close_code, self.close_reason)
+            except RuntimeError:
+                # The client went away first
+                pass
+
+    async def _write(self) -> None:
+        while True:
+            frame = await self.outbox.get()
+            await self.websocket.send_text(orjson.dumps(frame).decode())
+
+    async def _heartbeat(self) -> None:
+        interval = settings.CHAT_WS_HEARTBEAT_INTERVAL_SECONDS
+        while True:
+            await asyncio.sleep(interval)
+            if monotonic() - self.last_received > settings.CHAT_WS_IDLE_TIMEOUT_SECONDS:
+                self.close(status.WS_1001_GOING_AWAY, "Heartbeat timeout", "idle")
+                return
+            if self.expires_at is not None and time() >= self.expires_at:
+                self.close(status.WS_1008_POLICY_VIOLATION, "Token expired", "token_expired")
+                return
+            try:
+                self.outbox.put_nowait({"type": "ping"})
+            except asyncio.QueueFull:
+                # Frames are already waiting; the idle check covers a dead client
+                pass
+
+    async def _read(self) -> None:
+        while True:
+            message = await self.websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                return
+            self.last_received = monotonic()
+            try:
+                frame = orjson.loads(message.get("text") or message.get("bytes") or b"")
+            except orjson.JSONDecodeError:
+                await self.send({"type": "error", "id": None, "status": 400, "detail": "Invalid JSON"})
+                continue
+            if not isinstance(frame, dict):
+                await self.send({"type": "error", "id": None, "status": 400, "detail": "Expected a JSON object"})
+                continue
+            await self._dispatch(frame)
+
+    async def _dispatch(self, frame: Dict[str, Any]) -> None:
+        frame_type = frame.get("type")
+        request_id = frame.get("id")
+        if frame_type == "ping":
+            await self.send({"type": "pong"})
+        elif frame_type == "pong":
+            pass
+        elif frame_type == "cancel":
+            task = self.requests.pop(request_id, None) if isinstance(request_id, str) else None
+            if task is None or not task.cancel():
+                await self.send({"type": "error", "id": request_id, "status": 404,
+                                 "detail": "No running request with this id"})
+                return
+            WS_REQUESTS.labels("cancelled").inc()
+            await self.send({"type": "cancelled", "id": request_id})
+        elif frame_type == "chat":
+            await self._start_chat(request_id, frame)
+        else:
+            await self.send({"type": "error", "id": request_id, "status": 400,
+                             "detail": f"Unknown frame type: {frame_type}"})
+
+    async def _reject(self, request_id: Any, status_code: int, detail: Any) -> None:
+        WS_REQUESTS.labels("rejected").inc()
+        await self.send({"type": "error", "id": request_id, "status": status_code, "detail": detail})
+
+    async def _start_chat(self, request_id: Any, frame: Dict[str, Any]) -> None:
+        if not isinstance(request_id, str) or not 0 < len(request_id) <= MAX_REQUEST_ID_LENGTH:
+            await self._reject(request_id, 400, f"id must be a string of 1 to {MAX_REQUEST_ID_LENGTH} characters")
+            return
+        if request_id in self.requests:
+            await self._reject(request_id, 409, "A request with this id is already running")
+            return
+        if len(self.requests) >= settings.CHAT_WS_MAX_CONCURRENT_REQUESTS:
+            await self._reject(request_id, 429, "Too many concurrent requests on this connection")
+            return
+        if self.expires_at is not None and time() >= self.expires_at:
+            self.close(status.WS_1008_POLICY_VIOLATION, "Token expired", "token_expired")
+            return
+        try:
+            request = ChatCompletionRequest(**{k: v for k, v in frame.items() if k not in ("type", "id")})
+        except ValidationError as e:
+            await self._reject(request_id, 422, jsonable_encoder(e.errors()))
+            return
+
+        task = asyncio.ensure_future(self._chat(request_id, request))
+        self.requests[request_id] = task
+        task.add_done_callback(lambda _: self._forget(request_id, task))
+
+    def _forget(self, request_id: str, task: asyncio.Task) -> None:
+        # A cancelled request's id may already have been reused
+        if self.requests.get(request_id) is task:
+            del self.requests[request_id]
+
+    async def _finish(self, request_id: str, frame: Dict[str, Any]) -> None:
+        """
+        Send a request's last frame, freeing its slot and id first so the
+        client can start another as soon as it sees this one end.
+        """
+        self._forget(request_id, asyncio.current_task())
+        await self.send(frame)
+
+    async def _chat(self, request_id: str, request: ChatCompletionRequest) -> None:
+        """
+        Run one completion, streaming its pieces. Charged to the same token
+        bucket as ``POST /ai/chat``: the estimate up front, settled at the end
+        against the usage, or, for a request that fails, is cancelled or loses
+        its connection, the prompt plus the text streamed so far (nothing if
+        no text was streamed).
+        """
+        estimated_tokens = estimate_request_tokens(
+            [{"role": m.role, "content": m.content} for m in request.messages],
+            model=request.model,
+            max_tokens=request.max_tokens
+        )
+        try:
+            await chat_token_limiter.hit(self.websocket, self.user_id, cost=estimated_tokens, route=CHAT_ROUTE)
+        except HTTPException as e:
+            WS_REQUESTS.labels("rate_limited").inc()
+            await self._finish(request_id, {
+                "type": "error", "id": request_id, "status": e.status_code, "detail": e.detail,
+                "retry_after": int((e.headers or {}).get("Retry-After", 0)),
+            })
+            return
+
+        if settings.CHAT_WS_REQUEST_TIMEOUT_SECONDS:
+            # Bounds the upstream calls like an HTTP request's deadline
+            current_deadline.set(Deadline(settings.CHAT_WS_REQUEST_TIMEOUT_SECONDS))
+        pieces: List[str] = []
+        usage: Optional[Dict[str, int]] = None
+
+        async def stream() -> Dict[str, Any]:
+            result: Dict[str, Any] = {}
+            items = stream_chat_completion(
+                messages=request.messages,
+                model=request.model,
+                temperature=request.temperature,
+                max_tokens=request.max_tokens
+            )
+            try:
+                async for item in items:
+                    if "delta" in item:
+                        pieces.append(item["delta"])
+                        await self.send({"type": "delta", "id": request_id, "content": item["delta"]})
+                    else:
+                        result = item
+            finally:
+                # Closes the upstream request when cancelled mid-stream
+                await items.aclose()
+            return result
+
+        try:
+            result = await asyncio.wait_for(stream(), settings.CHAT_WS_REQUEST_TIMEOUT_SECONDS or None)
+            usage = result["usage"]
+        except WebSocketDisconnect:
+            return
+        except asyncio.TimeoutError:
+            WS_REQUESTS.labels("timed_out").inc()
+            await self._finish(request_id, {
+                "type": "error", "id": request_id, "status": 504, "detail": "Request timed out",
+            })
+            return
+        except Exception as e:
+            WS_REQUESTS.labels("error").inc()
+            await self._finish(request_id, {
+                "type": "error", "id": request_id, "status": 500,
+                "detail": f"Failed to generate completion: {str(e)}",
+            })
+            return
+        finally:
+            # Runs on cancellation too, so a request never keeps its whole
+            # estimate; shielded so that closing the connection cannot cut it short
+            await asyncio.shield(chat_token_limiter.adjust(
+                self.websocket, self.user_id,
+                estimated_tokens - self._used_tokens(request, estimated_tokens, pieces, usage),
+                route=CHAT_ROUTE,
+            ))
+
+        await record_event(CHAT_COMPLETION, user_id=self.user_id, model=result["model"], usage=usage)
+        WS_REQUESTS.labels("done").inc()
+        await self._finish(request_id, {"type": "done", "id": request_id, **result})
+
+    @staticmethod
+    def _used_tokens(request: ChatCompletionRequest, estimated_tokens: int,
+                     pieces: List[str], usage: Optional[Dict[str, int]]) -> int:
+        """
+        Tokens to charge for a request: the reported usage when it finished,
+        else the estimated prompt plus the streamed text, else nothing.
+        """
+        if usage is not None:
+            return usage["total_tokens"]
+        if not pieces:
+            return 0
+        prompt_tokens = estimated_tokens - (request.max_tokens or settings.CHAT_COMPLETION_TOKEN_RESERVE)
+        return prompt_tokens + count_text_tokens("".join(pieces), request.model)
+
+@router.websocket("/chat/ws")
+async def chat_websocket(websocket: WebSocket):
+    """
+    Multiplexed, streaming chat completions over one authenticated connection
+    """
+    token = _bearer_token(websocket)
+    if not token:
+        await websocket.close(status.WS_1008_POLICY_VIOLATION, "Not authenticated")
+        return
+    try:
+        async with AsyncSessionLocal() as db:
+            user = await authenticate_token(db, token)
+        expires_at = jwt.get_unverified_claims(token).get("exp")
+    except (HTTPException, JWTError):
+        await websocket.close(status.WS_1008_POLICY_VIOLATION, "Could not validate credentials")
+        return
+    if not user.is_active:
+        await websocket.close(status.WS_1008_POLICY_VIOLATION, "Inactive user")
+        return
+
+    await websocket.accept()
+    WS_CONNECTIONS.inc()
+    try:
+        channel = ChatChannel(websocket, user.id, expires_at)
+        await channel.send({"type": "ready"})
+        await channel.run()
+    finally:
+        WS_CONNECTIONS.dec()
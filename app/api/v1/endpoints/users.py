@@ -1,12 +1,17 @@
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 
 from app.db.session import get_db
 from app.models.user import User
-from app.schemas.user import UserCreate, UserResponse, UserUpdate
-from app.core.security import get_current_active_user, get_password_hash
+from app.schemas.user import (
+    USER_RESPONSE_FIELDS, UserCreate, UserImportResponse, UserResponse, UserUpdate
+)
+from app.core.responses import trusted_response
+from app.core.security import get_current_active_user, get_current_superuser, get_password_hash
+from app.services.user_bulk import export_users, import_users, iter_lines
 
 router = APIRouter()
 
@@ -27,9 +32,48 @@ async def get_users(
             detail="Not enough permissions"
         )
     
-    result = await db.execute(select(User).offset(skip).limit(limit))
-    users = result.scalars().all()
-    return users
+    # Column-only select: plain rows, no ORM instances to build
+    result = await db.execute(
+        select(*User.columns(USER_RESPONSE_FIELDS)).offset(skip).limit(limit)
+    )
+    return trusted_response(User.to_dicts(result.all(), USER_RESPONSE_FIELDS))
+
+
+@router.post("/import", response_model=UserImportResponse)
+async def import_users_ndjson(
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_superuser)
+):
+    """
+    Bulk import users from an NDJSON body, one user per line. Admin only.
+
+    Each line takes the UserCreate fields, with either ``password`` or a
+    bcrypt ``hashed_password``. Existing and repeated emails or usernames
+    are skipped; invalid lines are reported by line number.
+    """
+    try:
+        return await import_users(db, iter_lines(request.stream()))
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error importing users: {str(e)}"
+        )
+
+
+@router.get("/export")
+async def export_users_ndjson(
+    include_password_hashes: bool = False,
+    current_user: User = Depends(get_current_superuser)
+):
+    """
+    Stream all users as NDJSON. Admin only.
+    """
+    return StreamingResponse(
+        export_users(include_password_hashes=include_password_hashes),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="users.ndjson"'},
+    )
 
 
 @router.get("/me", response_model=UserResponse)
@@ -1,5 +1,5 @@
 from fastapi import APIRouter
-from app.api.v1.endpoints import users, auth, ai
+from app.api.v1.endpoints import users, auth, ai, chat_ws
 
 # API v1 router
 api_router = APIRouter()
@@ -7,4 +7,5 @@ api_router = APIRouter()
 # Include all endpoint routers
 api_router.include_router(users.router, prefix="/users", tags=["users"])
 api_router.include_router(auth.router, prefix="/auth", tags=["authentication"])
-api_router.include_router(ai.router, prefix="/ai", tags=["ai"]) 
\ No newline at end of file
+api_router.include_router(ai.router, prefix="/ai", tags=["ai"])
+api_router.include_router(chat_ws.router, prefix="/ai", tags=["ai"]) 
\ No newline at end of file
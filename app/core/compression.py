@@ -0,0 +1,285 @@
+"""
+Response compression (gzip, and Brotli when installed) with per-content-type
+size thresholds, large bodies compressed off the event loop, and a cache of
+precompressed bodies for responses built from cached results.
+"""
+from typing import Hashable, Optional, Tuple
+from collections import OrderedDict
+import gzip
+import threading
+import zlib
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.requests import Request
+from starlette.responses import Response
+
+from app.core.config import settings
+from app.core.deadlines import current_deadline
+from app.core.metrics import counter
+from app.utils.concurrency import run_in_threadpool
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional, gzip is always available
+    brotli = None
+
+COMPRESSION_BYTES = counter(
+    "http_compression_bytes_total", "Response bytes before and after compression", ("encoding", "stage")
+)
+
+# Request state key holding the identity of a response worth caching compressed
+CACHE_FLAG = "compression_cache"
+
+
+def negotiate(accept_encoding: str) -> Optional[str]:
+    """
+    Preferred encoding the client accepts: "br", "gzip" or None.
+    """
+    accepted = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+    for encoding in ("br", "gzip"):
+        if encoding == "br" and brotli is None:
+            continue
+        if accepted.get(encoding, accepted.get("*", 0.0)) > 0:
+            return encoding
+    return None
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=settings.COMPRESSION_BROTLI_QUALITY)
+    # mtime=0 keeps the output deterministic, so cached bodies are reusable
+    return gzip.compress(body, compresslevel=settings.COMPRESSION_GZIP_LEVEL, mtime=0)
+
+
+class _StreamCompressor:
+    """
+    Incremental compressor that flushes after every chunk, so streamed
+    responses stay live.
+    """
+
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == "br":
+            self._compressor = brotli.Compressor(quality=settings.COMPRESSION_BROTLI_QUALITY)
+        else:
+            self._compressor = zlib.compressobj(settings.COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def chunk(self, data: bytes) -> bytes:
+        if self.encoding == "br":
+            return self._compressor.process(data) + self._compressor.flush()
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        if self.encoding == "br":
+            return self._compressor.finish()
+        return self._compressor.flush()
+
+
+class CompressedBodyCache:
+    """
+    LRU of compressed bodies and their content types, keyed by the identity
+    of the response (chosen by the endpoint, e.g. a result cache key) and the
+    encoding, bounded by total compressed size.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Tuple[Hashable, str], Tuple[bytes, str]]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Tuple[Hashable, str]) -> Optional[Tuple[bytes, str]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def set(self, key: Tuple[Hashable, str], compressed: bytes, content_type: str) -> None:
+        if len(compressed) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= len(previous[0])
+            self._entries[key] = (compressed, content_type)
+            self._size += len(compressed)
+            while self._size > self.max_bytes:
+                _, (evicted, _) = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+
+compressed_cache = CompressedBodyCache(settings.COMPRESSION_CACHE_MAX_BYTES)
+
+
+def cache_compressed(request: Request, key: Optional[Hashable]) -> None:
+    """
+    Keep the compressed form of this response under ``key``, for endpoints
+    that serve the same body repeatedly (such as results from a result
+    cache). ``key`` must change whenever the body would.
+    """
+    if key is not None:
+        request.scope.setdefault("state", {})[CACHE_FLAG] = key
+
+
+def compressed_response(request: Request, key: Optional[Hashable]) -> Optional[Response]:
+    """
+    The response stored by ``cache_compressed`` under ``key``, in an encoding
+    the client accepts, or None. Endpoints return it instead of building and
+    serializing the body again.
+    """
+    if key is None or not settings.COMPRESSION_ENABLED:
+        return None
+    encoding = negotiate(request.headers.get("accept-encoding", ""))
+    if encoding is None:
+        return None
+    entry = compressed_cache.get((key, encoding))
+    if entry is None:
+        return None
+    compressed, content_type = entry
+    return Response(
+        compressed,
+        headers={"content-type": content_type, "content-encoding": encoding, "vary": "Accept-Encoding"},
+    )
+
+
+def _minimum_size(content_type: str) -> Optional[int]:
+    """
+    Smallest body worth compressing for a content type, or None if the type
+    is not compressed. Keys match by prefix, so "text/" covers all text.
+    """
+    media_type = content_type.split(";", 1)[0].strip().lower()
+    for prefix, size in _MIN_SIZES:
+        if media_type.startswith(prefix):
+            return size
+    return None
+
+
+# Content type thresholds, longest prefix first
+_MIN_SIZES = sorted(settings.COMPRESSION_MIN_SIZES.items(), key=lambda item: -len(item[0]))
+
+
+async def _compress_body(body: bytes, encoding: str) -> bytes:
+    if len(body) < settings.COMPRESSION_THREAD_MIN_SIZE:
+        return compress(body, encoding)
+    # This runs in the request's task, but the response is finished: it must
+    # not be shed or timed out by the request deadline
+    token = current_deadline.set(None)
+    try:
+        return await run_in_threadpool(compress, body, encoding)
+    finally:
+        current_deadline.reset(token)
+
+
+class CompressionMiddleware:
+    """
+    Pure ASGI middleware compressing responses the client accepts encoded.
+
+    Complete bodies are compressed when their content type is listed in
+    ``COMPRESSION_MIN_SIZES`` and they reach its threshold. Bodies from
+    ``COMPRESSION_THREAD_MIN_SIZE`` up are compressed in the executor.
+    Streamed bodies (NDJSON exports) are compressed chunk by chunk with a
+    flush after each; event streams are left alone so events are not held back.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        # None until the first body message decides; then "compress" or "pass"
+        mode = None
+        streamer: Optional[_StreamCompressor] = None
+
+        async def send_wrapper(message):
+            nonlocal start_message, mode, streamer
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+            if mode is None:
+                headers = MutableHeaders(raw=start_message["headers"])
+                minimum = _minimum_size(headers.get("content-type", ""))
+                eligible = (
+                    minimum is not None
+                    and "content-encoding" not in headers
+                    and "no-transform" not in headers.get("cache-control", "")
+                    and start_message["status"] not in (204, 304)
+                    and start_message["status"] >= 200
+                )
+                if not more_body:
+                    if not eligible or len(body) < minimum:
+                        mode = "pass"
+                        await send(start_message)
+                        await send(message)
+                        return
+                    compressed = await _compress_body(body, encoding)
+                    cache_key = scope.get("state", {}).get(CACHE_FLAG)
+                    if cache_key is not None and start_message["status"] == 200:
+                        compressed_cache.set((cache_key, encoding), compressed, headers.get("content-type", ""))
+                    COMPRESSION_BYTES.labels(encoding, "in").inc(len(body))
+                    COMPRESSION_BYTES.labels(encoding, "out").inc(len(compressed))
+                    headers["content-encoding"] = encoding
+                    headers["content-length"] = str(len(compressed))
+                    headers.add_vary_header("Accept-Encoding")
+                    mode = "compress"
+                    await send(start_message)
+                    await send({"type": "http.response.body", "body": compressed})
+                    return
+
+                if not eligible or headers.get("content-type", "").startswith("text/event-stream"):
+                    mode = "pass"
+                    await send(start_message)
+                    await send(message)
+                    return
+
+                mode = "compress"
+                streamer = _StreamCompressor(encoding)
+                headers["content-encoding"] = encoding
+                if "content-length" in headers:
+                    del headers["content-length"]
+                headers.add_vary_header("Accept-Encoding")
+                await send(start_message)
+
+            if mode == "pass":
+                await send(message)
+                return
+
+            data = streamer.chunk(body) if body else b""
+            if not more_body:
+                data += streamer.finish()
+            COMPRESSION_BYTES.labels(encoding, "in").inc(len(body))
+            COMPRESSION_BYTES.labels(encoding, "out").inc(len(data))
+            await send({"type": "http.response.body", "body": data, "more_body": more_body})
+
+        await self.app(scope, receive, send_wrapper)
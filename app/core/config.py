@@ -1,4 +1,4 @@
-from typing import List
+from typing import Dict, List
 import os
 from pathlib import Path
 from pydantic_settings import BaseSettings, SettingsConfigDict
@@ -20,6 +20,12 @@ class Settings(BaseSettings):
     SECRET_KEY: str = os.getenv("SECRET_KEY", "supersecretkey")
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 7  # 7 days
     
+    # Bulk user import/export
+    USER_IMPORT_CHUNK_SIZE: int = 500
+    USER_IMPORT_MAX_LINE_BYTES: int = 64 * 1024
+    USER_EXPORT_BATCH_SIZE: int = 1000
+    PASSWORD_HASH_WORKERS: int = 0  # 0 = one per CPU
+    
     # CORS
     CORS_ORIGINS: List[str] = [
         "http://localhost:3000",  # Vite default
@@ -29,13 +35,139 @@ class Settings(BaseSettings):
         "http://localhost"
     ]
     
+    # Responses
+    RESPONSE_MODEL_BYPASS: bool = True
+    
+    # Response compression (Brotli when installed, else gzip)
+    COMPRESSION_ENABLED: bool = True
+    # Smallest body compressed per content type, matched by prefix
+    COMPRESSION_MIN_SIZES: Dict[str, int] = {
+        "application/json": 1024,
+        "application/x-ndjson": 1024,
+        "text/": 1024,
+    }
+    COMPRESSION_GZIP_LEVEL: int = 6
+    COMPRESSION_BROTLI_QUALITY: int = 5
+    # Bodies from this size up are compressed off the event loop
+    COMPRESSION_THREAD_MIN_SIZE: int = 65536
+    COMPRESSION_CACHE_MAX_BYTES: int = 32 * 1024 * 1024
+    
+    # Request deadlines and load shedding
+    REQUEST_TIMEOUT_SECONDS: float = 30.0  # 0 disables deadlines
+    REQUEST_TIMEOUT_MAX_SECONDS: float = 300.0
+    REQUEST_TIMEOUT_HEADER: str = "X-Request-Timeout"
+    # Per-route defaults in seconds, longest path prefix wins
+    REQUEST_TIMEOUT_ROUTES: Dict[str, float] = {
+        "/api/v1/ai/chat": 60.0,
+        "/api/v1/ai/statistical/linear-regression/train": 300.0,
+        "/api/v1/users/import": 600.0,
+        "/api/admin/profile": 90.0,
+    }
+    LOAD_SHEDDING_ENABLED: bool = True
+    LOAD_SHEDDING_PREFIXES: List[str] = ["/api/v1/ai"]
+    
+    # Rate limiting (per user and route)
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_BACKEND: str = "memory"  # "memory" or "redis"
+    RATE_LIMIT_REDIS_URL: str = "redis://localhost:6379/0"
+    RATE_LIMIT_SHARDS: int = 16
+    RATE_LIMIT_CHAT_TOKENS_PER_MINUTE: int = 40000
+    RATE_LIMIT_INFERENCE_PER_MINUTE: int = 60
+    
+    # Metrics
+    METRICS_ENABLED: bool = True
+    METRICS_PATH: str = "/metrics"
+    
+    # Profiling
+    PROFILING_ENABLED: bool = False
+    PROFILING_MAX_SECONDS: float = 60.0
+    SLOW_REQUEST_CAPTURE_ENABLED: bool = True
+    SLOW_REQUEST_THRESHOLD_MS: float = 1000.0
+    SLOW_REQUEST_BUFFER_SIZE: int = 100
+    
     # Database settings
     DATABASE_URL: str = os.getenv("DATABASE_URL", "sqlite:///./app.db")
+    # Schema handling at startup: "migrate" (apply pending Alembic migrations,
+    # one process at a time), "check" (only warn when behind) or "create_all"
+    DB_STARTUP_MODE: str = "migrate"
+    
+    # Audit and usage events, written to the database in batches
+    USAGE_EVENTS_ENABLED: bool = True
+    USAGE_EVENTS_QUEUE_SIZE: int = 10000
+    USAGE_EVENTS_BATCH_SIZE: int = 500
+    USAGE_EVENTS_FLUSH_INTERVAL_SECONDS: float = 1.0
+    # When the queue is full: "drop_newest", "drop_oldest" or "block"
+    USAGE_EVENTS_OVERFLOW: str = "drop_newest"
+    # Longest a request waits for room under "block" before dropping
+    USAGE_EVENTS_BLOCK_TIMEOUT_SECONDS: float = 0.05
+    USAGE_EVENTS_SHUTDOWN_TIMEOUT_SECONDS: float = 10.0
     
     # AI settings
     OPENAI_API_KEY: str = os.getenv("OPENAI_API_KEY", "")
     DEFAULT_LLM_MODEL: str = "gpt-3.5-turbo"
     
+    # WebSocket chat channel (/ai/chat/ws)
+    CHAT_WS_MAX_CONCURRENT_REQUESTS: int = 4
+    # Frames queued for a client; senders wait when it is full
+    CHAT_WS_SEND_QUEUE_SIZE: int = 256
+    # Close a connection whose client has not made room in this time
+    CHAT_WS_SEND_TIMEOUT_SECONDS: float = 10.0
+    CHAT_WS_HEARTBEAT_INTERVAL_SECONDS: float = 20.0
+    # Close a connection after this long without any frame from the client
+    CHAT_WS_IDLE_TIMEOUT_SECONDS: float = 60.0
+    CHAT_WS_REQUEST_TIMEOUT_SECONDS: float = 60.0  # 0 disables
+    
+    # Startup warmup: import AI libraries and load these models before
+    # serving ("task:model_name" pipelines or "statistical:name")
+    AI_WARMUP: bool = False
+    AI_WARMUP_MODELS: List[str] = []
+    
+    # Pre-fork launcher (python -m app.core.prefork)
+    PREFORK_WORKERS: int = 2
+    PREFORK_MEMORY_REPORT_INTERVAL: float = 300.0
+    
+    # Chat context trimming
+    CHAT_CONTEXT_TOKEN_BUDGET: int = 3000
+    CHAT_COMPLETION_TOKEN_RESERVE: int = 512
+    CHAT_TRIM_STRATEGY: str = "truncate"  # "none", "truncate" or "summarize"
+    CHAT_SUMMARY_MAX_TOKENS: int = 256
+    CHAT_TOKEN_CACHE_SIZE: int = 10000
+    CHAT_SUMMARY_CACHE_SIZE: int = 256
+    
+    # Statistical models
+    MODEL_VERSIONS_TO_KEEP: int = 3
+    TRAINING_BACKEND: str = "thread"  # "thread" or "process"
+    MAX_CONCURRENT_FITS: int = 2  # across all workers sharing ./models
+    TRAINING_TIMEOUT_SECONDS: float = 300.0
+    TRAINING_THREADS_PER_FIT: int = 1
+    
+    # Statistical result cache
+    TIMESERIES_CACHE_SIZE: int = 256
+    TIMESERIES_CACHE_DISK: bool = False
+    TIMESERIES_CACHE_DISK_ENTRIES: int = 4096
+    
+    # Local text generation
+    # Generated pieces queued for a slow client before generation pauses
+    GENERATION_STREAM_BUFFER: int = 32
+    # Threads for streamed generation, separate from the shared thread pool;
+    # further streams wait for a free one
+    GENERATION_STREAM_WORKERS: int = 2
+    
+    # Embeddings and vector search
+    EMBEDDING_MODEL: str = "sentence-transformers/all-MiniLM-L6-v2"
+    EMBEDDING_BATCH_SIZE: int = 32
+    VECTOR_INDEX_BLOCK_SIZE: int = 16384
+    VECTOR_INDEX_MODE: str = "exact"  # "exact" or "ivf"
+    # In "ivf" mode, indexes are clustered once they reach this size
+    VECTOR_INDEX_IVF_MIN_VECTORS: int = 50000
+    VECTOR_INDEX_IVF_NPROBE: int = 8
+    VECTOR_INDEX_QUANTIZE: bool = True
+    
+    # Batch time series analysis
+    TIMESERIES_BATCH_MAX_SERIES: int = 10000
+    # Upper bound on series x aligned periods in one batch
+    TIMESERIES_BATCH_MAX_CELLS: int = 20_000_000
+    
     model_config = SettingsConfigDict(env_file=".env", env_file_encoding="utf-8", case_sensitive=True)
 
 
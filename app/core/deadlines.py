@@ -0,0 +1,279 @@
+"""
+Request deadlines: a time budget per request, taken from a client header or
+a per-route default, that bounds database statements, executor work and
+upstream AI calls, and lets overloaded workers shed requests early.
+"""
+from typing import Dict, Optional
+from contextvars import ContextVar
+from time import monotonic
+import asyncio
+import math
+import os
+import threading
+
+from app.core.config import settings
+from app.core.metrics import counter
+
+REQUESTS_TIMED_OUT = counter("http_requests_timed_out_total", "Requests that ran past their deadline")
+REQUESTS_SHED = counter("http_requests_shed_total", "Requests rejected early because of load", ("reason",))
+
+# Smoothing factor for the executor run time average
+_EWMA_ALPHA = 0.1
+
+
+class LoadShed(Exception):
+    """
+    Raised to reject a request the server cannot finish in time; the
+    deadline middleware answers 503.
+    """
+
+    def __init__(self, reason: str):
+        super().__init__(f"Server overloaded ({reason})")
+        self.reason = reason
+
+
+class Deadline:
+    """
+    Absolute deadline of one request on the monotonic clock.
+
+    ``sheddable`` marks requests that may be rejected under load (set by the
+    middleware for ``LOAD_SHEDDING_PREFIXES``); once ``response_started`` is
+    set the request is never shed, so clients don't get a broken response.
+    """
+    __slots__ = ("expires_at", "shed_reason", "sheddable", "response_started")
+
+    def __init__(self, timeout: float, sheddable: bool = False):
+        self.expires_at = monotonic() + timeout
+        self.shed_reason: Optional[str] = None
+        self.sheddable = sheddable
+        self.response_started = False
+
+    def remaining(self) -> float:
+        return self.expires_at - monotonic()
+
+    def can_shed(self) -> bool:
+        return self.sheddable and not self.response_started
+
+    def shed(self, reason: str) -> None:
+        """
+        Give up on the request by raising ``LoadShed``. Being an ordinary
+        exception, it runs the services' ``except Exception`` cleanup; if a
+        service wraps it in its own error, the middleware still turns the
+        resulting 5xx into a 503.
+        """
+        self.shed_reason = reason
+        raise LoadShed(reason)
+
+
+current_deadline: ContextVar[Optional[Deadline]] = ContextVar("current_deadline", default=None)
+
+
+def remaining_time() -> Optional[float]:
+    """
+    Seconds left for the current request, or None outside a request.
+    """
+    deadline = current_deadline.get()
+    return None if deadline is None else deadline.remaining()
+
+
+class ExecutorLoad:
+    """
+    Executor backlog and average task run time, for queue-wait estimates.
+    """
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self.queued = 0
+        self.average_run_time = 0.0
+        self._lock = threading.Lock()
+
+    def enqueue(self) -> None:
+        with self._lock:
+            self.queued += 1
+
+    def dequeue(self) -> None:
+        with self._lock:
+            self.queued -= 1
+
+    def observe_run(self, seconds: float) -> None:
+        with self._lock:
+            if self.average_run_time == 0.0:
+                self.average_run_time = seconds
+            else:
+                self.average_run_time += _EWMA_ALPHA * (seconds - self.average_run_time)
+
+    def estimated_wait(self) -> float:
+        """
+        Time a task submitted now would wait before a thread picks it up.
+        """
+        return math.ceil(self.queued / self.workers) * self.average_run_time
+
+
+# Sized like asyncio's default executor
+executor_load = ExecutorLoad(min(32, (os.cpu_count() or 1) + 4))
+
+
+def _statement_timeout_ms() -> Optional[int]:
+    remaining = remaining_time()
+    if remaining is None:
+        return None
+    return max(int(remaining * 1000), 1)
+
+
+def apply_statement_timeouts(engine) -> None:
+    """
+    Bound database statements by the current request's remaining time.
+
+    PostgreSQL gets ``SET LOCAL statement_timeout`` at the start of each
+    transaction, so the setting never outlives it on a pooled connection.
+    MySQL SELECTs get a ``MAX_EXECUTION_TIME`` optimizer hint. SQLite has no
+    server-side timeout; there the request is cancelled at the deadline.
+    """
+    from sqlalchemy import event
+
+    sync_engine = getattr(engine, "sync_engine", engine)
+    dialect = sync_engine.dialect.name
+
+    if dialect == "postgresql":
+        @event.listens_for(sync_engine, "begin")
+        def _set_statement_timeout(conn):
+            timeout_ms = _statement_timeout_ms()
+            if timeout_ms is not None:
+                conn.exec_driver_sql(f"SET LOCAL statement_timeout = {timeout_ms}")
+
+    elif dialect == "mysql":
+        @event.listens_for(sync_engine, "before_cursor_execute", retval=True)
+        def _add_execution_hint(conn, cursor, statement, parameters, context, executemany):
+            timeout_ms = _statement_timeout_ms()
+            if timeout_ms is not None and statement[:6].upper() == "SELECT":
+                statement = f"SELECT /*+ MAX_EXECUTION_TIME({timeout_ms}) */{statement[6:]}"
+            return statement, parameters
+
+
+# Per-route timeouts, longest prefix first
+_ROUTE_TIMEOUTS = sorted(settings.REQUEST_TIMEOUT_ROUTES.items(), key=lambda item: -len(item[0]))
+
+
+def _route_timeout(path: str) -> float:
+    for prefix, timeout in _ROUTE_TIMEOUTS:
+        if path.startswith(prefix):
+            return timeout
+    return settings.REQUEST_TIMEOUT_SECONDS
+
+
+def _header_timeout(scope) -> Optional[float]:
+    name = settings.REQUEST_TIMEOUT_HEADER.lower().encode("latin-1")
+    for key, value in scope.get("headers", []):
+        if key == name:
+            try:
+                timeout = float(value)
+            except ValueError:
+                return None
+            return timeout if timeout > 0 else None
+    return None
+
+
+async def _send_error(send, status: int, detail: bytes, headers: Dict[bytes, bytes]) -> None:
+    body = b'{"detail":"' + detail + b'"}'
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+        ] + list(headers.items()),
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+class DeadlineMiddleware:
+    """
+    Pure ASGI middleware giving each request a deadline.
+
+    The budget is the ``REQUEST_TIMEOUT_HEADER`` value in seconds (capped at
+    ``REQUEST_TIMEOUT_MAX_SECONDS``) or the route's default. Requests under
+    ``LOAD_SHEDDING_PREFIXES`` are rejected with 503 up front when the
+    executor queue wait alone would exceed the budget, or later with
+    ``LoadShed`` while their response has not started. A request that has not
+    started its response by the deadline is cancelled and answered with 504;
+    responses already streaming are left to finish.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        path = scope["path"]
+        timeout = _header_timeout(scope)
+        if timeout is None:
+            timeout = _route_timeout(path)
+        else:
+            timeout = min(timeout, settings.REQUEST_TIMEOUT_MAX_SECONDS)
+        if not timeout:
+            await self.app(scope, receive, send)
+            return
+
+        sheddable = settings.LOAD_SHEDDING_ENABLED and path.startswith(tuple(settings.LOAD_SHEDDING_PREFIXES))
+        if sheddable:
+            wait = executor_load.estimated_wait()
+            if wait > timeout:
+                REQUESTS_SHED.labels("executor_queue").inc()
+                await _send_error(send, 503, b"Server overloaded", {b"retry-after": str(math.ceil(wait)).encode()})
+                return
+
+        deadline = Deadline(timeout, sheddable=sheddable)
+        replaced = False
+
+        async def send_wrapper(message):
+            nonlocal replaced
+            if message["type"] == "http.response.start":
+                if deadline.shed_reason is not None and message["status"] >= 500:
+                    # A service wrapped the LoadShed in its own error
+                    replaced = True
+                    deadline.response_started = True
+                    await _send_error(send, 503, b"Server overloaded", {b"retry-after": b"1"})
+                    return
+                deadline.response_started = True
+            elif replaced:
+                return
+            await send(message)
+
+        token = current_deadline.set(deadline)
+        try:
+            # The task copies the context, deadline included
+            task = asyncio.ensure_future(self.app(scope, receive, send_wrapper))
+        finally:
+            current_deadline.reset(token)
+
+        try:
+            done, _ = await asyncio.wait({task}, timeout=timeout)
+            if not done:
+                if deadline.response_started:
+                    # Streaming responses may outlive the deadline
+                    await task
+                    return
+                REQUESTS_TIMED_OUT.inc()
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+                if not deadline.response_started:
+                    await _send_error(send, 504, b"Request deadline exceeded", {})
+                return
+        except asyncio.CancelledError:
+            # Client gone or server shutting down
+            task.cancel()
+            raise
+
+        if deadline.shed_reason is not None:
+            REQUESTS_SHED.labels(deadline.shed_reason).inc()
+            if not task.cancelled() and isinstance(task.exception(), LoadShed):
+                if not deadline.response_started:
+                    await _send_error(send, 503, b"Server overloaded", {b"retry-after": b"1"})
+                return
+        task.result()
@@ -0,0 +1,372 @@
+"""
+Prometheus-style metrics: counters, gauges and histograms rendered in the
+text exposition format, plus the ASGI middleware, database hooks and service
+wrappers that feed them.
+"""
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+from bisect import bisect_left
+from functools import wraps
+from time import perf_counter
+import threading
+
+from starlette.requests import Request
+from starlette.responses import Response
+
+from app.core.profiling import SPAN_DB, record_span
+
+# Latency buckets in seconds, from sub-millisecond to upstream-call scale
+DEFAULT_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+    0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+)
+
+CONTENT_TYPE_LATEST = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [
+        f'{name}="{str(value).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+        for name, value in zip(names, values)
+    ]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    """
+    Base for a metric family with optional labels.
+    """
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], Any] = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self._default = self._new_child()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values: str):
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _samples(self) -> Iterable[Tuple[Tuple[str, ...], Any]]:
+        if not self.labelnames:
+            return [((), self._default)]
+        return list(self._children.items())
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in self._samples():
+            lines.extend(self._render_child(values, child))
+        return lines
+
+    def _render_child(self, values: Tuple[str, ...], child: Any) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.get())}"]
+
+
+class _Value:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+    def get(self) -> float:
+        return self.value
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._default.inc(amount)
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 function: Optional[Callable[[], Any]] = None):
+        """
+        ``function`` makes a callback gauge, read at scrape time. For labelled
+        gauges it returns a mapping of label value tuples to values.
+        """
+        self._function = function
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _Value()
+
+    def _samples(self):
+        if self._function is None:
+            return super()._samples()
+        result = self._function()
+        if not self.labelnames:
+            return [((), _Constant(result))]
+        return [(tuple(values), _Constant(value)) for values, value in result.items()]
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._default.inc(amount)
+
+    def dec(self, amount: float = 1.0) -> None:
+        self._default.dec(amount)
+
+    def set(self, value: float) -> None:
+        self._default.set(value)
+
+
+class _Constant:
+    __slots__ = ("value",)
+
+    def __init__(self, value: float):
+        self.value = value
+
+    def get(self) -> float:
+        return self.value
+
+
+class _HistogramValue:
+    __slots__ = ("upper_bounds", "counts", "sum", "_lock")
+
+    def __init__(self, upper_bounds: Tuple[float, ...]):
+        self.upper_bounds = upper_bounds
+        # One extra slot for observations above the last bound (+Inf)
+        self.counts = [0] * (len(upper_bounds) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect_left(self.upper_bounds, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.upper_bounds = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramValue(self.upper_bounds)
+
+    def observe(self, value: float) -> None:
+        self._default.observe(value)
+
+    def _render_child(self, values, child):
+        counts, total = list(child.counts), child.sum
+        lines, cumulative = [], 0
+        for bound, count in zip(self.upper_bounds + (float("inf"),), counts):
+            cumulative += count
+            le = f'le="{_format_value(bound)}"'
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, values, le)} {cumulative}")
+        labels = _format_labels(self.labelnames, values)
+        lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+        lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Registry:
+    """
+    Collection of metric families rendered together.
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def get(self, name: str) -> Optional[_Metric]:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+
+def counter(name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+    return registry.register(Counter(name, documentation, labelnames))
+
+
+def gauge(name: str, documentation: str, labelnames: Sequence[str] = (),
+          function: Optional[Callable[[], Any]] = None) -> Gauge:
+    return registry.register(Gauge(name, documentation, labelnames, function))
+
+
+def histogram(name: str, documentation: str, labelnames: Sequence[str] = (),
+              buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+    return registry.register(Histogram(name, documentation, labelnames, buckets))
+
+
+# HTTP
+HTTP_REQUESTS = counter(
+    "http_requests_total", "HTTP requests by route and status class", ("method", "route", "status")
+)
+HTTP_LATENCY = histogram(
+    "http_request_duration_seconds", "HTTP request latency by route", ("method", "route")
+)
+HTTP_IN_FLIGHT = gauge("http_requests_in_flight", "HTTP requests currently being served")
+
+# Database
+DB_QUERY_LATENCY = histogram(
+    "db_query_duration_seconds", "Database statement execution time", ("operation",)
+)
+DB_SESSIONS_IN_FLIGHT = gauge("db_sessions_in_flight", "Database sessions currently open")
+DB_SESSION_DURATION = histogram(
+    "db_session_duration_seconds", "Lifetime of request database sessions"
+)
+
+# Executor
+EXECUTOR_QUEUE_DEPTH = gauge(
+    "executor_queue_depth", "Executor tasks submitted but not yet started"
+)
+EXECUTOR_RUNNING = gauge("executor_tasks_running", "Executor tasks currently running")
+EXECUTOR_QUEUE_WAIT = histogram(
+    "executor_queue_wait_seconds", "Time executor tasks wait before starting"
+)
+EXECUTOR_RUN_TIME = histogram("executor_run_seconds", "Executor task run time")
+
+# AI services
+AI_LATENCY = histogram(
+    "ai_call_duration_seconds", "AI service call latency", ("service", "operation")
+)
+AI_ERRORS = counter("ai_call_errors_total", "Failed AI service calls", ("service", "operation"))
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware recording per-route latency, status and in-flight requests.
+
+    Routes are labelled by their path template (``/api/v1/users/{user_id}``)
+    so label cardinality stays bounded.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc()
+        start = perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = perf_counter() - start
+            HTTP_IN_FLIGHT.dec()
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            method = scope["method"]
+            HTTP_LATENCY.labels(method, path).observe(elapsed)
+            HTTP_REQUESTS.labels(method, path, f"{status_code // 100}xx").inc()
+
+
+async def metrics_endpoint(request: Request) -> Response:
+    """
+    Prometheus scrape endpoint
+    """
+    return Response(registry.render(), media_type=CONTENT_TYPE_LATEST)
+
+
+def instrument_engine(engine) -> None:
+    """
+    Time every statement executed through a SQLAlchemy engine.
+    """
+    from sqlalchemy import event
+
+    sync_engine = getattr(engine, "sync_engine", engine)
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start_time", []).append(perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = perf_counter() - conn.info["query_start_time"].pop()
+        operation = statement.lstrip().split(None, 1)[0].upper() if statement else "UNKNOWN"
+        DB_QUERY_LATENCY.labels(operation).observe(elapsed)
+        record_span(SPAN_DB, elapsed)
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _handle_error(exception_context):
+        starts = exception_context.connection.info.get("query_start_time") if exception_context.connection else None
+        if starts:
+            starts.pop()
+
+
+def observe_latency(service: str, operation: str):
+    """
+    Decorator recording latency and failures of an async AI service call.
+    """
+    latency = AI_LATENCY.labels(service, operation)
+    errors = AI_ERRORS.labels(service, operation)
+
+    def decorator(func):
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            except BaseException:
+                errors.inc()
+                raise
+            finally:
+                latency.observe(perf_counter() - start)
+        return wrapper
+
+    return decorator
@@ -0,0 +1,225 @@
+"""
+Pre-fork launcher: warm models once in a master process, then fork uvicorn
+workers that share the loaded weights copy-on-write.
+
+    python -m app.core.prefork --workers 4 --port 8000
+
+Unlike ``uvicorn --workers``, which starts each worker from scratch, the
+master imports the app and runs the AI warmup before forking. ``gc.freeze()``
+moves everything loaded so far out of the collector's reach, so collections in
+the workers do not write to (and un-share) those pages. Linux and macOS only.
+"""
+from typing import Dict, List, Optional
+import argparse
+import asyncio
+import gc
+import logging
+import os
+import signal
+import socket
+import sys
+import time
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Set in workers started by this launcher
+MASTER_PID_ENV = "PREFORK_MASTER_PID"
+
+# Fields of /proc/<pid>/smaps_rollup reported per process, in kB
+SMAPS_FIELDS = ("Rss", "Pss", "Shared_Clean", "Shared_Dirty", "Private_Clean", "Private_Dirty", "Swap")
+
+
+def read_smaps_rollup(pid: int) -> Optional[Dict[str, int]]:
+    """
+    Memory totals of a process in kB, or None where /proc is unavailable.
+    """
+    try:
+        with open(f"/proc/{pid}/smaps_rollup", "r") as f:
+            lines = f.readlines()
+    except OSError:
+        return None
+    totals = {}
+    for line in lines:
+        key, _, rest = line.partition(":")
+        if key in SMAPS_FIELDS:
+            totals[key] = int(rest.split()[0])
+    return totals
+
+
+def process_memory(pid: int) -> Optional[Dict[str, float]]:
+    """
+    RSS, proportional set size, shared and private memory of a process in MiB.
+    """
+    totals = read_smaps_rollup(pid)
+    if totals is None:
+        return None
+    return {
+        "rss_mib": round(totals.get("Rss", 0) / 1024, 1),
+        "pss_mib": round(totals.get("Pss", 0) / 1024, 1),
+        "shared_mib": round((totals.get("Shared_Clean", 0) + totals.get("Shared_Dirty", 0)) / 1024, 1),
+        "private_mib": round((totals.get("Private_Clean", 0) + totals.get("Private_Dirty", 0)) / 1024, 1),
+    }
+
+
+def child_pids(pid: int) -> List[int]:
+    """
+    Direct children of a process, from /proc (Linux).
+    """
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children", "r") as f:
+            return [int(child) for child in f.read().split()]
+    except OSError:
+        return []
+
+
+def memory_report(master_pid: int, worker_pids: List[int]) -> Dict[str, Dict[str, float]]:
+    """
+    Memory of the master and each worker, keyed by role and pid.
+    """
+    report = {}
+    for role, pid in [("master", master_pid)] + [("worker", pid) for pid in worker_pids]:
+        memory = process_memory(pid)
+        if memory is not None:
+            report[f"{role}:{pid}"] = memory
+    return report
+
+
+def current_report() -> Dict[str, Dict[str, float]]:
+    """
+    Memory report as seen from a worker: the master and all workers when
+    started by this launcher, otherwise just this process.
+    """
+    master_pid = os.environ.get(MASTER_PID_ENV)
+    if master_pid is None:
+        return memory_report(os.getpid(), [])
+    master_pid = int(master_pid)
+    return memory_report(master_pid, child_pids(master_pid))
+
+
+def _log_report(master_pid: int, worker_pids: List[int]) -> None:
+    for name, memory in memory_report(master_pid, worker_pids).items():
+        logger.info(
+            "%s rss=%.1fMiB pss=%.1fMiB shared=%.1fMiB private=%.1fMiB",
+            name, memory["rss_mib"], memory["pss_mib"], memory["shared_mib"], memory["private_mib"],
+        )
+
+
+def _serve_worker(app, sock: socket.socket, log_level: str) -> None:
+    """
+    Run uvicorn on the inherited listening socket; never returns.
+    """
+    import uvicorn
+
+    # Restore default signal handling; uvicorn installs its own
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    exit_code = 0
+    try:
+        config = uvicorn.Config(app, log_level=log_level)
+        uvicorn.Server(config).run(sockets=[sock])
+    except BaseException:
+        logger.exception("Worker %s crashed", os.getpid())
+        exit_code = 1
+    finally:
+        os._exit(exit_code)
+
+
+def run(host: str, port: int, workers: int, log_level: str = "info",
+        report_interval: Optional[float] = None) -> int:
+    """
+    Warm up in this process, fork ``workers`` uvicorn workers on a shared
+    socket and supervise them until SIGINT or SIGTERM.
+    """
+    if not hasattr(os, "fork"):
+        raise RuntimeError("The pre-fork launcher needs os.fork (Linux or macOS)")
+    if report_interval is None:
+        report_interval = settings.PREFORK_MEMORY_REPORT_INTERVAL
+
+    from main import app
+    from app.ai.warmup import warmup
+    from app.db.session import async_engine, init_db
+
+    async def prepare():
+        # Create the schema once here rather than racing in every worker
+        await init_db()
+        await warmup()
+        # Workers must open their own connections
+        await async_engine.dispose()
+
+    # The event loop and its executor threads are gone once asyncio.run
+    # returns, so nothing thread-bound is carried into the workers
+    asyncio.run(prepare())
+
+    gc.collect()
+    gc.freeze()
+
+    sock = socket.create_server((host, port), backlog=2048)
+    sock.set_inheritable(True)
+    master_pid = os.getpid()
+    # Lets workers find the master and their siblings for memory reports
+    os.environ[MASTER_PID_ENV] = str(master_pid)
+    logger.info("Master %s listening on %s:%s, starting %s workers", master_pid, host, port, workers)
+
+    def spawn() -> int:
+        pid = os.fork()
+        if pid == 0:
+            _serve_worker(app, sock, log_level)
+        return pid
+
+    pids = {spawn() for _ in range(workers)}
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in pids:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    # Report once the workers have finished starting, then periodically
+    next_report = time.monotonic() + 5.0
+    while pids:
+        try:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            break
+        if pid:
+            pids.discard(pid)
+            if not stopping:
+                logger.warning("Worker %s exited with status %s; restarting", pid, status)
+                time.sleep(1.0)
+                pids.add(spawn())
+            continue
+
+        if report_interval >= 0 and time.monotonic() >= next_report:
+            _log_report(master_pid, sorted(pids))
+            next_report = time.monotonic() + report_interval if report_interval > 0 else float("inf")
+        time.sleep(0.2)
+
+    sock.close()
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Serve the app from pre-forked, pre-warmed workers")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=settings.PREFORK_WORKERS)
+    parser.add_argument("--log-level", default="info")
+    parser.add_argument("--report-interval", type=float, default=None,
+                        help="seconds between memory reports; 0 reports once, negative disables")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=args.log_level.upper(), format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    return run(args.host, args.port, args.workers, args.log_level, args.report_interval)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
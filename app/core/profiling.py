@@ -0,0 +1,206 @@
+"""
+On-demand sampling profiles and per-request span breakdowns for slow requests.
+"""
+from typing import Any, Dict, List, Optional, Tuple
+from collections import Counter, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from time import perf_counter, sleep
+import os
+import sys
+import threading
+
+from app.core.config import settings
+
+# Span names used across the app
+SPAN_AUTH = "auth"
+SPAN_DB = "db"
+SPAN_EXECUTOR_WAIT = "executor_wait"
+SPAN_COMPUTE = "model_compute"
+SPAN_SERIALIZATION = "serialization"
+
+
+class RequestTrace:
+    """
+    Accumulated time per span name for one request.
+    """
+    __slots__ = ("spans", "_lock")
+
+    def __init__(self):
+        self.spans: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def add(self, name: str, seconds: float) -> None:
+        # Executor threads record into the same trace as the event loop
+        with self._lock:
+            self.spans[name] = self.spans.get(name, 0.0) + seconds
+
+
+current_trace: ContextVar[Optional[RequestTrace]] = ContextVar("current_trace", default=None)
+
+
+def record_span(name: str, seconds: float, trace: Optional[RequestTrace] = None) -> None:
+    trace = trace or current_trace.get()
+    if trace is not None:
+        trace.add(name, seconds)
+
+
+@contextmanager
+def span(name: str):
+    """
+    Time a block of code as part of the current request's span breakdown.
+    """
+    trace = current_trace.get()
+    if trace is None:
+        yield
+        return
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        trace.add(name, perf_counter() - start)
+
+
+# Slowest recent requests, newest last
+slow_requests: deque = deque(maxlen=settings.SLOW_REQUEST_BUFFER_SIZE)
+
+
+class SlowRequestMiddleware:
+    """
+    Pure ASGI middleware that keeps a span breakdown of requests slower than
+    ``SLOW_REQUEST_THRESHOLD_MS`` in a bounded ring buffer.
+    """
+
+    def __init__(self, app, threshold_ms: Optional[float] = None):
+        self.app = app
+        threshold_ms = settings.SLOW_REQUEST_THRESHOLD_MS if threshold_ms is None else threshold_ms
+        self.threshold = threshold_ms / 1000
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        trace = RequestTrace()
+        token = current_trace.set(trace)
+        start = perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = perf_counter() - start
+            current_trace.reset(token)
+            if elapsed >= self.threshold:
+                self._capture(scope, status_code, elapsed, trace)
+
+    def _capture(self, scope, status_code: int, elapsed: float, trace: RequestTrace) -> None:
+        spans = {name: round(seconds * 1000, 3) for name, seconds in trace.spans.items()}
+        # Spans can nest (a query made during auth counts toward both auth
+        # and db), so the unaccounted time is a lower bound
+        accounted = sum(spans.values())
+        route = scope.get("route")
+        slow_requests.append({
+            "started_at": datetime.utcnow().isoformat(),
+            "method": scope["method"],
+            "path": scope["path"],
+            "route": getattr(route, "path", None),
+            "status": status_code,
+            "duration_ms": round(elapsed * 1000, 3),
+            "spans_ms": spans,
+            "other_ms": round(max(elapsed * 1000 - accounted, 0.0), 3),
+        })
+
+
+def _frame_name(code) -> str:
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def sample_stacks(seconds: float, interval: float) -> Tuple[Counter, Dict[str, Tuple[str, str, int]], int]:
+    """
+    Sample the wall-clock stacks of every thread but this one.
+
+    Returns stack counts (root first, prefixed with the thread name), frame
+    metadata keyed by frame name, and the number of sampling rounds.
+    """
+    own_id = threading.get_ident()
+    stacks: Counter = Counter()
+    frames: Dict[str, Tuple[str, str, int]] = {}
+    rounds = 0
+    deadline = perf_counter() + seconds
+
+    while perf_counter() < deadline:
+        names = {t.ident: t.name for t in threading.enumerate()}
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own_id:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                name = _frame_name(code)
+                if name not in frames:
+                    frames[name] = (code.co_name, code.co_filename, code.co_firstlineno)
+                stack.append(name)
+                frame = frame.f_back
+            stack.append(f"thread:{names.get(thread_id, thread_id)}")
+            stacks[tuple(reversed(stack))] += 1
+        rounds += 1
+        sleep(interval)
+
+    return stacks, frames, rounds
+
+
+def to_collapsed(stacks: Counter) -> str:
+    """
+    Collapsed stack format (one ``frame;frame;frame count`` line per stack),
+    as consumed by flamegraph.pl and speedscope.
+    """
+    return "\n".join(f"{';'.join(stack)} {count}" for stack, count in stacks.most_common()) + "\n"
+
+
+def to_speedscope(stacks: Counter, frames: Dict[str, Tuple[str, str, int]],
+                  interval: float) -> Dict[str, Any]:
+    """
+    Speedscope sampled profile with one sample per distinct stack, weighted by time.
+    """
+    frame_index: Dict[str, int] = {}
+    shared_frames: List[Dict[str, Any]] = []
+
+    def index_of(name: str) -> int:
+        if name not in frame_index:
+            frame_index[name] = len(shared_frames)
+            if name in frames:
+                func, filename, line = frames[name]
+                shared_frames.append({"name": func, "file": filename, "line": line})
+            else:
+                shared_frames.append({"name": name})
+        return frame_index[name]
+
+    samples, weights = [], []
+    for stack, count in stacks.items():
+        samples.append([index_of(name) for name in stack])
+        weights.append(count * interval)
+
+    return {
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "name": f"{settings.PROJECT_NAME} wall-clock profile",
+        "activeProfileIndex": 0,
+        "exporter": settings.PROJECT_NAME,
+        "shared": {"frames": shared_frames},
+        "profiles": [{
+            "type": "sampled",
+            "name": f"pid {os.getpid()}",
+            "unit": "seconds",
+            "startValue": 0,
+            "endValue": sum(weights),
+            "samples": samples,
+            "weights": weights,
+        }],
+    }
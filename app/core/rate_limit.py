@@ -0,0 +1,317 @@
+"""
+Token bucket rate limiting per user and route, with an in-process sharded
+backend and a Redis backend for limits shared across nodes.
+"""
+from typing import Any, Dict, List, Optional, Tuple
+from dataclasses import dataclass
+from time import monotonic
+import logging
+import math
+import threading
+import zlib
+
+from fastapi import Depends, HTTPException, Request, status
+
+from app.core.config import settings
+from app.core.metrics import counter
+from app.core.security import get_current_active_user
+from app.models.user import User
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMITED = counter("rate_limited_requests_total", "Requests rejected by a rate limiter", ("limiter",))
+RATE_LIMIT_BACKEND_ERRORS = counter(
+    "rate_limit_backend_errors_total", "Rate limit backend failures (requests allowed)", ("limiter",)
+)
+
+# Request state key holding the headers for the response
+STATE_KEY = "rate_limit_headers"
+
+
+@dataclass
+class RateLimitResult:
+    """
+    Outcome of charging a bucket.
+    """
+    allowed: bool
+    limit: int
+    remaining: float
+    # Seconds until the bucket is full again
+    reset: float
+    # Seconds until the rejected cost would fit
+    retry_after: float = 0.0
+
+
+class RateLimitBackend:
+    """
+    Storage for token buckets. ``acquire`` takes ``cost`` tokens if available;
+    ``adjust`` adds (refunds) or removes tokens unconditionally, allowing the
+    bucket to go into debt.
+    """
+
+    async def acquire(self, key: str, cost: float, capacity: float, rate: float) -> Tuple[bool, float]:
+        raise NotImplementedError
+
+    async def adjust(self, key: str, delta: float, capacity: float, rate: float) -> float:
+        raise NotImplementedError
+
+
+class MemoryBackend(RateLimitBackend):
+    """
+    In-process buckets split across independently locked shards, so threads
+    touching different keys do not contend and pruning stays local to a shard.
+    """
+
+    def __init__(self, shards: int = 16, max_keys_per_shard: int = 10000):
+        self._shards: List[Dict[str, List[float]]] = [{} for _ in range(shards)]
+        self._locks = [threading.Lock() for _ in range(shards)]
+        self.max_keys_per_shard = max_keys_per_shard
+
+    def _shard(self, key: str) -> int:
+        return zlib.crc32(key.encode()) % len(self._shards)
+
+    def _update(self, key: str, cost: float, capacity: float, rate: float, force: bool) -> Tuple[bool, float]:
+        index = self._shard(key)
+        buckets = self._shards[index]
+        now = monotonic()
+        with self._locks[index]:
+            # Popping and re-inserting keeps the shard ordered by last use
+            bucket = buckets.pop(key, None)
+            if bucket is None:
+                tokens = capacity
+            else:
+                tokens = min(capacity, bucket[0] + (now - bucket[1]) * rate)
+            allowed = force or tokens >= cost
+            if allowed:
+                tokens = min(capacity, tokens - cost)
+            buckets[key] = [tokens, now, capacity, rate]
+            if len(buckets) > self.max_keys_per_shard:
+                self._prune(buckets, now)
+        return allowed, tokens
+
+    def _prune(self, buckets: Dict[str, List[float]], now: float) -> None:
+        # Buckets that have refilled are indistinguishable from new ones
+        for key in [k for k, (tokens, updated, capacity, rate) in buckets.items()
+                    if tokens + (now - updated) * rate >= capacity]:
+            del buckets[key]
+        # Then the least recently used
+        while len(buckets) > self.max_keys_per_shard:
+            del buckets[next(iter(buckets))]
+
+    async def acquire(self, key: str, cost: float, capacity: float, rate: float) -> Tuple[bool, float]:
+        return self._update(key, cost, capacity, rate, force=False)
+
+    async def adjust(self, key: str, delta: float, capacity: float, rate: float) -> float:
+        return self._update(key, -delta, capacity, rate, force=True)[1]
+
+
+# Refill, then take ARGV[3] tokens (or apply them unconditionally when
+# ARGV[4] is 1). Uses the server clock so every node agrees on time; before
+# Redis 5 a script may only write after TIME with effects replication, which
+# later versions always use (and where the call is a no-op). HMSET rather
+# than multi-field HSET keeps Redis 3.2 working.
+_TOKEN_BUCKET_SCRIPT = """
+if redis.replicate_commands then
+    redis.replicate_commands()
+end
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local force = tonumber(ARGV[4])
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+if force == 1 or tokens >= cost then
+    tokens = math.min(capacity, tokens - cost)
+    allowed = 1
+end
+redis.call('HMSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / rate * 1000) + 1000)
+return {allowed, tostring(tokens)}
+"""
+
+
+class RedisBackend(RateLimitBackend):
+    """
+    Buckets in Redis, updated atomically by a Lua script. Takes a URL, or any
+    client exposing redis-py's async ``eval`` (such as ``benchmarks.fakes.FakeRedis``).
+    """
+
+    def __init__(self, url: Optional[str] = None, client: Any = None, prefix: str = "ratelimit:"):
+        if client is None:
+            import redis.asyncio as redis
+
+            client = redis.from_url(url)
+        self.client = client
+        self.prefix = prefix
+
+    async def _eval(self, key: str, cost: float, capacity: float, rate: float, force: bool) -> Tuple[bool, float]:
+        allowed, tokens = await self.client.eval(
+            _TOKEN_BUCKET_SCRIPT, 1, self.prefix + key, capacity, rate, cost, int(force)
+        )
+        return bool(int(allowed)), float(tokens)
+
+    async def acquire(self, key: str, cost: float, capacity: float, rate: float) -> Tuple[bool, float]:
+        return await self._eval(key, cost, capacity, rate, force=False)
+
+    async def adjust(self, key: str, delta: float, capacity: float, rate: float) -> float:
+        return (await self._eval(key, -delta, capacity, rate, force=True))[1]
+
+
+_backend: Optional[RateLimitBackend] = None
+
+
+def get_backend() -> RateLimitBackend:
+    """
+    Backend selected by ``RATE_LIMIT_BACKEND``, created on first use.
+    """
+    global _backend
+    if _backend is None:
+        if settings.RATE_LIMIT_BACKEND == "redis":
+            _backend = RedisBackend(settings.RATE_LIMIT_REDIS_URL)
+        else:
+            _backend = MemoryBackend(shards=settings.RATE_LIMIT_SHARDS)
+    return _backend
+
+
+def set_backend(backend: Optional[RateLimitBackend]) -> None:
+    """
+    Replace the shared backend (None goes back to the configured one).
+    """
+    global _backend
+    _backend = backend
+
+
+class RateLimiter:
+    """
+    Token bucket of ``limit`` units per ``period`` seconds for each user and
+    route. Units are requests by default; pass a cost to ``hit`` to limit by
+    something else, such as LLM tokens.
+
+    Use an instance as a dependency to charge one unit per request, or call
+    ``hit`` and ``adjust`` from the endpoint for cost-weighted limits.
+    """
+
+    def __init__(self, name: str, limit: int, period: float = 60.0,
+                 backend: Optional[RateLimitBackend] = None):
+        self.name = name
+        self.limit = limit
+        self.period = period
+        self.rate = limit / period
+        self._backend = backend
+
+    @property
+    def backend(self) -> RateLimitBackend:
+        return self._backend or get_backend()
+
+    def key(self, request: Request, user_id: Any, route: Optional[str] = None) -> str:
+        if route is None:
+            route = getattr(request.scope.get("route"), "path", request.url.path)
+        return f"{self.name}:{route}:{user_id}"
+
+    def _result(self, allowed: bool, tokens: float, cost: float) -> RateLimitResult:
+        return RateLimitResult(
+            allowed=allowed,
+            limit=self.limit,
+            remaining=max(tokens, 0.0),
+            reset=max(self.limit - tokens, 0.0) / self.rate,
+            retry_after=0.0 if allowed else (cost - tokens) / self.rate,
+        )
+
+    def _set_headers(self, request: Request, result: RateLimitResult) -> Dict[str, str]:
+        headers = {
+            "RateLimit-Limit": str(result.limit),
+            "RateLimit-Remaining": str(math.floor(result.remaining)),
+            "RateLimit-Reset": str(math.ceil(result.reset)),
+            "RateLimit-Policy": f"{self.limit};w={int(self.period)}",
+        }
+        request.scope.setdefault("state", {})[STATE_KEY] = headers
+        return headers
+
+    async def hit(self, request: Request, user_id: Any, cost: float = 1.0,
+                  route: Optional[str] = None) -> RateLimitResult:
+        """
+        Charge ``cost`` units, raising 429 when the bucket cannot cover it.
+        Costs above the limit are capped, so they go through once the bucket is full.
+        ``route`` charges another route's bucket, so that one limit can cover
+        several ways of reaching the same resource.
+        """
+        if not settings.RATE_LIMIT_ENABLED:
+            return RateLimitResult(True, self.limit, self.limit, 0.0)
+
+        cost = min(cost, self.limit)
+        try:
+            allowed, tokens = await self.backend.acquire(self.key(request, user_id, route), cost, self.limit, self.rate)
+        except Exception as e:
+            # Fail open: a limiter outage should not take the API down
+            RATE_LIMIT_BACKEND_ERRORS.labels(self.name).inc()
+            logger.warning("Rate limit backend error for %s: %s", self.name, e)
+            return RateLimitResult(True, self.limit, self.limit, 0.0)
+
+        result = self._result(allowed, tokens, cost)
+        headers = self._set_headers(request, result)
+        if not allowed:
+            RATE_LIMITED.labels(self.name).inc()
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Rate limit exceeded",
+                headers={**headers, "Retry-After": str(math.ceil(result.retry_after))},
+            )
+        return result
+
+    async def adjust(self, request: Request, user_id: Any, delta: float,
+                     route: Optional[str] = None) -> None:
+        """
+        Refund (positive) or charge (negative) units after the fact, e.g. once
+        the actual token usage of a completion is known.
+        """
+        if not settings.RATE_LIMIT_ENABLED or not delta:
+            return
+        try:
+            tokens = await self.backend.adjust(self.key(request, user_id, route), delta, self.limit, self.rate)
+        except Exception as e:
+            RATE_LIMIT_BACKEND_ERRORS.labels(self.name).inc()
+            logger.warning("Rate limit backend error for %s: %s", self.name, e)
+            return
+        self._set_headers(request, self._result(True, tokens, 0.0))
+
+    async def __call__(self, request: Request, current_user: User = Depends(get_current_active_user)) -> None:
+        await self.hit(request, current_user.id)
+
+
+class RateLimitHeadersMiddleware:
+    """
+    Pure ASGI middleware adding the ``RateLimit-*`` headers recorded during
+    the request, whatever response type the endpoint returned.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                headers = scope.get("state", {}).get(STATE_KEY)
+                if headers:
+                    existing = {name.lower() for name, _ in message.get("headers", [])}
+                    message["headers"] = list(message.get("headers", [])) + [
+                        (name.lower().encode("latin-1"), value.encode("latin-1"))
+                        for name, value in headers.items()
+                        if name.lower().encode("latin-1") not in existing
+                    ]
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+
+# Limiters for the AI endpoints
+chat_token_limiter = RateLimiter("chat_tokens", settings.RATE_LIMIT_CHAT_TOKENS_PER_MINUTE)
+inference_limiter = RateLimiter("inference", settings.RATE_LIMIT_INFERENCE_PER_MINUTE)
@@ -0,0 +1,49 @@
+from typing import Any
+from decimal import Decimal
+
+import orjson
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+from app.core.config import settings
+from app.core.profiling import SPAN_SERIALIZATION, span
+
+ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+
+def _default(obj: Any) -> Any:
+    """
+    Fallback for types orjson does not encode natively.
+    """
+    if isinstance(obj, BaseModel):
+        return obj.model_dump(mode="json")
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    if hasattr(obj, "tolist"):
+        # NumPy arrays that are not C-contiguous or of an unsupported dtype
+        return obj.tolist()
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    orjson-based JSON response with native NumPy array support.
+    Non-finite floats are encoded as null instead of failing the request.
+    """
+
+    def render(self, content: Any) -> bytes:
+        with span(SPAN_SERIALIZATION):
+            return orjson.dumps(content, default=_default, option=ORJSON_OPTIONS)
+
+
+def trusted_response(content: Any, status_code: int = 200) -> Any:
+    """
+    Return data built by our own code directly, skipping ``response_model``
+    validation and ``jsonable_encoder``, when ``RESPONSE_MODEL_BYPASS`` is on.
+    The route's ``response_model`` still documents the shape in OpenAPI.
+    """
+    if settings.RESPONSE_MODEL_BYPASS:
+        return FastJSONResponse(content, status_code=status_code)
+    return content
@@ -9,6 +9,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 
 from app.core.config import settings
+from app.core.profiling import SPAN_AUTH, span
 from app.db.session import get_db
 from app.models.user import User
 from app.schemas.token import TokenPayload
@@ -19,12 +20,9 @@ pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 # OAuth2 scheme for token authentication
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"{settings.API_PREFIX}/v1/auth/token")
 
-# Token verification
-async def get_current_user(
-    db: AsyncSession = Depends(get_db), token: str = Depends(oauth2_scheme)
-) -> User:
+async def authenticate_token(db: AsyncSession, token: str) -> User:
     """
-    Get the current user from the token.
+    Get the user a bearer token was issued to; raises 401 if it is invalid.
     """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -32,21 +30,22 @@ async def get_current_user(
         headers={"WWW-Authenticate": "Bearer"},
     )
     
-    try:
-        # Decode the JWT token
-        payload = jwt.decode(
-            token, settings.SECRET_KEY, algorithms=["HS256"]
-        )
-        username: str = payload.get("sub")
-        if username is None:
+    with span(SPAN_AUTH):
+        try:
+            # Decode the JWT token
+            payload = jwt.decode(
+                token, settings.SECRET_KEY, algorithms=["HS256"]
+            )
+            username: str = payload.get("sub")
+            if username is None:
+                raise credentials_exception
+            token_data = TokenPayload(sub=username)
+        except JWTError:
             raise credentials_exception
-        token_data = TokenPayload(sub=username)
-    except JWTError:
-        raise credentials_exception
-    
-    # Get the user from the database
-    result = await db.execute(select(User).filter(User.username == token_data.sub))
-    user = result.scalars().first()
+        
+        # Get the user from the database
+        result = await db.execute(select(User).filter(User.username == token_data.sub))
+        user = result.scalars().first()
     
     if user is None:
         raise credentials_exception
@@ -54,6 +53,16 @@ async def get_current_user(
     return user
 
 
+# Token verification
+async def get_current_user(
+    db: AsyncSession = Depends(get_db), token: str = Depends(oauth2_scheme)
+) -> User:
+    """
+    Get the current user from the token.
+    """
+    return await authenticate_token(db, token)
+
+
 async def get_current_active_user(
     current_user: User = Depends(get_current_user),
 ) -> User:
@@ -65,6 +74,20 @@ async def get_current_active_user(
     return current_user
 
 
+async def get_current_superuser(
+    current_user: User = Depends(get_current_active_user),
+) -> User:
+    """
+    Check if the current user is a superuser.
+    """
+    if not current_user.is_superuser:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough permissions"
+        )
+    return current_user
+
+
 def create_access_token(
     data: dict, expires_delta: Optional[timedelta] = None
 ) -> str:
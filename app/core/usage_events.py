@@ -0,0 +1,247 @@
+"""
+Write-behind pipeline for audit and usage events.
+
+Handlers call ``record_event``, which only enqueues; a background task
+started in the application lifespan writes the queue out in multi-row
+inserts whenever ``USAGE_EVENTS_BATCH_SIZE`` events are waiting or
+``USAGE_EVENTS_FLUSH_INTERVAL_SECONDS`` have passed, and drains it on
+shutdown. Events are best effort: when the queue is full they are dropped
+according to ``USAGE_EVENTS_OVERFLOW``, and a failed insert drops its batch.
+"""
+from datetime import datetime
+from time import perf_counter
+from typing import Any, Dict, List, Optional
+import asyncio
+import logging
+
+from sqlalchemy import insert
+
+from app.core.config import settings
+from app.core.metrics import counter, gauge, histogram
+from app.db.session import AsyncSessionLocal
+from app.models.usage_event import UsageEvent
+
+logger = logging.getLogger(__name__)
+
+EVENTS_RECORDED = counter("usage_events_recorded_total", "Usage events enqueued", ("event_type",))
+EVENTS_WRITTEN = counter("usage_events_written_total", "Usage events stored in the database")
+EVENTS_DROPPED = counter(
+    "usage_events_dropped_total", "Usage events lost (queue_full, closed or write_error)", ("reason",)
+)
+FLUSH_LATENCY = histogram("usage_events_flush_seconds", "Time to insert one batch of usage events")
+FLUSH_BATCH_SIZE = histogram(
+    "usage_events_flush_batch_size", "Usage events per insert", buckets=(1, 10, 50, 100, 250, 500, 1000, 5000)
+)
+
+# Event types
+LOGIN = "login"
+LOGIN_FAILED = "login_failed"
+CHAT_COMPLETION = "chat_completion"
+
+
+class EventPipeline:
+    """
+    Bounded in-memory queue of event rows with a batching writer task.
+
+    Overflow policies when the queue is full:
+    "drop_newest" discards the new event, "drop_oldest" discards the oldest
+    queued one, and "block" makes the caller wait up to
+    ``block_timeout`` seconds for room before discarding the new event.
+    """
+
+    def __init__(
+        self,
+        max_size: int,
+        batch_size: int,
+        flush_interval: float,
+        overflow: str = "drop_newest",
+        block_timeout: float = 0.05,
+    ):
+        if overflow not in ("drop_newest", "drop_oldest", "block"):
+            raise ValueError(f"Unknown overflow policy: {overflow}")
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.overflow = overflow
+        self.block_timeout = block_timeout
+        self._queue: Optional[asyncio.Queue] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+        # Batch taken off the queue and not yet committed
+        self._in_flight: Optional[List[Dict[str, Any]]] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def qsize(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def start(self) -> None:
+        """
+        Start the writer task on the running event loop.
+        """
+        if self.running:
+            return
+        self._queue = asyncio.Queue(self.max_size)
+        self._wake = asyncio.Event()
+        self._closing = False
+        self._in_flight = None
+        self._task = asyncio.create_task(self._run(), name="usage-event-writer")
+
+    async def stop(self, timeout: float) -> None:
+        """
+        Stop accepting events and write out what is queued, giving up after
+        ``timeout`` seconds. Events still queued, and the batch being inserted
+        when the writer is cancelled, count as dropped.
+        """
+        if not self.running:
+            return
+        self._closing = True
+        self._wake.set()
+        try:
+            await asyncio.wait_for(self._task, timeout)
+        except asyncio.TimeoutError:
+            lost = self._queue.qsize() + len(self._in_flight or ())
+            self._in_flight = None
+            EVENTS_DROPPED.labels("closed").inc(lost)
+            logger.warning("Dropped %d usage events not written before shutdown", lost)
+        self._task = None
+
+    async def record(self, row: Dict[str, Any]) -> bool:
+        """
+        Enqueue one event row; returns whether it was accepted.
+        Never waits unless the queue is full and the policy is "block".
+        """
+        if self._queue is None or self._closing:
+            EVENTS_DROPPED.labels("closed").inc()
+            return False
+        try:
+            self._queue.put_nowait(row)
+        except asyncio.QueueFull:
+            if not await self._overflow(row):
+                EVENTS_DROPPED.labels("queue_full").inc()
+                return False
+        if self._queue.qsize() >= self.batch_size:
+            self._wake.set()
+        return True
+
+    async def _overflow(self, row: Dict[str, Any]) -> bool:
+        if self.overflow == "drop_oldest":
+            self._queue.get_nowait()
+            EVENTS_DROPPED.labels("queue_full").inc()
+            self._queue.put_nowait(row)
+            return True
+        if self.overflow == "block":
+            # Let the writer catch up
+            self._wake.set()
+            try:
+                await asyncio.wait_for(self._queue.put(row), self.block_timeout)
+                return True
+            except asyncio.TimeoutError:
+                return False
+        return False
+
+    async def _run(self) -> None:
+        while True:
+            if not self._closing:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+            self._wake.clear()
+            await self._flush()
+            if self._closing and self._queue.empty():
+                return
+
+    async def _flush(self) -> None:
+        """
+        Write out everything queued, in batches of ``batch_size``.
+        """
+        while not self._queue.empty():
+            batch: List[Dict[str, Any]] = []
+            while len(batch) < self.batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            await self._write(batch)
+
+    async def _write(self, batch: List[Dict[str, Any]]) -> None:
+        start = perf_counter()
+        # Left set if shutdown cancels the insert, so ``stop`` counts the batch
+        self._in_flight = batch
+        try:
+            async with AsyncSessionLocal() as db:
+                # One executemany, sent as multi-row INSERTs
+                await db.execute(insert(UsageEvent), batch)
+                await db.commit()
+                self._in_flight = None
+        except asyncio.CancelledError:
+            if self._in_flight is None:
+                # Cancelled while closing the session, after the commit
+                EVENTS_WRITTEN.inc(len(batch))
+            raise
+        except Exception:
+            # A failure closing the session after the commit still stored the batch
+            if self._in_flight is not None:
+                self._in_flight = None
+                EVENTS_DROPPED.labels("write_error").inc(len(batch))
+                logger.exception("Failed to write %d usage events", len(batch))
+                return
+        EVENTS_WRITTEN.inc(len(batch))
+        FLUSH_BATCH_SIZE.observe(len(batch))
+        FLUSH_LATENCY.observe(perf_counter() - start)
+
+
+pipeline = EventPipeline(
+    max_size=settings.USAGE_EVENTS_QUEUE_SIZE,
+    batch_size=settings.USAGE_EVENTS_BATCH_SIZE,
+    flush_interval=settings.USAGE_EVENTS_FLUSH_INTERVAL_SECONDS,
+    overflow=settings.USAGE_EVENTS_OVERFLOW,
+    block_timeout=settings.USAGE_EVENTS_BLOCK_TIMEOUT_SECONDS,
+)
+
+gauge("usage_events_queued", "Usage events waiting to be written", function=pipeline.qsize)
+
+
+async def record_event(
+    event_type: str,
+    user_id: Optional[int] = None,
+    model: Optional[str] = None,
+    usage: Optional[Dict[str, int]] = None,
+) -> bool:
+    """
+    Record an audit or usage event without touching the database.
+    ``usage`` takes the prompt/completion/total token counts of an AI call.
+    """
+    if not settings.USAGE_EVENTS_ENABLED:
+        return False
+    now = datetime.utcnow()
+    usage = usage or {}
+    accepted = await pipeline.record({
+        "user_id": user_id,
+        "event_type": event_type,
+        "model": model,
+        "prompt_tokens": usage.get("prompt_tokens"),
+        "completion_tokens": usage.get("completion_tokens"),
+        "total_tokens": usage.get("total_tokens"),
+        "created_at": now,
+        "updated_at": now,
+    })
+    if accepted:
+        EVENTS_RECORDED.labels(event_type).inc()
+    return accepted
+
+
+def start_event_pipeline() -> None:
+    """
+    Start the writer; call from the application lifespan.
+    """
+    if settings.USAGE_EVENTS_ENABLED:
+        pipeline.start()
+
+
+async def stop_event_pipeline() -> None:
+    """
+    Drain queued events on shutdown.
+    """
+    await pipeline.stop(settings.USAGE_EVENTS_SHUTDOWN_TIMEOUT_SECONDS)
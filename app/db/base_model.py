@@ -1,10 +1,56 @@
+from collections import namedtuple
 from datetime import datetime
-from typing import Any, Dict
-from sqlalchemy import Column, DateTime, Integer
+from functools import lru_cache
+from operator import attrgetter
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+from sqlalchemy import Column, DateTime, Integer, inspect
 from sqlalchemy.ext.declarative import declared_attr
 from app.db.session import Base
 
 
+class ColumnPlan:
+    """
+    Precomputed column names, attributes and getter for a model class, or a
+    subset of its columns, built once per class instead of on every call.
+    """
+    __slots__ = ("names", "columns", "getter", "dto")
+
+    def __init__(self, model: type, names: Tuple[str, ...]):
+        self.names = names
+        # Attributes to pass to select() for column-only queries
+        self.columns = tuple(getattr(model, name) for name in names)
+        getter = attrgetter(*names)
+        # attrgetter returns a bare value for a single name
+        self.getter = getter if len(names) > 1 else (lambda obj: (getter(obj),))
+        self.dto = _make_dto(model, names)
+
+    def dict(self, obj: Any) -> Dict[str, Any]:
+        return dict(zip(self.names, self.getter(obj)))
+
+
+class RowDTO(tuple):
+    """
+    Base of the read-only projections returned by ``BaseModel.dto``:
+    immutable, slotted tuples with attribute access and ``dict()``.
+    """
+    __slots__ = ()
+
+    def dict(self) -> Dict[str, Any]:
+        return dict(zip(self._fields, self))
+
+
+def _make_dto(model: type, names: Tuple[str, ...]) -> type:
+    base = namedtuple(f"{model.__name__}Row", names)
+    return type(base.__name__, (base, RowDTO), {"__slots__": ()})
+
+
+@lru_cache(maxsize=None)
+def _column_plan(model: type, names: Optional[Tuple[str, ...]]) -> ColumnPlan:
+    if names is None:
+        names = tuple(attr.key for attr in inspect(model).column_attrs)
+    return ColumnPlan(model, names)
+
+
 class BaseModel(Base):
     """
     Base model for all database models.
@@ -14,7 +60,7 @@ class BaseModel(Base):
 
     # Primary key
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
-    
+
     # Timestamps
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
@@ -23,9 +69,59 @@ class BaseModel(Base):
     @declared_attr
     def __tablename__(cls) -> str:
         return cls.__name__.lower()
-    
+
+    @classmethod
+    def column_plan(cls, fields: Optional[Sequence[str]] = None) -> ColumnPlan:
+        """
+        Cached plan for all columns, or for ``fields`` in that order.
+        """
+        return _column_plan(cls, tuple(fields) if fields is not None else None)
+
+    @classmethod
+    def columns(cls, fields: Optional[Sequence[str]] = None) -> Tuple[Any, ...]:
+        """
+        Column attributes for a column-only select, e.g.
+        ``select(*User.columns(fields))``, whose rows ``to_dicts`` accepts.
+        """
+        return cls.column_plan(fields).columns
+
+    @classmethod
+    def to_dicts(cls, rows: Iterable[Any], fields: Optional[Sequence[str]] = None) -> List[Dict[str, Any]]:
+        """
+        Convert many rows to dictionaries with one cached plan.
+        Accepts model instances, one-entity rows such as those of
+        ``select(User)``, or ``Row`` tuples selected with ``columns(fields)``
+        (which skip ORM instance loading entirely).
+        """
+        plan = cls.column_plan(fields)
+        names = plan.names
+        rows = rows if isinstance(rows, list) else list(rows)
+        if not rows:
+            return []
+        first = rows[0]
+        if not isinstance(first, cls) and len(first) == 1 and isinstance(first[0], cls):
+            rows = [row[0] for row in rows]
+            first = rows[0]
+        if isinstance(first, cls):
+            getter = plan.getter
+            return [dict(zip(names, getter(row))) for row in rows]
+        if len(first) != len(names):
+            raise ValueError(
+                f"Rows have {len(first)} columns but {len(names)} fields were requested; "
+                f"select them with {cls.__name__}.columns(fields)"
+            )
+        return [dict(zip(names, row)) for row in rows]
+
+    @classmethod
+    def dto(cls, fields: Optional[Sequence[str]] = None) -> type:
+        """
+        Read-only, slotted tuple class for the columns in ``fields``.
+        Build instances from selected rows with ``dto(fields)._make(row)``.
+        """
+        return cls.column_plan(fields).dto
+
     def dict(self) -> Dict[str, Any]:
         """
         Convert model instance to dictionary.
         """
-        return {c.name: getattr(self, c.name) for c in self.__table__.columns} 
\ No newline at end of file
+        return self.column_plan().dict(self)
@@ -0,0 +1,190 @@
+"""
+Migration-aware startup: compare the database's Alembic revision with the
+code's and migrate only when they differ, in one process at a time.
+"""
+from contextlib import asynccontextmanager, contextmanager
+from pathlib import Path
+from typing import AsyncIterator, Iterator, Optional
+import logging
+import os
+import zlib
+
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.db.session import Base, async_engine
+
+logger = logging.getLogger(__name__)
+
+ALEMBIC_INI = Path(__file__).resolve().parents[2] / "alembic.ini"
+
+# Revision matching the schema create_all built before migrations existed
+BASELINE_REVISION = "0001"
+
+# Advisory lock id shared by all processes migrating this database
+LOCK_KEY = zlib.crc32(b"app-schema-migrations")
+LOCK_NAME = "app_schema_migrations"
+
+
+def _alembic_config(connection=None):
+    from alembic.config import Config
+
+    config = Config(str(ALEMBIC_INI))
+    config.set_main_option("script_location", str(ALEMBIC_INI.parent / "migrations"))
+    # Keep the app's logging setup
+    config.attributes["configure_logger"] = False
+    if connection is not None:
+        config.attributes["connection"] = connection
+    return config
+
+
+def head_revision() -> str:
+    """
+    Newest revision in the migration scripts.
+    """
+    from alembic.script import ScriptDirectory
+
+    return ScriptDirectory.from_config(_alembic_config()).get_current_head()
+
+
+async def current_revision() -> Optional[str]:
+    """
+    Revision recorded in the database, or None if it has never been migrated.
+    One single-row query; no schema reflection.
+    """
+    async with async_engine.connect() as conn:
+        try:
+            result = await conn.execute(text("SELECT version_num FROM alembic_version"))
+        except DBAPIError:
+            return None
+        return result.scalar()
+
+
+def _adopted_revision(connection) -> str:
+    """
+    Revision of a schema created by create_all: the head when it already has
+    every table and column of the models, the baseline otherwise.
+    """
+    import app.models  # noqa: F401  (registers the models on Base.metadata)
+
+    inspector = inspect(connection)
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            return BASELINE_REVISION
+        columns = {column["name"] for column in inspector.get_columns(table.name)}
+        if not {column.name for column in table.columns} <= columns:
+            return BASELINE_REVISION
+    return head_revision()
+
+
+def _upgrade(connection) -> None:
+    from alembic import command
+
+    config = _alembic_config(connection)
+    if not inspect(connection).has_table("alembic_version") and inspect(connection).has_table("user"):
+        # Created by create_all without migrations: adopt it
+        revision = _adopted_revision(connection)
+        logger.info("Stamping existing schema as revision %s", revision)
+        command.stamp(config, revision)
+    command.upgrade(config, "head")
+
+
+@contextmanager
+def _file_lock(path: Path) -> Iterator[bool]:
+    """
+    Non-blocking exclusive lock on a file, for databases without advisory
+    locks (SQLite). Always acquired where ``fcntl`` is unavailable.
+    """
+    try:
+        import fcntl
+    except ImportError:
+        yield True
+        return
+
+    with open(path, "a") as f:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+@asynccontextmanager
+async def _migration_lock(conn: AsyncConnection) -> AsyncIterator[bool]:
+    """
+    Try to take the migration lock without waiting; yields whether it was taken.
+
+    PostgreSQL and MySQL use a session-level advisory lock on ``conn``;
+    SQLite falls back to a lock file next to the database file.
+    """
+    dialect = conn.dialect.name
+    if dialect == "postgresql":
+        acquired = (await conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": LOCK_KEY})).scalar()
+        await conn.commit()
+        try:
+            yield bool(acquired)
+        finally:
+            if acquired:
+                await conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": LOCK_KEY})
+                await conn.commit()
+    elif dialect == "mysql":
+        acquired = (await conn.execute(text("SELECT GET_LOCK(:name, 0)"), {"name": LOCK_NAME})).scalar()
+        try:
+            yield acquired == 1
+        finally:
+            if acquired == 1:
+                await conn.execute(text("SELECT RELEASE_LOCK(:name)"), {"name": LOCK_NAME})
+    else:
+        database = conn.engine.url.database
+        if not database or database == ":memory:":
+            # Private to this process
+            yield True
+            return
+        with _file_lock(Path(f"{os.path.abspath(database)}.migrate.lock")) as acquired:
+            yield acquired
+
+
+async def upgrade_database() -> bool:
+    """
+    Bring the schema to the head revision if it is behind.
+
+    The check is a single query, so up-to-date databases cost every worker
+    one round trip. Otherwise the process that gets the migration lock
+    migrates; the others do not wait for it and start serving straight away.
+    Returns whether this process ran migrations.
+    """
+    head = head_revision()
+    if await current_revision() == head:
+        return False
+
+    async with async_engine.connect() as conn:
+        async with _migration_lock(conn) as acquired:
+            if not acquired:
+                logger.info("Another process is migrating the database; not waiting")
+                return False
+            # Another process may have finished while we took the lock
+            if await current_revision() == head:
+                return False
+            logger.info("Migrating database to revision %s", head)
+            await conn.run_sync(_upgrade)
+            await conn.commit()
+    return True
+
+
+async def check_database() -> bool:
+    """
+    Whether the database is at the head revision; logs a warning if not.
+    """
+    current, head = await current_revision(), head_revision()
+    if current != head:
+        logger.warning(
+            "Database schema is at revision %s but the code expects %s; run `alembic upgrade head`",
+            current, head,
+        )
+        return False
+    return True
@@ -1,6 +1,9 @@
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker, declarative_base
 from app.core.config import settings
+from app.core.deadlines import apply_statement_timeouts
+from app.core.metrics import DB_SESSION_DURATION, DB_SESSIONS_IN_FLIGHT, instrument_engine
+from time import perf_counter
 import re
 
 # Convert SQLAlchemy URL to async version if needed
@@ -28,6 +31,12 @@ async_engine = create_async_engine(
     future=True,
 )
 
+# Record statement timings
+instrument_engine(async_engine)
+
+# Bound statements by the request deadline
+apply_statement_timeouts(async_engine)
+
 AsyncSessionLocal = sessionmaker(
     autocommit=False,
     autoflush=False,
@@ -44,17 +53,28 @@ async def get_db():
     Dependency for getting async database session.
     """
     db = AsyncSessionLocal()
+    DB_SESSIONS_IN_FLIGHT.inc()
+    start = perf_counter()
     try:
         yield db
     finally:
         await db.close()
+        DB_SESSIONS_IN_FLIGHT.dec()
+        DB_SESSION_DURATION.observe(perf_counter() - start)
 
 
 async def init_db():
     """
     Initialize database connection.
     """
-    async with async_engine.begin() as conn:
-        # Apply any pending migrations or create tables
-        # await conn.run_sync(Base.metadata.drop_all)
-        await conn.run_sync(Base.metadata.create_all) 
\ No newline at end of file
+    if settings.DB_STARTUP_MODE == "create_all":
+        async with async_engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        return
+
+    from app.db.migrations import check_database, upgrade_database
+
+    if settings.DB_STARTUP_MODE == "check":
+        await check_database()
+    else:
+        await upgrade_database() 
\ No newline at end of file
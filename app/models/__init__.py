@@ -3,6 +3,7 @@ Database models package
 """
 
 from app.models.user import User
+from app.models.usage_event import UsageEvent
 
 # Export models
-__all__ = ["User"] 
\ No newline at end of file
+__all__ = ["User", "UsageEvent"] 
\ No newline at end of file
@@ -0,0 +1,21 @@
+from sqlalchemy import Column, Index, Integer, String
+from app.db.base_model import BaseModel
+
+
+class UsageEvent(BaseModel):
+    """
+    Audit and usage record: a login or an AI call by a user.
+    Written in batches by the event pipeline; ``created_at`` is when the
+    event happened, not when it was stored.
+    """
+    # No foreign key: records outlive their users
+    user_id = Column(Integer, nullable=True)
+    event_type = Column(String(32), index=True, nullable=False)
+    model = Column(String(100), nullable=True)
+    prompt_tokens = Column(Integer, nullable=True)
+    completion_tokens = Column(Integer, nullable=True)
+    total_tokens = Column(Integer, nullable=True)
+
+    __table_args__ = (
+        Index("ix_usageevent_user_id_created_at", "user_id", "created_at"),
+    )
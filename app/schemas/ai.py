@@ -1,5 +1,8 @@
-from typing import List, Dict, Any, Optional
-from pydantic import BaseModel, Field
+from typing import List, Dict, Any, Literal, Optional, Union
+from pydantic import BaseModel, ConfigDict, Field
+
+# Statistical model names; they name directories, so no leading dot
+MODEL_NAME_PATTERN = r"^[A-Za-z0-9_-][A-Za-z0-9_.-]{0,127}$"
 
 
 class Message(BaseModel):
@@ -20,6 +23,18 @@ class ChatCompletionRequest(BaseModel):
     max_tokens: Optional[int] = Field(default=None, gt=0, le=4096)
 
 
+class TextGenerationRequest(BaseModel):
+    """
+    Schema for local text generation with a Hugging Face model
+    """
+    model_config = ConfigDict(protected_namespaces=())
+
+    prompt: str = Field(min_length=1)
+    model_name: str = Field(default="gpt2")
+    max_length: int = Field(default=50, gt=0, le=2048)
+    temperature: float = Field(default=0.7, gt=0.0, le=2.0)
+
+
 class ChatCompletionResponse(BaseModel):
     """
     Schema for chat completion response
@@ -38,4 +53,213 @@ class ModelInfoResponse(BaseModel):
     """
     id: str
     owned_by: str
-    created: int 
\ No newline at end of file
+    created: int 
+
+class LinearRegressionTrainRequest(BaseModel):
+    """
+    Schema for training a linear regression model
+    """
+    model_config = ConfigDict(protected_namespaces=())
+
+    X_train: List[List[float]]
+    y_train: List[float]
+    model_name: str = Field(default="linear_regression", pattern=MODEL_NAME_PATTERN)
+
+
+class LinearRegressionTrainResponse(BaseModel):
+    """
+    Schema for a trained linear regression model
+    """
+    model_config = ConfigDict(protected_namespaces=())
+
+    model_name: str
+    score: float
+    coefficients: List[float]
+    intercept: float
+    version: int
+    model_path: str
+
+
+class PredictionRequest(BaseModel):
+    """
+    Schema for predictions with a trained model
+    """
+    model_config = ConfigDict(protected_namespaces=())
+
+    X_test: List[List[float]]
+    model_name: str = Field(default="linear_regression", pattern=MODEL_NAME_PATTERN)
+
+
+class PredictionResponse(BaseModel):
+    """
+    Schema for model predictions
+    """
+    model_config = ConfigDict(protected_namespaces=())
+
+    model_name: str
+    predictions: List[float]
+
+
+class ModelVersionsResponse(BaseModel):
+    """
+    Schema for the versions of a stored model
+    """
+    name: str
+    current: int
+    loaded: Optional[int] = None
+    versions: List[Dict[str, Any]]
+
+
+class TimeSeriesAnalysisRequest(BaseModel):
+    """
+    Schema for a one-off time series analysis.
+    Dates are ISO strings, or integer timestamps when ``epoch_unit`` is set.
+    """
+    dates: Union[List[int], List[str]]
+    values: List[float]
+    freq: str = Field(default="D")
+    periods_to_forecast: int = Field(default=10, gt=0, le=10000)
+    epoch_unit: Optional[Literal["s", "ms", "us", "ns"]] = None
+
+
+class TimeSeriesBatchItem(BaseModel):
+    """
+    Schema for one series in a batch analysis
+    """
+    name: str
+    dates: Union[List[int], List[str]]
+    values: List[float]
+
+
+class TimeSeriesBatchRequest(BaseModel):
+    """
+    Schema for analyzing many time series at once.
+    Frequency, horizon and date format apply to every series.
+    """
+    series: List[TimeSeriesBatchItem] = Field(min_length=1)
+    freq: str = Field(default="D")
+    periods_to_forecast: int = Field(default=10, gt=0, le=10000)
+    epoch_unit: Optional[Literal["s", "ms", "us", "ns"]] = None
+
+
+class TimeSeriesAppendRequest(BaseModel):
+    """
+    Schema for appending points to a named time series
+    """
+    dates: List[str]
+    values: List[float]
+    freq: str = Field(default="D")
+
+
+class TimeSeriesAppendResponse(BaseModel):
+    """
+    Schema for the result of a time series append
+    """
+    name: str
+    freq: str
+    ingested: int
+    points: int
+
+
+class TimeSeriesAnalysisResponse(BaseModel):
+    """
+    Schema for time series statistics and forecast
+    """
+    name: Optional[str] = None
+    freq: Optional[str] = None
+    statistics: Dict[str, float]
+    forecast: List[float]
+    forecast_dates: List[str]
+    trend: Optional[Dict[str, float]] = None
+    points: Optional[int] = None
+
+
+class TimeSeriesBatchResponse(BaseModel):
+    """
+    Schema for batch time series results, in request order
+    """
+    results: List[TimeSeriesAnalysisResponse]
+
+
+class EmbeddingRequest(BaseModel):
+    """
+    Schema for embedding texts
+    """
+    texts: List[str] = Field(min_length=1, max_length=1024)
+    model: Optional[str] = None
+
+
+class EmbeddingResponse(BaseModel):
+    """
+    Schema for unit-length text embeddings
+    """
+    model: str
+    dimensions: int
+    embeddings: List[List[float]]
+
+
+class IndexDocument(BaseModel):
+    """
+    Schema for a document to index
+    """
+    id: str = Field(min_length=1, max_length=256, pattern=r"^[^\n]+$")
+    text: str
+
+
+class IndexDocumentsRequest(BaseModel):
+    """
+    Schema for adding documents to a vector index.
+    The model is fixed when the index is created.
+    """
+    documents: List[IndexDocument] = Field(min_length=1, max_length=1024)
+    model: Optional[str] = None
+
+
+class IndexDocumentsResponse(BaseModel):
+    """
+    Schema for the result of adding documents
+    """
+    name: str
+    added: int
+    replaced: int
+    count: int
+
+
+class IndexDeleteRequest(BaseModel):
+    """
+    Schema for deleting documents from a vector index
+    """
+    ids: List[str] = Field(min_length=1)
+
+
+class IndexDeleteResponse(BaseModel):
+    """
+    Schema for the result of deleting documents
+    """
+    name: str
+    deleted: int
+    count: int
+
+
+class IndexSearchRequest(BaseModel):
+    """
+    Schema for a similarity search
+    """
+    query: str
+    k: int = Field(default=10, gt=0, le=1000)
+
+
+class IndexSearchResult(BaseModel):
+    """
+    Schema for one search hit; score is the cosine similarity
+    """
+    id: str
+    score: float
+
+
+class IndexSearchResponse(BaseModel):
+    """
+    Schema for similarity search results, best first
+    """
+    name: str
+    results: List[IndexSearchResult]
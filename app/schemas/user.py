@@ -1,5 +1,9 @@
-from typing import Optional
-from pydantic import BaseModel, EmailStr, Field
+from typing import Any, Dict, List, Optional
+
+from pydantic import BaseModel, EmailStr, Field, model_validator
+
+# Modular crypt format of a bcrypt hash
+BCRYPT_HASH_PATTERN = r"^\$2[aby]\$\d{2}\$[./A-Za-z0-9]{53}$"
 
 
 class UserBase(BaseModel):
@@ -40,4 +44,36 @@ class UserResponse(UserBase):
     is_superuser: bool
 
     class Config:
-        from_attributes = True 
\ No newline at end of file
+        from_attributes = True 
+
+
+# Fields of UserResponse, for building responses without validation
+USER_RESPONSE_FIELDS = tuple(UserResponse.model_fields)
+
+
+class UserImportRecord(UserBase):
+    """
+    Schema for one line of a bulk user import.
+    Either a plain password or an existing bcrypt hash is required.
+    """
+    password: Optional[str] = Field(None, min_length=8)
+    hashed_password: Optional[str] = Field(None, pattern=BCRYPT_HASH_PATTERN)
+    is_superuser: Optional[bool] = False
+
+    @model_validator(mode="after")
+    def check_password(self) -> "UserImportRecord":
+        if (self.password is None) == (self.hashed_password is None):
+            raise ValueError("Exactly one of password or hashed_password is required")
+        return self
+
+
+class UserImportResponse(BaseModel):
+    """
+    Schema for bulk user import results
+    """
+    received: int
+    created: int
+    skipped_existing: int
+    skipped_duplicate: int
+    invalid: int
+    errors: List[Dict[str, Any]]
@@ -0,0 +1,266 @@
+"""
+Bulk user import and export as NDJSON.
+"""
+from typing import Any, AsyncIterator, Dict, List, Optional, Set
+from concurrent.futures import ProcessPoolExecutor
+import asyncio
+import multiprocessing
+import os
+import sys
+
+import orjson
+from pydantic import ValidationError
+from sqlalchemy import insert, or_, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.db.session import AsyncSessionLocal
+from app.models.user import User
+from app.schemas.user import USER_RESPONSE_FIELDS, UserImportRecord
+
+# Per-line errors returned in an import report
+MAX_REPORTED_ERRORS = 100
+
+EXPORT_FIELDS = USER_RESPONSE_FIELDS + ("created_at", "updated_at")
+
+
+def _hash_passwords(passwords: List[str]) -> List[str]:
+    """
+    Hash a batch of passwords; runs in a hashing process.
+    """
+    from passlib.context import CryptContext
+
+    context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    return [context.hash(password) for password in passwords]
+
+
+_hash_executor: Optional[ProcessPoolExecutor] = None
+_hash_workers = 0
+
+
+def _get_hash_executor() -> ProcessPoolExecutor:
+    """
+    Process pool for bcrypt, so a large import neither holds the GIL nor
+    occupies the shared thread pool. Workers start from a forkserver rather
+    than forking the running server.
+    """
+    global _hash_executor, _hash_workers
+    if _hash_executor is None:
+        if sys.platform == "win32":
+            ctx = multiprocessing.get_context("spawn")
+        else:
+            ctx = multiprocessing.get_context("forkserver")
+            ctx.set_forkserver_preload(["passlib.context"])
+        _hash_workers = settings.PASSWORD_HASH_WORKERS or os.cpu_count() or 1
+        _hash_executor = ProcessPoolExecutor(max_workers=_hash_workers, mp_context=ctx)
+    return _hash_executor
+
+
+async def hash_passwords(passwords: List[str]) -> List[str]:
+    """
+    Hash passwords in parallel across the hashing processes, preserving order.
+    """
+    if not passwords:
+        return []
+    executor = _get_hash_executor()
+    size = -(-len(passwords) // _hash_workers)
+    loop = asyncio.get_running_loop()
+    batches = await asyncio.gather(*[
+        loop.run_in_executor(executor, _hash_passwords, passwords[i:i + size])
+        for i in range(0, len(passwords), size)
+    ])
+    return [hashed for batch in batches for hashed in batch]
+
+
+class ImportReport:
+    """
+    Running totals for one import.
+    """
+
+    def __init__(self):
+        self.received = 0
+        self.created = 0
+        self.skipped_existing = 0
+        self.skipped_duplicate = 0
+        self.invalid = 0
+        self.errors: List[Dict[str, Any]] = []
+        # Emails and usernames already seen in this import
+        self.emails: Set[str] = set()
+        self.usernames: Set[str] = set()
+
+    def error(self, line: int, message: str) -> None:
+        self.invalid += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line, "error": message})
+
+    def dict(self) -> Dict[str, Any]:
+        return {
+            "received": self.received,
+            "created": self.created,
+            "skipped_existing": self.skipped_existing,
+            "skipped_duplicate": self.skipped_duplicate,
+            "invalid": self.invalid,
+            "errors": self.errors,
+        }
+
+
+def _format_error(error: Dict[str, Any]) -> str:
+    location = ".".join(str(part) for part in error["loc"])
+    return f"{location}: {error['msg']}" if location else error["msg"]
+
+
+async def _existing(db: AsyncSession, records: List[UserImportRecord]) -> Set[str]:
+    """
+    Emails and usernames from ``records`` that are already taken, in one query.
+    """
+    emails = [record.email for record in records]
+    usernames = [record.username for record in records]
+    result = await db.execute(
+        select(User.email, User.username).where(
+            or_(User.email.in_(emails), User.username.in_(usernames))
+        )
+    )
+    taken: Set[str] = set()
+    for email, username in result:
+        taken.add(f"email:{email}")
+        taken.add(f"username:{username}")
+    return taken
+
+
+async def _import_chunk(db: AsyncSession, records: List[UserImportRecord], report: ImportReport) -> None:
+    taken = await _existing(db, records)
+    new_records = [
+        record for record in records
+        if f"email:{record.email}" not in taken and f"username:{record.username}" not in taken
+    ]
+    report.skipped_existing += len(records) - len(new_records)
+    if not new_records:
+        return
+
+    plain = [record.password for record in new_records if record.hashed_password is None]
+    hashed = iter(await hash_passwords(plain))
+    rows = [
+        {
+            "email": record.email,
+            "username": record.username,
+            "full_name": record.full_name,
+            "is_active": record.is_active,
+            "is_superuser": record.is_superuser,
+            "hashed_password": record.hashed_password or next(hashed),
+        }
+        for record in new_records
+    ]
+
+    try:
+        # executemany: one statement, many parameter sets
+        await db.execute(insert(User), rows)
+        await db.commit()
+    except IntegrityError:
+        # Rows inserted concurrently since the existence check; retry once
+        # against a fresh view of what is taken
+        await db.rollback()
+        taken = await _existing(db, new_records)
+        rows = [
+            row for row in rows
+            if f"email:{row['email']}" not in taken and f"username:{row['username']}" not in taken
+        ]
+        report.skipped_existing += len(new_records) - len(rows)
+        if rows:
+            await db.execute(insert(User), rows)
+            await db.commit()
+    report.created += len(rows)
+
+
+async def import_users(db: AsyncSession, lines: AsyncIterator[Optional[bytes]],
+                       chunk_size: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Import users from NDJSON lines. Each chunk is de-duplicated against the
+    database with one query, inserted with executemany and committed on its
+    own, so a failure part-way keeps the chunks already committed. A None
+    line stands for one that was too long and is reported as invalid.
+    """
+    chunk_size = chunk_size or settings.USER_IMPORT_CHUNK_SIZE
+    report = ImportReport()
+    chunk: List[UserImportRecord] = []
+
+    line_number = 0
+    async for line in lines:
+        line_number += 1
+        if line is None:
+            report.received += 1
+            report.error(line_number, "Line too long")
+            continue
+        line = line.strip()
+        if not line:
+            continue
+        report.received += 1
+        try:
+            record = UserImportRecord.model_validate_json(line)
+        except ValidationError as e:
+            report.error(line_number, "; ".join(_format_error(error) for error in e.errors()))
+            continue
+
+        if record.email in report.emails or record.username in report.usernames:
+            report.skipped_duplicate += 1
+            continue
+        report.emails.add(record.email)
+        report.usernames.add(record.username)
+
+        chunk.append(record)
+        if len(chunk) >= chunk_size:
+            await _import_chunk(db, chunk, report)
+            chunk = []
+
+    if chunk:
+        await _import_chunk(db, chunk, report)
+    return report.dict()
+
+
+async def iter_lines(chunks: AsyncIterator[bytes],
+                     max_line_bytes: Optional[int] = None) -> AsyncIterator[Optional[bytes]]:
+    """
+    Split a byte stream into lines without buffering the whole body.
+
+    A line longer than ``max_line_bytes`` is yielded as None; its bytes are
+    dropped as they arrive instead of being buffered.
+    """
+    max_line_bytes = max_line_bytes or settings.USER_IMPORT_MAX_LINE_BYTES
+    buffer = b""
+    # Inside a line already known to be too long
+    skipping = False
+    async for chunk in chunks:
+        *lines, rest = (buffer + chunk).split(b"\n")
+        for line in lines:
+            if skipping or len(line) > max_line_bytes:
+                skipping = False
+                yield None
+            else:
+                yield line
+        if skipping or len(rest) > max_line_bytes:
+            skipping = True
+            buffer = b""
+        else:
+            buffer = rest
+    if skipping:
+        yield None
+    elif buffer:
+        yield buffer
+
+
+async def export_users(include_password_hashes: bool = False) -> AsyncIterator[bytes]:
+    """
+    Stream all users as NDJSON through a server-side cursor.
+
+    Uses its own session, since the stream outlives the request handler.
+    """
+    fields = EXPORT_FIELDS + (("hashed_password",) if include_password_hashes else ())
+    statement = (
+        select(*User.columns(fields))
+        .order_by(User.id)
+        .execution_options(yield_per=settings.USER_EXPORT_BATCH_SIZE)
+    )
+    async with AsyncSessionLocal() as db:
+        result = await db.stream(statement)
+        async for partition in result.partitions():
+            yield b"".join(orjson.dumps(row) + b"\n" for row in User.to_dicts(partition, fields))
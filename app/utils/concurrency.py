@@ -0,0 +1,72 @@
+from typing import Any, Callable, TypeVar
+from time import perf_counter
+import asyncio
+import threading
+
+from app.core.metrics import (
+    EXECUTOR_QUEUE_DEPTH,
+    EXECUTOR_QUEUE_WAIT,
+    EXECUTOR_RUN_TIME,
+    EXECUTOR_RUNNING,
+)
+from app.core.deadlines import current_deadline, executor_load
+from app.core.profiling import SPAN_COMPUTE, SPAN_EXECUTOR_WAIT, current_trace
+
+T = TypeVar("T")
+
+
+async def run_in_threadpool(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """
+    Run a blocking function in the default executor, recording how long it
+    queued and ran and how many tasks are waiting.
+
+    Within a request deadline, work that would queue past the deadline is
+    shed up front with ``LoadShed`` (sheddable requests only), and work still
+    queued when the deadline passes is skipped with ``TimeoutError``; neither
+    happens once the response has started. A function already running in a
+    thread cannot be interrupted.
+    """
+    loop = asyncio.get_running_loop()
+    trace = current_trace.get()
+    deadline = current_deadline.get()
+    if (deadline is not None and deadline.can_shed()
+            and executor_load.estimated_wait() > deadline.remaining()):
+        deadline.shed("executor_queue")
+    submitted = perf_counter()
+    state_lock = threading.Lock()
+    queued = [True]
+
+    def _leave_queue() -> bool:
+        with state_lock:
+            if not queued[0]:
+                return False
+            queued[0] = False
+        EXECUTOR_QUEUE_DEPTH.dec()
+        executor_load.dequeue()
+        return True
+
+    def _run():
+        start = perf_counter()
+        _leave_queue()
+        EXECUTOR_QUEUE_WAIT.observe(start - submitted)
+        if deadline is not None and not deadline.response_started and deadline.remaining() <= 0:
+            raise TimeoutError("Request deadline passed before the task started")
+        EXECUTOR_RUNNING.inc()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            EXECUTOR_RUNNING.dec()
+            elapsed = perf_counter() - start
+            EXECUTOR_RUN_TIME.observe(elapsed)
+            executor_load.observe_run(elapsed)
+            if trace is not None:
+                trace.add(SPAN_EXECUTOR_WAIT, start - submitted)
+                trace.add(SPAN_COMPUTE, elapsed)
+
+    EXECUTOR_QUEUE_DEPTH.inc()
+    executor_load.enqueue()
+    try:
+        return await loop.run_in_executor(None, _run)
+    finally:
+        # Cancelled before a worker picked it up
+        _leave_queue()
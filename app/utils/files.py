@@ -0,0 +1,49 @@
+"""
+Helpers for state files shared by several worker processes.
+"""
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, Optional, Tuple
+import os
+
+# Identity of one version of a file: (inode, size, mtime_ns). Files replaced
+# by renaming a new file into place get a new inode on every write, so this
+# tells writes apart even where mtime resolution is coarse.
+FileStamp = Tuple[int, int, int]
+
+
+def stat_stamp(st: os.stat_result) -> FileStamp:
+    return st.st_ino, st.st_size, st.st_mtime_ns
+
+
+def file_stamp(path: Path) -> Optional[FileStamp]:
+    """
+    Stamp of the file at ``path``, or None if there is none.
+    """
+    try:
+        return stat_stamp(os.stat(path))
+    except FileNotFoundError:
+        return None
+
+
+@contextmanager
+def file_lock(path: Path, shared: bool = False) -> Iterator[None]:
+    """
+    Exclusive (or, with ``shared``, shared) lock on a file, held across
+    processes and waited for; a no-op where ``fcntl`` is unavailable. The
+    lock file is created if needed and never removed, since a process may be
+    waiting on it. A process must not take the same lock again while holding it.
+    """
+    try:
+        import fcntl
+    except ImportError:
+        yield
+        return
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a") as f:
+        fcntl.flock(f, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
@@ -0,0 +1,121 @@
+"""
+Check that streamed local generation does not slow other thread pool work.
+
+Runs slow-reading generation streams (paused by backpressure most of the
+time) alongside short thread pool tasks, and reports the tasks' latency and
+the executor run time estimate used for load shedding. Also streams once
+through POST /ai/text-generation/stream. Runs in-process against a fake
+text-generation pipeline. Usage:
+
+    python -m benchmarks.bench_generation_stream [--streams 8] [--tokens 200]
+"""
+from pathlib import Path
+from time import perf_counter
+import argparse
+import asyncio
+import statistics
+import tempfile
+import time
+
+from benchmarks import environment
+
+PROMPT = "Once upon a time"
+
+
+async def _slow_reader(stream, read_interval: float) -> int:
+    pieces = 0
+    async for _ in stream:
+        pieces += 1
+        await asyncio.sleep(read_interval)
+    return pieces
+
+
+async def _probe(rounds: int) -> list:
+    from app.utils.concurrency import run_in_threadpool
+
+    latencies = []
+    for _ in range(rounds):
+        start = perf_counter()
+        await run_in_threadpool(time.sleep, 0.001)
+        latencies.append(perf_counter() - start)
+        await asyncio.sleep(0.005)
+    return latencies
+
+
+async def _run(args) -> None:
+    from app.ai.custom_models.huggingface_service import stream_text_generation
+    from app.core.deadlines import executor_load
+
+    baseline = await _probe(args.probes)
+
+    streams = [
+        stream_text_generation(PROMPT, max_length=args.tokens)
+        for _ in range(args.streams)
+    ]
+    readers = [asyncio.ensure_future(_slow_reader(s, args.read_interval)) for s in streams]
+    loaded = await _probe(args.probes)
+
+    # Abandon the streams halfway through, as disconnecting clients do
+    for reader in readers:
+        reader.cancel()
+    await asyncio.gather(*readers, return_exceptions=True)
+    for stream in streams:
+        await stream.aclose()
+
+    # Freed workers pick up a new stream straight away
+    start = perf_counter()
+    pieces = await _slow_reader(stream_text_generation(PROMPT, max_length=args.tokens), 0)
+    fresh_seconds = perf_counter() - start
+    if pieces != args.tokens:
+        raise RuntimeError(f"expected {args.tokens} pieces, got {pieces}")
+
+    def ms(values, q):
+        return statistics.quantiles(values, n=100)[q - 1] * 1000
+
+    print(f"thread pool task latency, {args.probes} tasks")
+    print(f"  idle                        p50 {ms(baseline, 50):7.2f} ms  p99 {ms(baseline, 99):7.2f} ms")
+    print(f"  {args.streams:3d} slow streams open      p50 {ms(loaded, 50):7.2f} ms  p99 {ms(loaded, 99):7.2f} ms")
+    print(f"executor run time estimate    {executor_load.average_run_time * 1000:7.2f} ms")
+    print(f"new stream after disconnects  {fresh_seconds * 1000:7.1f} ms for {pieces} pieces")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--streams", type=int, default=8)
+    parser.add_argument("--tokens", type=int, default=200)
+    parser.add_argument("--token-ms", type=float, default=0.5, help="simulated time per generated token")
+    parser.add_argument("--read-interval", type=float, default=0.02, help="seconds a slow client takes per piece")
+    parser.add_argument("--probes", type=int, default=100)
+    args = parser.parse_args()
+
+    environment.prepare(Path(tempfile.mkdtemp(prefix="bench_generation_stream_")))
+
+    from fastapi.testclient import TestClient
+    from app.ai.custom_models import huggingface_service
+    from app.core.config import settings
+    from main import app
+
+    environment.install_fakes()
+    huggingface_service.model_cache["gpt2_text-generation"].token_seconds = args.token_ms / 1000
+    asyncio.run(environment.seed())
+
+    with TestClient(app) as client:
+        token = client.post(f"{settings.API_PREFIX}/v1/auth/token", data={
+            "username": environment.ADMIN_USERNAME, "password": environment.ADMIN_PASSWORD,
+        }).json()["access_token"]
+        response = client.post(
+            f"{settings.API_PREFIX}/v1/ai/text-generation/stream",
+            json={"prompt": PROMPT, "max_length": 20},
+            headers={"Authorization": f"Bearer {token}"},
+        )
+        response.raise_for_status()
+        events = response.text.count("data: {\"text\"")
+        if events != 20 or "event: done" not in response.text:
+            raise RuntimeError(f"unexpected event stream: {response.text[:200]}")
+        print(f"POST /ai/text-generation/stream: {events} text events and done")
+
+    asyncio.run(_run(args))
+
+
+if __name__ == "__main__":
+    main()
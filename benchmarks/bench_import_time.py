@@ -0,0 +1,77 @@
+"""
+Check the import time of ``main:app`` against a budget.
+
+Runs ``python -X importtime -c "import main"`` in fresh interpreters, reports
+the slowest top-level packages and fails if the import exceeds the budget or
+pulls in a heavyweight AI library. Usage:
+
+    python -m benchmarks.bench_import_time [--budget-ms 1500] [--runs 5]
+"""
+from pathlib import Path
+from typing import Dict, List, Tuple
+import argparse
+import subprocess
+import sys
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Libraries that must load lazily, on first use or in the startup warmup
+LAZY_MODULES = ("transformers", "torch", "pandas", "sklearn", "scipy", "openai", "joblib", "tiktoken")
+
+
+def _measure() -> Tuple[float, Dict[str, float], List[str]]:
+    """
+    Import ``main`` once; returns total seconds, own import time summed per
+    top-level package and every module imported.
+    """
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    packages: Dict[str, float] = {}
+    modules: List[str] = []
+    total = 0.0
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        own, cumulative, name = line[len("import time:"):].split("|")
+        if not cumulative.strip().isdigit():
+            continue  # header row
+        module = name.strip()
+        modules.append(module)
+        top = module.split(".")[0]
+        packages[top] = packages.get(top, 0.0) + int(own) / 1e6
+        if module == "main":
+            total = int(cumulative) / 1e6
+    return total, packages, modules
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--budget-ms", type=float, default=1500.0)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    # Warm the bytecode cache, then keep the fastest run
+    _measure()
+    runs = [_measure() for _ in range(args.runs)]
+    total, packages, modules = min(runs, key=lambda run: run[0])
+
+    print(f"import main: {total * 1000:.1f} ms (best of {args.runs}, budget {args.budget_ms:.0f} ms)")
+    for name, seconds in sorted(packages.items(), key=lambda item: item[1], reverse=True)[:args.top]:
+        print(f"  {name:<24} {seconds * 1000:8.1f} ms")
+
+    failed = False
+    eager = sorted({m.split(".")[0] for m in modules} & set(LAZY_MODULES))
+    if eager:
+        print(f"FAIL: imported at startup: {', '.join(eager)}")
+        failed = True
+    if total * 1000 > args.budget_ms:
+        print("FAIL: import time over budget")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
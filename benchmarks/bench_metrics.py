@@ -0,0 +1,77 @@
+"""
+Measure the per-request overhead of MetricsMiddleware.
+
+Runs a minimal ASGI app with and without the middleware and reports the
+difference per request. Usage:
+
+    python -m benchmarks.bench_metrics [--requests 200000]
+"""
+import argparse
+import asyncio
+import sys
+from time import perf_counter
+
+from app.core.metrics import HTTP_LATENCY, MetricsMiddleware
+
+
+class _Route:
+    path = "/api/v1/users/{user_id}"
+
+
+async def _app(scope, receive, send):
+    scope["route"] = _Route
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"{}"})
+
+
+async def _receive():
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+
+async def _send(message):
+    pass
+
+
+async def _run(app, requests: int) -> float:
+    scope = {"type": "http", "method": "GET", "path": "/api/v1/users/1"}
+    start = perf_counter()
+    for _ in range(requests):
+        await app(dict(scope), _receive, _send)
+    return perf_counter() - start
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=200000)
+    parser.add_argument("--budget-us", type=float, default=5.0,
+                        help="fail if the overhead per request exceeds this many microseconds")
+    args = parser.parse_args()
+
+    wrapped = MetricsMiddleware(_app)
+
+    async def bench():
+        # Warm up both paths first
+        await _run(_app, 1000)
+        await _run(wrapped, 1000)
+        base = min([await _run(_app, args.requests) for _ in range(3)])
+        instrumented = min([await _run(wrapped, args.requests) for _ in range(3)])
+        return base, instrumented
+
+    base, instrumented = asyncio.run(bench())
+    overhead_us = (instrumented - base) / args.requests * 1e6
+    observe_start = perf_counter()
+    child = HTTP_LATENCY.labels("GET", "/bench")
+    for _ in range(args.requests):
+        child.observe(0.003)
+    observe_us = (perf_counter() - observe_start) / args.requests * 1e6
+
+    print(f"requests:            {args.requests}")
+    print(f"baseline:            {base / args.requests * 1e6:.2f} us/request")
+    print(f"with middleware:     {instrumented / args.requests * 1e6:.2f} us/request")
+    print(f"middleware overhead: {overhead_us:.2f} us/request (budget {args.budget_us:.1f} us)")
+    print(f"histogram observe:   {observe_us:.3f} us")
+    return 0 if overhead_us <= args.budget_us else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,97 @@
+"""
+Check and time the rate limiter's backends.
+
+Replays the same sequence of charges, refunds and debts through the
+in-process backend and through ``RedisBackend`` against a local stand-in for
+Redis, fails if their decisions differ, then times concurrent hits through a
+``RateLimiter`` on each. Usage:
+
+    python -m benchmarks.bench_rate_limit [--hits 20000] [--keys 100] [--redis-latency 0]
+"""
+from time import perf_counter
+import argparse
+import asyncio
+
+from starlette.requests import Request
+
+# (operation, amount): "acquire" takes tokens if available, "adjust" refunds
+# (positive) or charges (negative) unconditionally
+SEQUENCE = [("acquire", 1)] * 6 + [
+    ("adjust", 3), ("acquire", 3), ("acquire", 1),
+    ("adjust", -10), ("acquire", 1), ("adjust", 20), ("acquire", 5),
+]
+CAPACITY = 5
+RATE = CAPACITY / 60.0
+
+
+async def _replay(backend):
+    outcomes = []
+    for operation, amount in SEQUENCE:
+        if operation == "acquire":
+            allowed, tokens = await backend.acquire("check", amount, CAPACITY, RATE)
+        else:
+            allowed, tokens = True, await backend.adjust("check", amount, CAPACITY, RATE)
+        outcomes.append((allowed, round(tokens, 2)))
+    return outcomes
+
+
+def _request() -> Request:
+    return Request({"type": "http", "method": "GET", "path": "/bench", "headers": [], "query_string": b""})
+
+
+async def _time_hits(limiter, hits: int, keys: int, concurrency: int) -> float:
+    from fastapi import HTTPException
+
+    request = _request()
+    queue = list(range(hits))
+
+    async def worker():
+        while queue:
+            i = queue.pop()
+            try:
+                await limiter.hit(request, i % keys, route="/bench")
+            except HTTPException:
+                pass
+
+    start = perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return perf_counter() - start
+
+
+async def _run(args) -> None:
+    from app.core.rate_limit import MemoryBackend, RateLimiter, RedisBackend
+    from benchmarks.fakes import FakeRedis
+
+    memory = await _replay(MemoryBackend())
+    fake = FakeRedis()
+    redis = await _replay(RedisBackend(client=fake))
+    if memory != redis:
+        raise SystemExit(f"backends disagree:\n  memory {memory}\n  redis  {redis}")
+    if [allowed for allowed, _ in memory[:6]] != [True] * 5 + [False]:
+        raise SystemExit(f"unexpected bucket behaviour: {memory}")
+    print(f"{len(SEQUENCE)} operations replayed; memory and Redis backends agree")
+
+    # Rejections still go through the whole path, headers included
+    limit = max(args.hits // args.keys // 2, 1)
+    for name, backend in [
+        ("memory", MemoryBackend()),
+        ("redis (stand-in)", RedisBackend(client=FakeRedis(latency=args.redis_latency))),
+    ]:
+        limiter = RateLimiter("bench", limit, backend=backend)
+        seconds = await _time_hits(limiter, args.hits, args.keys, args.concurrency)
+        print(f"  {name:17s} {args.hits / seconds:10.0f} hits/s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--hits", type=int, default=20000)
+    parser.add_argument("--keys", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--redis-latency", type=float, default=0.0,
+                        help="simulated Redis round trip in seconds")
+    args = parser.parse_args()
+    asyncio.run(_run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Compare ways of turning user rows into dictionaries.
+
+Loads users from an in-memory SQLite database and measures ORM instances
+with per-call column iteration (the old ``BaseModel.dict``), ORM instances
+with the cached column plan, and column-only selects converted by
+``to_dicts`` or loaded as read-only DTOs. Usage:
+
+    python -m benchmarks.bench_rows [--rows 10000] [--rounds 10]
+"""
+from datetime import datetime
+from time import perf_counter
+from typing import Callable
+import argparse
+
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.orm import Session
+
+from app.db.session import Base
+from app.models.user import User
+from app.schemas.user import USER_RESPONSE_FIELDS
+
+
+def _time(func: Callable[[], object], rounds: int) -> float:
+    func()
+    best = float("inf")
+    for _ in range(rounds):
+        start = perf_counter()
+        func()
+        best = min(best, perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--rounds", type=int, default=10)
+    args = parser.parse_args()
+
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    now = datetime.utcnow()
+    with Session(engine) as session:
+        session.execute(insert(User), [
+            {
+                "email": f"user{i}@example.com",
+                "username": f"bench_user_{i}",
+                "full_name": f"Benchmark User {i}",
+                "hashed_password": "x",
+                "is_active": True,
+                "is_superuser": False,
+                "created_at": now,
+                "updated_at": now,
+            }
+            for i in range(args.rows)
+        ])
+        session.commit()
+
+    def orm_column_loop():
+        with Session(engine) as session:
+            users = session.scalars(select(User)).all()
+            return [{c.name: getattr(user, c.name) for c in user.__table__.columns} for user in users]
+
+    def orm_plan():
+        with Session(engine) as session:
+            return User.to_dicts(session.scalars(select(User)).all())
+
+    def rows_plan():
+        with Session(engine) as session:
+            return User.to_dicts(session.execute(select(*User.columns())).all())
+
+    def rows_dto():
+        dto = User.dto()
+        with Session(engine) as session:
+            return [dto._make(row) for row in session.execute(select(*User.columns()))]
+
+    def listing_fields():
+        with Session(engine) as session:
+            rows = session.execute(select(*User.columns(USER_RESPONSE_FIELDS))).all()
+            return User.to_dicts(rows, USER_RESPONSE_FIELDS)
+
+    print(f"users x{args.rows}, all columns (query included)")
+    baseline = None
+    for name, func in [
+        ("ORM + per-call columns", orm_column_loop),
+        ("ORM + column plan", orm_plan),
+        ("rows + to_dicts", rows_plan),
+        ("rows + DTO", rows_dto),
+        ("rows + to_dicts (listing)", listing_fields),
+    ]:
+        seconds = _time(func, args.rounds)
+        baseline = baseline or seconds
+        print(f"  {name:<28} {seconds * 1000:9.2f} ms  {baseline / seconds:6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
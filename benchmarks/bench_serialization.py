@@ -0,0 +1,108 @@
+"""
+Compare response serialization paths for large payloads.
+
+For a 100-user list and a 100k-float prediction, measures the default
+FastAPI path (response_model validation, jsonable_encoder, stdlib json)
+against orjson with and without the trusted-response bypass. Usage:
+
+    python -m benchmarks.bench_serialization [--rounds 20]
+"""
+from datetime import datetime
+from time import perf_counter
+from typing import Callable, List
+import argparse
+import asyncio
+
+import numpy as np
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from app.core.responses import FastJSONResponse
+from app.models.user import User
+from app.schemas.ai import PredictionResponse
+from app.schemas.user import USER_RESPONSE_FIELDS, UserResponse
+
+USERS = 100
+PREDICTIONS = 100_000
+
+
+def _users() -> List[User]:
+    now = datetime.utcnow()
+    return [
+        User(
+            id=i,
+            email=f"user{i}@example.com",
+            username=f"bench_user_{i}",
+            full_name=f"Benchmark User {i}",
+            hashed_password="x",
+            is_active=True,
+            is_superuser=False,
+            created_at=now,
+            updated_at=now,
+        )
+        for i in range(USERS)
+    ]
+
+
+_loop = asyncio.new_event_loop()
+
+
+def _validated(response_model, content, response_class) -> Callable[[], bytes]:
+    field = create_response_field(name="Response", type_=response_model)
+
+    def run() -> bytes:
+        data = _loop.run_until_complete(serialize_response(field=field, response_content=content))
+        return response_class(data).body
+
+    return run
+
+
+def _time(func: Callable[[], bytes], rounds: int) -> float:
+    func()
+    best = float("inf")
+    for _ in range(rounds):
+        start = perf_counter()
+        func()
+        best = min(best, perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    users = _users()
+    predictions = np.random.default_rng(0).normal(size=PREDICTIONS)
+    prediction_list = predictions.tolist()
+
+    cases = {
+        f"users x{USERS}": [
+            ("response_model + json", _validated(List[UserResponse], users, JSONResponse)),
+            ("response_model + orjson", _validated(List[UserResponse], users, FastJSONResponse)),
+            ("trusted + orjson", lambda: FastJSONResponse(User.to_dicts(users, USER_RESPONSE_FIELDS)).body),
+        ],
+        f"predictions x{PREDICTIONS}": [
+            ("response_model + json", _validated(
+                PredictionResponse, {"model_name": "m", "predictions": prediction_list}, JSONResponse)),
+            ("response_model + orjson", _validated(
+                PredictionResponse, {"model_name": "m", "predictions": prediction_list}, FastJSONResponse)),
+            ("trusted + orjson (list)", lambda: FastJSONResponse(
+                {"model_name": "m", "predictions": prediction_list}).body),
+            ("trusted + orjson (ndarray)", lambda: FastJSONResponse(
+                {"model_name": "m", "predictions": predictions}).body),
+        ],
+    }
+
+    for payload, paths in cases.items():
+        print(payload)
+        baseline = None
+        for name, func in paths:
+            seconds = _time(func, args.rounds)
+            baseline = baseline or seconds
+            print(f"  {name:<28} {seconds * 1000:9.3f} ms  {baseline / seconds:6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
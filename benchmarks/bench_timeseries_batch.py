@@ -0,0 +1,87 @@
+"""
+Compare batch time series analysis against one analyze_timeseries call per series.
+
+Generates daily series with random gaps, times the vectorized batch path on
+all of them and the per-series path on a sample (extrapolated to the full
+count), and checks both agree on gap-free series. Usage:
+
+    python -m benchmarks.bench_timeseries_batch [--series 10000] [--points 365]
+"""
+from time import perf_counter
+import argparse
+import asyncio
+
+import numpy as np
+
+from app.ai.statistical.prediction_service import analyze_timeseries, analyze_timeseries_batch
+
+DAY_SECONDS = 86400
+START = 1_700_000_000 // DAY_SECONDS * DAY_SECONDS
+
+
+def _series(count: int, points: int, gap_rate: float, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    days = np.arange(points, dtype=np.int64)
+    trend = rng.normal(size=(count, 1)) * days + rng.normal(100, 10, size=(count, 1))
+    values = trend + rng.normal(scale=5, size=(count, points))
+    series = []
+    for i in range(count):
+        keep = rng.random(points) >= gap_rate if i % 2 else np.ones(points, dtype=bool)
+        series.append({
+            "name": f"device-{i}",
+            "dates": (START + days[keep] * DAY_SECONDS).tolist(),
+            "values": values[i, keep].tolist(),
+        })
+    return series
+
+
+async def _per_series(series, periods: int):
+    return [
+        await analyze_timeseries(
+            item["dates"], item["values"], periods_to_forecast=periods, epoch_unit="s", use_cache=False
+        )
+        for item in series
+    ]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--series", type=int, default=10000)
+    parser.add_argument("--points", type=int, default=365)
+    parser.add_argument("--periods", type=int, default=30)
+    parser.add_argument("--gap-rate", type=float, default=0.05, help="share of points dropped in odd series")
+    parser.add_argument("--sample", type=int, default=200, help="series timed on the per-series path")
+    args = parser.parse_args()
+
+    series = _series(args.series, args.points, args.gap_rate)
+    loop = asyncio.new_event_loop()
+
+    # Warm up imports and the thread pool
+    loop.run_until_complete(analyze_timeseries_batch(series[:2], periods_to_forecast=args.periods, epoch_unit="s"))
+    loop.run_until_complete(_per_series(series[:1], args.periods))
+
+    start = perf_counter()
+    batch = loop.run_until_complete(
+        analyze_timeseries_batch(series, periods_to_forecast=args.periods, epoch_unit="s")
+    )
+    batch_seconds = perf_counter() - start
+
+    # The per-series path cannot fit series with gaps, so sample gap-free ones
+    sample = series[:2 * args.sample:2]
+    start = perf_counter()
+    single = loop.run_until_complete(_per_series(sample, args.periods))
+    single_seconds = (perf_counter() - start) / len(sample) * args.series
+
+    max_diff = max(
+        float(np.max(np.abs(np.subtract(one["forecast"], batch[2 * i]["forecast"]))))
+        for i, one in enumerate(single)
+    )
+    print(f"{args.series} series x {args.points} points, {args.periods}-period forecast")
+    print(f"  batch (vectorized)      {batch_seconds * 1000:10.1f} ms")
+    print(f"  per series (estimated)  {single_seconds * 1000:10.1f} ms  ({len(sample)} timed)")
+    print(f"  speedup                 {single_seconds / batch_seconds:10.1f}x")
+    print(f"  max forecast difference {max_diff:10.2e}")
+
+
+if __name__ == "__main__":
+    main()
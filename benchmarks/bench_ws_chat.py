@@ -0,0 +1,75 @@
+"""
+Compare chat completions over POST /ai/chat with the WebSocket channel.
+
+Each HTTP request authenticates again (JWT decode plus a user lookup); the
+channel authenticates once per connection and streams every reply. Runs
+in-process against fake OpenAI backends. Usage:
+
+    python -m benchmarks.bench_ws_chat [--requests 300] [--in-flight 4]
+"""
+from pathlib import Path
+from time import perf_counter
+import argparse
+import asyncio
+import tempfile
+
+from benchmarks import environment
+
+MESSAGES = [{"role": "user", "content": "Summarize the benefits of persistent connections."}]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--in-flight", type=int, default=4,
+                        help="requests multiplexed at once on the channel")
+    args = parser.parse_args()
+
+    environment.prepare(Path(tempfile.mkdtemp(prefix="bench_ws_chat_")))
+
+    from fastapi.testclient import TestClient
+    from app.core.config import settings
+    from main import app
+
+    settings.CHAT_WS_MAX_CONCURRENT_REQUESTS = max(settings.CHAT_WS_MAX_CONCURRENT_REQUESTS, args.in_flight)
+    environment.install_fakes()
+    asyncio.run(environment.seed())
+
+    with TestClient(app) as client:
+        token = client.post(f"{settings.API_PREFIX}/v1/auth/token", data={
+            "username": environment.ADMIN_USERNAME, "password": environment.ADMIN_PASSWORD,
+        }).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+
+        start = perf_counter()
+        for _ in range(args.requests):
+            response = client.post(f"{settings.API_PREFIX}/v1/ai/chat", json={"messages": MESSAGES}, headers=headers)
+            response.raise_for_status()
+        http_seconds = perf_counter() - start
+
+        with client.websocket_connect(f"{settings.API_PREFIX}/v1/ai/chat/ws", headers=headers) as ws:
+            assert ws.receive_json()["type"] == "ready"
+            start = perf_counter()
+            sent = done = 0
+            while sent < min(args.in_flight, args.requests):
+                ws.send_json({"type": "chat", "id": str(sent), "messages": MESSAGES})
+                sent += 1
+            while done < args.requests:
+                frame = ws.receive_json()
+                if frame["type"] == "error":
+                    raise RuntimeError(frame)
+                if frame["type"] == "done":
+                    done += 1
+                    if sent < args.requests:
+                        ws.send_json({"type": "chat", "id": str(sent), "messages": MESSAGES})
+                        sent += 1
+            ws_seconds = perf_counter() - start
+
+    print(f"{args.requests} chat completions")
+    print(f"  POST /ai/chat      {http_seconds * 1000:9.1f} ms  {args.requests / http_seconds:8.1f} req/s")
+    print(f"  WebSocket channel  {ws_seconds * 1000:9.1f} ms  {args.requests / ws_seconds:8.1f} req/s"
+          f"  ({args.in_flight} in flight, streamed)")
+
+
+if __name__ == "__main__":
+    main()
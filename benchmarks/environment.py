@@ -0,0 +1,84 @@
+"""
+Shared setup for benchmark runs: an isolated working directory with a
+SQLite database, seeded users, a trained model and fake AI backends.
+
+``prepare`` must run before anything under ``app`` is imported, because
+settings are read at import time.
+"""
+from pathlib import Path
+import os
+
+ADMIN_USERNAME = "bench_admin"
+ADMIN_PASSWORD = "bench-password"
+SEEDED_USERS = 100
+MODEL_NAME = "bench_linear_regression"
+
+
+def prepare(workdir: Path) -> None:
+    """
+    Point the app at a throwaway SQLite database and model directory.
+    """
+    workdir.mkdir(parents=True, exist_ok=True)
+    os.chdir(workdir)
+    os.environ["DATABASE_URL"] = f"sqlite:///{workdir / 'bench.db'}"
+    os.environ.setdefault("SECRET_KEY", "benchmark-secret")
+    os.environ.setdefault("SLOW_REQUEST_CAPTURE_ENABLED", "false")
+    # Scenarios send far more requests per user than the limits allow
+    os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+
+
+def install_fakes(openai_latency: float = 0.0) -> None:
+    """
+    Replace upstream AI clients with local stand-ins.
+    """
+    from app.ai.llm import openai_service
+    from app.ai.custom_models import huggingface_service
+    from app.core.config import settings
+    from benchmarks.fakes import FakeAsyncOpenAI, FakePipeline
+
+    openai_service._client = FakeAsyncOpenAI(latency=openai_latency)
+    for task, model_name in [
+        ("sentiment-analysis", "distilbert-base-uncased-finetuned-sst-2-english"),
+        ("text-generation", "gpt2"),
+        ("feature-extraction", settings.EMBEDDING_MODEL),
+    ]:
+        huggingface_service.model_cache[f"{model_name}_{task}"] = FakePipeline(task)
+
+
+async def seed() -> None:
+    """
+    Create the schema, an admin and regular users, and a trained model.
+    """
+    from sqlalchemy import delete
+    from app.ai.statistical.prediction_service import train_linear_regression
+    from app.core.security import get_password_hash
+    from app.db.session import AsyncSessionLocal, async_engine, init_db
+    from app.models.user import User
+
+    await init_db()
+
+    # Hash once; bcrypt cost is measured by the login scenario instead
+    hashed_password = get_password_hash(ADMIN_PASSWORD)
+    async with AsyncSessionLocal() as db:
+        await db.execute(delete(User))
+        db.add(User(
+            email="admin@example.com",
+            username=ADMIN_USERNAME,
+            hashed_password=hashed_password,
+            is_superuser=True,
+        ))
+        for i in range(SEEDED_USERS):
+            db.add(User(
+                email=f"user{i}@example.com",
+                username=f"bench_user_{i}",
+                full_name=f"Benchmark User {i}",
+                hashed_password=hashed_password,
+            ))
+        await db.commit()
+
+    X = [[float(i), float(i % 7), float(i % 13)] for i in range(500)]
+    y = [row[0] * 2.0 + row[1] - row[2] * 0.5 for row in X]
+    await train_linear_regression(X, y, model_name=MODEL_NAME)
+
+    # Pooled connections belong to this event loop; the server may run another
+    await async_engine.dispose()
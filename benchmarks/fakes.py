@@ -0,0 +1,208 @@
+"""
+Local stand-ins for OpenAI and Hugging Face so benchmarks measure this
+service rather than the network or model weights.
+"""
+from types import SimpleNamespace
+import asyncio
+import math
+import time
+import zlib
+
+import numpy as np
+
+# Width of fake embeddings, as in all-MiniLM-L6-v2
+EMBEDDING_DIM = 384
+
+
+class _FakeCompletions:
+    def __init__(self, latency: float):
+        self.latency = latency
+        self._counter = 0
+
+    async def create(self, model, messages, temperature=0.7, max_tokens=None, stream=False, **kwargs):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        self._counter += 1
+        if stream:
+            return _FakeStream(f"chatcmpl-bench-{self._counter}", model, "This is a benchmark reply. " * 4)
+        prompt_tokens = sum(len(m["content"]) // 4 + 4 for m in messages) + 3
+        content = "This is a benchmark reply. " * 4
+        completion_tokens = len(content) // 4
+        return SimpleNamespace(
+            id=f"chatcmpl-bench-{self._counter}",
+            object="chat.completion",
+            created=int(time.time()),
+            model=model,
+            choices=[SimpleNamespace(
+                index=0,
+                message=SimpleNamespace(role="assistant", content=content),
+                finish_reason="stop",
+            )],
+            usage=SimpleNamespace(
+                prompt_tokens=prompt_tokens,
+                completion_tokens=completion_tokens,
+                total_tokens=prompt_tokens + completion_tokens,
+            ),
+        )
+
+
+class _FakeStream:
+    """
+    Async iterator of completion chunks, one per word.
+    """
+
+    def __init__(self, id: str, model: str, content: str):
+        self.response = SimpleNamespace(aclose=self._aclose)
+        self.closed = False
+        words = content.split(" ")
+        self._chunks = [
+            self._chunk(id, model, word + " " if i < len(words) - 1 else word, None)
+            for i, word in enumerate(words)
+        ] + [self._chunk(id, model, None, "stop")]
+
+    @staticmethod
+    def _chunk(id, model, content, finish_reason):
+        return SimpleNamespace(id=id, model=model, choices=[SimpleNamespace(
+            index=0, delta=SimpleNamespace(content=content), finish_reason=finish_reason,
+        )])
+
+    async def _aclose(self):
+        self.closed = True
+
+    async def __aiter__(self):
+        for chunk in self._chunks:
+            if self.closed:
+                return
+            yield chunk
+
+
+class _FakeModels:
+    async def list(self, **kwargs):
+        return SimpleNamespace(data=[
+            SimpleNamespace(id="gpt-3.5-turbo", owned_by="openai", created=1677610602),
+            SimpleNamespace(id="gpt-4", owned_by="openai", created=1687882411),
+        ])
+
+
+class FakeAsyncOpenAI:
+    """
+    Minimal AsyncOpenAI replacement with a fixed simulated upstream latency.
+    """
+
+    def __init__(self, latency: float = 0.0):
+        self.chat = SimpleNamespace(completions=_FakeCompletions(latency))
+        self.models = _FakeModels()
+
+
+# Vocabulary size of the fake tokenizer; id 0 is padding
+FAKE_VOCAB_SIZE = 1000
+
+
+class FakeTokenizer:
+    """
+    Encodes each word as an id hashed from it, and decodes token id ``i`` as
+    the word "word<i> ".
+    """
+
+    model_max_length = 512
+
+    def __call__(self, texts, padding=False, truncation=False, return_tensors=None, **kwargs):
+        ids = [
+            [1 + zlib.crc32(word.encode()) % (FAKE_VOCAB_SIZE - 1) for word in text.split()] or [1]
+            for text in texts
+        ]
+        if truncation:
+            ids = [row[:self.model_max_length] for row in ids]
+        width = max(len(row) for row in ids)
+        return {
+            "input_ids": np.array([row + [0] * (width - len(row)) for row in ids]),
+            "attention_mask": np.array([[1] * len(row) + [0] * (width - len(row)) for row in ids]),
+        }
+
+    def decode(self, token_ids, **kwargs):
+        return "".join(f"word{i} " for i in token_ids)
+
+
+class FakePipeline:
+    """
+    Callable standing in for a transformers pipeline.
+    """
+
+    def __init__(self, task: str, compute_seconds: float = 0.0, token_seconds: float = 0.0):
+        self.task = task
+        self.compute_seconds = compute_seconds
+        self.token_seconds = token_seconds
+        self.tokenizer = FakeTokenizer()
+        self.framework = "np"
+        # One fixed hidden state per token id, padding included
+        self._token_states = np.random.default_rng(0).normal(size=(FAKE_VOCAB_SIZE, EMBEDDING_DIM))
+
+    def forward(self, model_inputs, **kwargs):
+        """
+        Model outputs for tokenized inputs; the first is the last hidden state.
+        """
+        if self.compute_seconds:
+            time.sleep(self.compute_seconds)
+        return (self._token_states[model_inputs["input_ids"]].astype(np.float32),)
+
+    def __call__(self, inputs=None, **kwargs):
+        if self.compute_seconds:
+            time.sleep(self.compute_seconds)
+        if self.task == "sentiment-analysis":
+            return [{"label": "POSITIVE", "score": 0.99}]
+        if self.task == "question-answering":
+            return {"answer": "benchmark", "score": 0.9, "start": 0, "end": 9}
+        streamer = kwargs.get("streamer")
+        if streamer is not None:
+            # Feed token ids to the streamer the way ``generate`` does:
+            # the prompt first, then one token per step, then ``end``
+            max_length = kwargs.get("max_length", 50)
+            streamer.put(np.zeros((1, 1), dtype=np.int64))
+            for i in range(max_length):
+                if self.token_seconds:
+                    time.sleep(self.token_seconds)
+                streamer.put(np.array([i]))
+            streamer.end()
+            return [{"generated_text": inputs + self.tokenizer.decode(range(max_length))}]
+        return [{"generated_text": f"{inputs} benchmark"}]
+
+
+class FakeRedis:
+    """
+    Async redis-py stand-in for the rate limiter's ``RedisBackend``. ``eval``
+    runs the token bucket script natively (there is no Lua here) with the
+    same arguments, wall clock, key expiry and reply shape, including Lua's
+    number formatting.
+    """
+
+    def __init__(self, latency: float = 0.0):
+        from app.core.rate_limit import _TOKEN_BUCKET_SCRIPT
+
+        self.latency = latency
+        self.calls = 0
+        self._script = _TOKEN_BUCKET_SCRIPT
+        # key -> ({"tokens": ..., "ts": ...}, expires_at)
+        self._hashes = {}
+
+    async def eval(self, script, numkeys, *keys_and_args):
+        if script != self._script:
+            raise NotImplementedError("FakeRedis only runs the token bucket script")
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        self.calls += 1
+        key = keys_and_args[0]
+        capacity, rate, cost, force = (float(arg) for arg in keys_and_args[numkeys:])
+
+        now = time.time()
+        entry = self._hashes.get(key)
+        state = entry[0] if entry is not None and entry[1] > now else {}
+        tokens = state.get("tokens", capacity)
+        ts = state.get("ts", now)
+        tokens = min(capacity, tokens + max(0.0, now - ts) * rate)
+        allowed = 0
+        if force == 1 or tokens >= cost:
+            tokens = min(capacity, tokens - cost)
+            allowed = 1
+        expires_at = now + (math.ceil(capacity / rate * 1000) + 1000) / 1000
+        self._hashes[key] = ({"tokens": tokens, "ts": now}, expires_at)
+        return [allowed, ("%.14g" % tokens).encode()]
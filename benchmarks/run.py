@@ -0,0 +1,346 @@
+"""
+Benchmark the API end to end against SQLite and local AI stand-ins.
+
+Runs each scenario in-process through httpx's ASGI transport and/or against
+a real uvicorn server, reporting throughput, p50/p99 latency and peak
+allocations per request. Results can be saved as a baseline and later
+compared, failing when a scenario regresses beyond the tolerance.
+
+    python -m benchmarks.run                          # in-process, all scenarios
+    python -m benchmarks.run --mode both --save-baseline
+    python -m benchmarks.run --mode both --compare    # exit 1 on regression
+"""
+from datetime import date, timedelta
+from pathlib import Path
+from time import perf_counter
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+import argparse
+import asyncio
+import json
+import socket
+import subprocess
+import sys
+import tempfile
+import tracemalloc
+
+from benchmarks import environment
+
+DEFAULT_BASELINE = Path(__file__).parent / "baselines" / "baseline.json"
+
+Call = Callable[[Any, Dict[str, str]], Awaitable[Any]]
+
+
+class Scenario:
+    """
+    One benchmarked operation with its default load.
+    """
+
+    def __init__(self, name: str, call: Call, requests: int = 500, concurrency: int = 10,
+                 in_process_only: bool = False):
+        self.name = name
+        self.call = call
+        self.requests = requests
+        self.concurrency = concurrency
+        self.in_process_only = in_process_only
+
+
+def _checked(response):
+    if response.status_code >= 400:
+        raise RuntimeError(f"{response.request.method} {response.request.url.path} "
+                           f"returned {response.status_code}: {response.text[:200]}")
+    return response
+
+
+async def _login(client, headers):
+    return _checked(await client.post("/api/v1/auth/token", data={
+        "username": environment.ADMIN_USERNAME, "password": environment.ADMIN_PASSWORD,
+    }))
+
+
+async def _users_me(client, headers):
+    return _checked(await client.get("/api/v1/users/me", headers=headers))
+
+
+async def _users_list(client, headers):
+    return _checked(await client.get("/api/v1/users/", headers=headers))
+
+
+CHAT_PAYLOAD = {
+    "messages": [
+        {"role": "system", "content": "You are a helpful assistant"},
+        {"role": "user", "content": "Summarize the benefits of async IO in two sentences."},
+    ],
+    "temperature": 0.2,
+    "max_tokens": 64,
+}
+
+
+async def _ai_chat(client, headers):
+    return _checked(await client.post("/api/v1/ai/chat", json=CHAT_PAYLOAD, headers=headers))
+
+
+PREDICT_PAYLOAD = {
+    "X_test": [[float(i), float(i % 7), float(i % 13)] for i in range(1000)],
+    "model_name": environment.MODEL_NAME,
+}
+
+
+async def _predict(client, headers):
+    return _checked(await client.post(
+        "/api/v1/ai/statistical/linear-regression/predict", json=PREDICT_PAYLOAD, headers=headers
+    ))
+
+
+TIMESERIES_PAYLOAD = {
+    "dates": [(date(2023, 1, 1) + timedelta(days=i)).isoformat() for i in range(365)],
+    "values": [float(i % 50) + i * 0.1 for i in range(365)],
+    "periods_to_forecast": 30,
+}
+
+
+async def _timeseries(client, headers):
+    return _checked(await client.post(
+        "/api/v1/ai/timeseries/analyze", json=TIMESERIES_PAYLOAD, headers=headers
+    ))
+
+
+async def _hf_sentiment(client, headers):
+    from app.ai.custom_models.huggingface_service import sentiment_analysis
+
+    return await sentiment_analysis("Benchmarks keep us honest.")
+
+
+SCENARIOS = [
+    # bcrypt dominates login, so fewer requests give a stable number
+    Scenario("login", _login, requests=40, concurrency=4),
+    Scenario("users_me", _users_me),
+    Scenario("users_list", _users_list, requests=200),
+    Scenario("ai_chat", _ai_chat),
+    Scenario("statistical_predict", _predict, requests=200),
+    Scenario("timeseries_analyze", _timeseries, requests=300),
+    Scenario("hf_sentiment", _hf_sentiment, in_process_only=True),
+]
+
+
+def _percentile(sorted_values: List[float], fraction: float) -> float:
+    index = min(int(round(fraction * (len(sorted_values) - 1))), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+async def _measure(client, headers, scenario: Scenario, requests: int, concurrency: int) -> Dict[str, float]:
+    latencies: List[float] = []
+    per_worker, extra = divmod(requests, concurrency)
+
+    async def worker(count: int):
+        for _ in range(count):
+            start = perf_counter()
+            await scenario.call(client, headers)
+            latencies.append(perf_counter() - start)
+
+    # Warm caches, pools and lazy imports before timing
+    for _ in range(min(5, requests)):
+        await scenario.call(client, headers)
+
+    start = perf_counter()
+    await asyncio.gather(*(worker(per_worker + (1 if i < extra else 0)) for i in range(concurrency)))
+    wall = perf_counter() - start
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "concurrency": concurrency,
+        "throughput_rps": round(len(latencies) / wall, 2),
+        "p50_ms": round(_percentile(latencies, 0.50) * 1000, 3),
+        "p99_ms": round(_percentile(latencies, 0.99) * 1000, 3),
+    }
+
+
+async def _measure_allocations(client, headers, scenario: Scenario, samples: int) -> float:
+    """
+    Mean peak traced allocation per request, in KiB, over sequential requests.
+    """
+    tracemalloc.start()
+    try:
+        peaks = []
+        for _ in range(samples):
+            tracemalloc.reset_peak()
+            before, _ = tracemalloc.get_traced_memory()
+            await scenario.call(client, headers)
+            _, peak = tracemalloc.get_traced_memory()
+            peaks.append(peak - before)
+    finally:
+        tracemalloc.stop()
+    return round(sum(peaks) / len(peaks) / 1024, 1)
+
+
+async def _run_scenarios(client, scenarios: List[Scenario], args, in_process: bool) -> Dict[str, Any]:
+    token = (await _login(client, {})).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    results = {}
+    for scenario in scenarios:
+        if scenario.in_process_only and not in_process:
+            continue
+        requests = max(int(scenario.requests * args.scale), 1)
+        concurrency = args.concurrency or scenario.concurrency
+        result = await _measure(client, headers, scenario, requests, min(concurrency, requests))
+        if in_process and args.allocations:
+            result["alloc_kib"] = await _measure_allocations(
+                client, headers, scenario, min(20, requests)
+            )
+        results[scenario.name] = result
+        print(_format_row(scenario.name, result), flush=True)
+    return results
+
+
+async def run_in_process(scenarios: List[Scenario], args) -> Dict[str, Any]:
+    import httpx
+    from main import create_application
+
+    environment.install_fakes(openai_latency=args.openai_latency)
+    await environment.seed()
+    app = create_application()
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        return await _run_scenarios(client, scenarios, args, in_process=True)
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def run_uvicorn(scenarios: List[Scenario], args, workdir: Path) -> Dict[str, Any]:
+    import httpx
+
+    port = _free_port()
+    server = subprocess.Popen([
+        sys.executable, "-m", "benchmarks.server",
+        "--workdir", str(workdir / "uvicorn"),
+        "--port", str(port),
+        "--openai-latency", str(args.openai_latency),
+    ], cwd=Path(__file__).resolve().parent.parent)
+
+    try:
+        limits = httpx.Limits(max_connections=64, max_keepalive_connections=64)
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits) as client:
+            for _ in range(300):
+                if server.poll() is not None:
+                    raise RuntimeError("Benchmark server exited during startup")
+                try:
+                    if (await client.get("/api/health")).status_code == 200:
+                        break
+                except httpx.TransportError:
+                    pass
+                await asyncio.sleep(0.1)
+            else:
+                raise RuntimeError("Benchmark server did not become healthy")
+
+            return await _run_scenarios(client, scenarios, args, in_process=False)
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+
+
+def _format_row(name: str, result: Dict[str, Any]) -> str:
+    alloc = f"{result['alloc_kib']:>9.1f} KiB" if "alloc_kib" in result else ""
+    return (f"  {name:<22} {result['throughput_rps']:>9.1f} req/s  "
+            f"p50 {result['p50_ms']:>8.2f} ms  p99 {result['p99_ms']:>8.2f} ms  {alloc}")
+
+
+def compare(results: Dict[str, Dict[str, Any]], baseline: Dict[str, Dict[str, Any]],
+            tolerance: float) -> List[str]:
+    """
+    Regressions of ``results`` against ``baseline`` beyond ``tolerance`` (a fraction).
+    """
+    regressions = []
+    for mode, scenarios in results.items():
+        for name, current in scenarios.items():
+            base = baseline.get(mode, {}).get(name)
+            if base is None:
+                continue
+            checks = [
+                ("p50_ms", current["p50_ms"] > base["p50_ms"] * (1 + tolerance)),
+                ("p99_ms", current["p99_ms"] > base["p99_ms"] * (1 + tolerance)),
+                ("throughput_rps", current["throughput_rps"] < base["throughput_rps"] * (1 - tolerance)),
+            ]
+            if "alloc_kib" in current and "alloc_kib" in base:
+                checks.append(("alloc_kib", current["alloc_kib"] > base["alloc_kib"] * (1 + tolerance)))
+            for metric, regressed in checks:
+                if regressed:
+                    regressions.append(
+                        f"{mode}/{name}: {metric} {current[metric]} vs baseline {base[metric]}"
+                    )
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="API benchmark suite")
+    parser.add_argument("--mode", choices=["inprocess", "uvicorn", "both"], default="inprocess")
+    parser.add_argument("--scenarios", nargs="*", help="run only these scenarios")
+    parser.add_argument("--scale", type=float, default=1.0, help="multiply request counts")
+    parser.add_argument("--concurrency", type=int, help="override per-scenario concurrency")
+    parser.add_argument("--openai-latency", type=float, default=0.0,
+                        help="simulated upstream OpenAI latency in seconds")
+    parser.add_argument("--no-allocations", dest="allocations", action="store_false",
+                        help="skip the tracemalloc pass")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--compare", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="allowed relative regression before --compare fails")
+    parser.add_argument("--output", type=Path, help="write results as JSON")
+    args = parser.parse_args()
+
+    scenarios = SCENARIOS
+    if args.scenarios:
+        unknown = set(args.scenarios) - {s.name for s in SCENARIOS}
+        if unknown:
+            parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+        scenarios = [s for s in SCENARIOS if s.name in args.scenarios]
+
+    baseline_path = args.baseline.resolve()
+    output_path = args.output.resolve() if args.output else None
+
+    results: Dict[str, Dict[str, Any]] = {}
+    with tempfile.TemporaryDirectory(prefix="bench-") as tmp:
+        workdir = Path(tmp)
+        environment.prepare(workdir / "inprocess")
+
+        if args.mode in ("inprocess", "both"):
+            print("in-process (ASGI transport):")
+            results["inprocess"] = asyncio.run(run_in_process(scenarios, args))
+        if args.mode in ("uvicorn", "both"):
+            print("uvicorn:")
+            results["uvicorn"] = asyncio.run(run_uvicorn(scenarios, args, workdir))
+
+    if output_path:
+        output_path.write_text(json.dumps(results, indent=2))
+
+    if args.save_baseline:
+        baseline = json.loads(baseline_path.read_text()) if baseline_path.exists() else {}
+        for mode, scenarios_results in results.items():
+            baseline.setdefault(mode, {}).update(scenarios_results)
+        baseline_path.parent.mkdir(parents=True, exist_ok=True)
+        baseline_path.write_text(json.dumps(baseline, indent=2, sort_keys=True))
+        print(f"baseline saved to {baseline_path}")
+
+    if args.compare:
+        if not baseline_path.exists():
+            print(f"no baseline at {baseline_path}; run with --save-baseline first")
+            return 2
+        regressions = compare(results, json.loads(baseline_path.read_text()), args.tolerance)
+        if regressions:
+            print("regressions:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print(f"no regressions beyond {args.tolerance:.0%}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
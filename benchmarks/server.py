@@ -0,0 +1,32 @@
+"""
+Serve the app under uvicorn with benchmark fakes installed.
+
+Started by ``benchmarks.run --mode uvicorn``; not meant to be run by hand.
+"""
+from pathlib import Path
+import argparse
+import asyncio
+
+from benchmarks import environment
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workdir", type=Path, required=True)
+    parser.add_argument("--port", type=int, required=True)
+    parser.add_argument("--openai-latency", type=float, default=0.0)
+    args = parser.parse_args()
+
+    environment.prepare(args.workdir)
+
+    import uvicorn
+    from main import create_application
+
+    environment.install_fakes(openai_latency=args.openai_latency)
+    asyncio.run(environment.seed())
+
+    uvicorn.run(create_application(), host="127.0.0.1", port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,7 +4,14 @@ from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 
 from app.api.routes import router as api_router
+from app.core.compression import CompressionMiddleware
 from app.core.config import settings
+from app.core.deadlines import DeadlineMiddleware
+from app.core.metrics import MetricsMiddleware, metrics_endpoint
+from app.core.profiling import SlowRequestMiddleware
+from app.core.rate_limit import RateLimitHeadersMiddleware
+from app.core.responses import FastJSONResponse
+from app.core.usage_events import start_event_pipeline, stop_event_pipeline
 from app.db.session import init_db
 
 
@@ -15,8 +22,15 @@ async def lifespan(app: FastAPI):
     """
     # Initialize database connection
     await init_db()
+    # Load heavy AI libraries and models up front instead of on first use
+    if settings.AI_WARMUP:
+        from app.ai.warmup import warmup
+        await warmup()
+    # Write audit and usage events in the background
+    start_event_pipeline()
     yield
     # Cleanup resources
+    await stop_event_pipeline()
 
 
 def create_application() -> FastAPI:
@@ -28,8 +42,13 @@ def create_application() -> FastAPI:
         description=settings.PROJECT_DESCRIPTION,
         version=settings.PROJECT_VERSION,
         lifespan=lifespan,
+        default_response_class=FastJSONResponse,
     )
 
+    # Give each request a deadline, and shed load when it cannot be met
+    if settings.REQUEST_TIMEOUT_SECONDS:
+        application.add_middleware(DeadlineMiddleware)
+
     # Set up CORS
     application.add_middleware(
         CORSMiddleware,
@@ -39,6 +58,24 @@ def create_application() -> FastAPI:
         allow_headers=["*"],
     )
 
+    # Compress responses; compression itself runs without the request deadline,
+    # so a finished body is never shed
+    if settings.COMPRESSION_ENABLED:
+        application.add_middleware(CompressionMiddleware)
+
+    # Add RateLimit-* headers to rate limited responses
+    if settings.RATE_LIMIT_ENABLED:
+        application.add_middleware(RateLimitHeadersMiddleware)
+
+    # Capture span breakdowns of slow requests
+    if settings.SLOW_REQUEST_CAPTURE_ENABLED:
+        application.add_middleware(SlowRequestMiddleware)
+
+    # Record request metrics
+    if settings.METRICS_ENABLED:
+        application.add_middleware(MetricsMiddleware)
+        application.add_route(settings.METRICS_PATH, metrics_endpoint, include_in_schema=False)
+
     # Include API routers
     application.include_router(api_router)
 
@@ -0,0 +1,41 @@
+"""Usage events
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19 00:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "usageevent",
+        sa.Column("user_id", sa.Integer(), nullable=True),
+        sa.Column("event_type", sa.String(length=32), nullable=False),
+        sa.Column("model", sa.String(length=100), nullable=True),
+        sa.Column("prompt_tokens", sa.Integer(), nullable=True),
+        sa.Column("completion_tokens", sa.Integer(), nullable=True),
+        sa.Column("total_tokens", sa.Integer(), nullable=True),
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(op.f("ix_usageevent_event_type"), "usageevent", ["event_type"], unique=False)
+    op.create_index(op.f("ix_usageevent_id"), "usageevent", ["id"], unique=False)
+    op.create_index("ix_usageevent_user_id_created_at", "usageevent", ["user_id", "created_at"], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_usageevent_user_id_created_at", table_name="usageevent")
+    op.drop_index(op.f("ix_usageevent_id"), table_name="usageevent")
+    op.drop_index(op.f("ix_usageevent_event_type"), table_name="usageevent")
+    op.drop_table("usageevent")